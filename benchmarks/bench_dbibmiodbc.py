@@ -0,0 +1,440 @@
+#!/QOpenSys/pkgs/bin/python3
+#-------------------------------------------------------
+# Module: bench_dbibmiodbc.py
+# Desc: This script benchmarks the DbIbmiOdbc/DbApp wrapper
+#       against a QCUSTCDT table built from the column list
+#       in customers.sql. By default it runs against the
+#       local SQLite backed pyodbc stand-in in fakepyodbc.py
+#       so results are reproducible on any machine and mostly
+#       measure wrapper overhead. Pass --connstring to run the
+#       same benchmarks against a real ODBC data source.
+#
+#       Each benchmark runs in its own child process so peak
+#       RSS is reported per benchmark, and starts from a
+#       freshly seeded table.
+#
+# Benchmarks:
+# crud        Single row insert, exists check, update and delete
+# bulk        Batched insert_many_qcustcdt into an empty table
+# read        Full table read with iter_qcustcdt
+# export      Full table JSON export with export_json
+# concurrent  Pooled key lookups from several threads
+#
+# Parameters:
+# --benchmarks <list>    Comma separated benchmarks. Default=all
+# --rows <n>             Rows seeded and bulk inserted. Default=10000
+# --ops <n>              Single row operations per CRUD step. Default=500
+# --threads <n>          Threads for the concurrent benchmark. Default=8
+# --repeat <n>           Full table passes for read and export. Default=5
+# --batchsize <n>        Bulk insert batch size. Default=1000
+# --connstring <str>     Real ODBC connection string. Default=local stand-in
+# --library <lib>        Library for the benchmark QCUSTCDT table. It is
+#                        dropped and recreated. Never use QIWS. Default=BENCH
+# --json <file>          Write results to a JSON file
+# --compare <file>       Compare ops/sec with a previous --json file and
+#                        exit with status 1 if any benchmark regressed
+# --threshold <pct>      Allowed ops/sec drop for --compare. Default=15
+#
+# Ex: python3 benchmarks/bench_dbibmiodbc.py --json baseline.json
+#     python3 benchmarks/bench_dbibmiodbc.py --compare baseline.json
+#
+# Update Info:
+# 10/18/2026 - Initial version
+#-------------------------------------------------------
+# Imports
+#------------------------------------------------
+import argparse
+import decimal
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+   import resource
+except ImportError:
+   resource=None
+
+# Repository modules live one level up
+_benchdir=os.path.dirname(os.path.abspath(__file__))
+_repodir=os.path.dirname(_benchdir)
+
+ALLBENCHMARKS=["crud","bulk","read","export","concurrent"]
+
+def getcolumns():
+    #----------------------------------------------------------
+    # Function: getcolumns
+    # Desc: Read the column definitions of the CUSTOMERS table
+    #       from customers.sql
+    # :return: List of column definition strings.
+    #  Ex: "CUSNUM NUMERIC(6, 0) NOT NULL DEFAULT 0"
+    #----------------------------------------------------------
+    with open(os.path.join(_repodir,"customers.sql")) as f:
+         ddl=f.read()
+    body=re.search(r"CREATE\s+TABLE\s+\S+\s*\((.*?)\)\s*RCDFMT",ddl,re.IGNORECASE|re.DOTALL).group(1)
+    columns=[]
+    for line in body.splitlines():
+        line=line.strip().rstrip(",").strip()
+        if line == "" or line.startswith("--"):
+           continue
+        columns.append(line)
+    return columns
+
+def makerow(rnd,cusnum):
+    #----------------------------------------------------------
+    # Function: makerow
+    # Desc: Build one QCUSTCDT row
+    # :param rnd: random.Random instance
+    # :param cusnum: Customer number
+    # :return: List of column values in table order
+    #----------------------------------------------------------
+    return [cusnum,
+            rnd.choice(["Henning","Jones","Vine","Johnson","Tyron","Stevens","Alison","Doe"]),
+            rnd.choice(["G K","B D","S S","J A","W E","K L","J S","J W"]),
+            f"{rnd.randint(1,9999)} Main St"[:13],
+            rnd.choice(["Dallas","Clay","Broton","Helen","Hector","Denver","Isle"]),
+            rnd.choice(["TX","NY","VT","GA","CO","MN","WY"]),
+            rnd.randint(10000,99999),
+            rnd.randint(1,9999),
+            rnd.randint(0,3),
+            decimal.Decimal(rnd.randint(0,999999)) / 100,
+            decimal.Decimal(rnd.randint(0,999999)) / 100]
+
+def percentiles(latencies):
+    #----------------------------------------------------------
+    # Function: percentiles
+    # Desc: Get p50, p95 and p99 of a list of latencies
+    # :param latencies: List of seconds
+    # :return: Tuple of (p50,p95,p99) in milliseconds
+    #----------------------------------------------------------
+    if len(latencies) == 0:
+       return (None,None,None)
+    if len(latencies) == 1:
+       return (latencies[0] * 1000,) * 3
+    cuts=statistics.quantiles(latencies,n=100,method="inclusive")
+    return (cuts[49] * 1000,cuts[94] * 1000,cuts[98] * 1000)
+
+def getpeakrss():
+    #----------------------------------------------------------
+    # Function: getpeakrss
+    # Desc: Get the peak resident set size of this process
+    # :return: Kilobytes or None if not available
+    #----------------------------------------------------------
+    if resource == None:
+       return None
+    peak=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux and AIX/PASE report kilobytes
+    if sys.platform == "darwin":
+       peak=peak // 1024
+    return peak
+
+def makeresult(name,ops,seconds,latencies,unit="ops"):
+    #----------------------------------------------------------
+    # Function: makeresult
+    # Desc: Build one benchmark result dictionary
+    # :param name: Benchmark name
+    # :param ops: Operations or rows processed
+    # :param seconds: Wall time
+    # :param latencies: List of per operation seconds
+    # :param unit: What ops counts. Ex: ops or rows
+    # :return: Result dictionary
+    #----------------------------------------------------------
+    p50,p95,p99=percentiles(latencies)
+    return {"name":name,"unit":unit,"ops":ops,"seconds":seconds,
+            "opspersec":ops / seconds if seconds > 0 else 0.0,
+            "p50ms":p50,"p95ms":p95,"p99ms":p99}
+
+class Bench():
+    #-------------------------------------------------------
+    # Class: Bench
+    # Desc: Runs one benchmark inside a child process
+    #-------------------------------------------------------
+
+    def __init__(self,args):
+        self.args=args
+        self.library=args.library
+        self.rnd=random.Random(20261018)
+
+        # Use the stand-in unless a real data source was given
+        if args.connstring in (None,""):
+           sys.path.insert(0,_benchdir)
+           import fakepyodbc
+           sys.modules["pyodbc"]=fakepyodbc
+           self.connstring=f"Driver=fakepyodbc;Database={args.dbfile};Schemas={self.library};"
+        else:
+           self.connstring=args.connstring
+
+        sys.path.insert(0,_repodir)
+        from dbapp import DbApp
+        self.DbApp=DbApp
+        self.db=DbApp()
+        if not self.db.create_connection(self.connstring):
+           raise Exception(f"Connection failed: {self.db.getlasterror()}")
+
+    def setup(self,seedrows):
+        #-------------------------------------------------------
+        # Function: setup
+        # Desc: Drop, create and seed the benchmark table. Not timed.
+        # :param self: Pointer to object instance.
+        # :param seedrows: Rows to seed
+        #-------------------------------------------------------
+        self.db.execute(f"drop table {self.library}.qcustcdt")
+        if not self.db.execute(f"create table {self.library}.qcustcdt ({', '.join(getcolumns())})"):
+           raise Exception(f"Create table failed: {self.db.getlasterror()}")
+        rows=[makerow(self.rnd,cusnum) for cusnum in range(1,seedrows + 1)]
+        if seedrows > 0 and not self.db.insert_many_qcustcdt(rows,self.library):
+           raise Exception(f"Seed failed: {self.db.getlasterror()}")
+
+    def run_crud(self):
+        db=self.db
+        lib=self.library
+        self.setup(self.args.rows)
+        latencies={"insert":[],"exists":[],"update":[],"delete":[]}
+        totals={"insert":0.0,"exists":0.0,"update":0.0,"delete":0.0}
+        base=self.args.rows + 1
+        rows=[makerow(self.rnd,base + i) for i in range(self.args.ops)]
+        for row in rows[:min(20,len(rows))]:
+            # Warm up statement handles outside the timed loop
+            db.getexists_qcustcdt(row[0],lib)
+        for row in rows:
+            for op in ("insert","exists","update","delete"):
+                start=time.perf_counter()
+                if op == "insert":
+                   ok=db.insert_qcustcdt(*row,library=lib)
+                elif op == "exists":
+                   ok=db.getexists_qcustcdt(row[0],lib)
+                elif op == "update":
+                   ok=db.update_qcustcdt(*row,library=lib)
+                else:
+                   ok=db.delete_qcustcdt(row[0],lib)
+                elapsed=time.perf_counter() - start
+                if not ok:
+                   raise Exception(f"crud {op} failed: {db.getlasterror()}")
+                latencies[op].append(elapsed)
+                totals[op] += elapsed
+        return [makeresult(f"crud_{op}",len(latencies[op]),totals[op],latencies[op])
+                for op in ("insert","exists","update","delete")]
+
+    def run_bulk(self):
+        self.setup(0)
+        batchsize=self.args.batchsize
+        rows=[makerow(self.rnd,cusnum) for cusnum in range(1,self.args.rows + 1)]
+        latencies=[]
+        start=time.perf_counter()
+        for i in range(0,len(rows),batchsize):
+            batch=rows[i:i + batchsize]
+            bstart=time.perf_counter()
+            if not self.db.insert_many_qcustcdt(batch,self.library,batchsize):
+               raise Exception(f"bulk insert failed: {self.db.getlasterror()}")
+            latencies.append(time.perf_counter() - bstart)
+        seconds=time.perf_counter() - start
+        return [makeresult("bulk_insert",len(rows),seconds,latencies,"rows")]
+
+    def run_read(self):
+        self.setup(self.args.rows)
+        latencies=[]
+        total=0
+        for i in range(self.args.repeat):
+            start=time.perf_counter()
+            for row in self.db.iter_qcustcdt("",self.library):
+                total += 1
+            latencies.append(time.perf_counter() - start)
+        return [makeresult("full_read",total,sum(latencies),latencies,"rows")]
+
+    def run_export(self):
+        from dbexport import export_json
+        self.setup(self.args.rows)
+        latencies=[]
+        total=0
+        with open(os.devnull,"w") as outfile:
+             for i in range(self.args.repeat):
+                 start=time.perf_counter()
+                 cursor=self.db.query_qcustcdt("",self.library)
+                 if cursor == None:
+                    raise Exception(f"export query failed: {self.db.getlasterror()}")
+                 total += export_json(cursor,outfile)
+                 latencies.append(time.perf_counter() - start)
+        return [makeresult("json_export",total,sum(latencies),latencies,"rows")]
+
+    def run_concurrent(self):
+        self.setup(self.args.rows)
+        threads=self.args.threads
+        pooled=self.DbApp()
+        if not pooled.create_pool(self.connstring,minsize=threads,maxsize=threads):
+           raise Exception(f"Pool failed: {pooled.getlasterror()}")
+        perthread=max(self.args.ops // threads,1) * 4
+        latencies=[[] for i in range(threads)]
+        errors=[]
+        ready=threading.Barrier(threads + 1)
+
+        def worker(index):
+            rnd=random.Random(index)
+            keys=[rnd.randint(1,self.args.rows) for i in range(perthread)]
+            ready.wait()
+            for cusnum in keys:
+                start=time.perf_counter()
+                if not pooled.getexists_qcustcdt(cusnum,self.library):
+                   errors.append(pooled.getlasterror())
+                latencies[index].append(time.perf_counter() - start)
+
+        workers=[threading.Thread(target=worker,args=(i,)) for i in range(threads)]
+        for t in workers:
+            t.start()
+        ready.wait()
+        start=time.perf_counter()
+        for t in workers:
+            t.join()
+        seconds=time.perf_counter() - start
+        pooled.close_connection()
+        if len(errors) > 0:
+           raise Exception(f"concurrent lookups failed: {errors[0]}")
+        merged=[latency for thread in latencies for latency in thread]
+        return [makeresult(f"concurrent_{threads}t",len(merged),seconds,merged)]
+
+    def run(self,name):
+        #-------------------------------------------------------
+        # Function: run
+        # Desc: Run one benchmark and add peak RSS to its results
+        # :param self: Pointer to object instance.
+        # :param name: Benchmark name
+        # :return: List of result dictionaries
+        #-------------------------------------------------------
+        try:
+           results=getattr(self,f"run_{name}")()
+        finally:
+           self.db.execute(f"drop table {self.library}.qcustcdt")
+           self.db.close_connection()
+        peak=getpeakrss()
+        for result in results:
+            result["benchmark"]=name
+            result["peakrsskb"]=peak
+        return results
+
+def runchild(name,args):
+    #----------------------------------------------------------
+    # Function: runchild
+    # Desc: Run one benchmark in a fresh Python process
+    # :param name: Benchmark name
+    # :param args: Parsed arguments
+    # :return: List of result dictionaries
+    #----------------------------------------------------------
+    command=[sys.executable,os.path.abspath(__file__),"--child",name,
+             "--rows",str(args.rows),"--ops",str(args.ops),"--threads",str(args.threads),
+             "--repeat",str(args.repeat),"--batchsize",str(args.batchsize),
+             "--library",args.library,"--dbfile",args.dbfile]
+    if args.connstring not in (None,""):
+       command += ["--connstring",args.connstring]
+    proc=subprocess.run(command,stdout=subprocess.PIPE,text=True)
+    if proc.returncode != 0:
+       raise Exception(f"Benchmark {name} failed with status {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def fmt(value,spec):
+    return "-" if value == None else format(value,spec)
+
+def printresults(results,baseline=None,threshold=15.0):
+    #----------------------------------------------------------
+    # Function: printresults
+    # Desc: Print a results table, with the change against a
+    #       baseline when one is given.
+    # :param results: List of result dictionaries
+    # :param baseline: Dictionary of name to baseline result or None
+    # :param threshold: Allowed ops/sec drop in percent
+    # :return: List of regressed benchmark names
+    #----------------------------------------------------------
+    regressed=[]
+    header=f"{'benchmark':<18}{'ops':>9}{'ops/sec':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak RSS KB':>13}"
+    if baseline != None:
+       header += f"{'change':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        line=(f"{r['name']:<18}{r['ops']:>9}{fmt(r['opspersec'],'.1f'):>12}"
+              f"{fmt(r['p50ms'],'.3f'):>10}{fmt(r['p95ms'],'.3f'):>10}{fmt(r['p99ms'],'.3f'):>10}"
+              f"{fmt(r['peakrsskb'],'d'):>13}")
+        if baseline != None:
+           old=baseline.get(r["name"])
+           if old != None and old["opspersec"] > 0:
+              change=(r["opspersec"] - old["opspersec"]) / old["opspersec"] * 100
+              flag=""
+              if change < -threshold:
+                 flag=" REGRESSED"
+                 regressed.append(r["name"])
+              line += f"{change:>+9.1f}%{flag}"
+        print(line)
+    return regressed
+
+#------------------------------------------------
+# Main script logic
+#------------------------------------------------
+def main():
+    parser=argparse.ArgumentParser(description="Benchmark the DbIbmiOdbc/DbApp wrapper.")
+    parser.add_argument("--benchmarks",default=",".join(ALLBENCHMARKS),help="Comma separated benchmarks. Default=all")
+    parser.add_argument("--rows",type=int,default=10000,help="Rows seeded and bulk inserted. Default=10000")
+    parser.add_argument("--ops",type=int,default=500,help="Single row operations per CRUD step. Default=500")
+    parser.add_argument("--threads",type=int,default=8,help="Threads for the concurrent benchmark. Default=8")
+    parser.add_argument("--repeat",type=int,default=5,help="Full table passes for read and export. Default=5")
+    parser.add_argument("--batchsize",type=int,default=1000,help="Bulk insert batch size. Default=1000")
+    parser.add_argument("--connstring",default=None,help="Real ODBC connection string. Default=local stand-in")
+    parser.add_argument("--library",default="BENCH",help="Library for the benchmark table. Default=BENCH")
+    parser.add_argument("--json",default=None,help="Write results to a JSON file")
+    parser.add_argument("--compare",default=None,help="Previous --json file to compare against")
+    parser.add_argument("--threshold",type=float,default=15.0,help="Allowed ops/sec drop in percent. Default=15")
+    parser.add_argument("--child",default=None,help=argparse.SUPPRESS)
+    parser.add_argument("--dbfile",default=None,help=argparse.SUPPRESS)
+    args=parser.parse_args()
+
+    if args.library.upper() == "QIWS":
+       print("The benchmark table is dropped and recreated. Use a scratch library, not QIWS.",file=sys.stderr)
+       return 2
+
+    # Child process: run one benchmark and print JSON results
+    if args.child != None:
+       print(json.dumps(Bench(args).run(args.child)))
+       return 0
+
+    names=[name.strip() for name in args.benchmarks.split(",") if name.strip() != ""]
+    for name in names:
+        if name not in ALLBENCHMARKS:
+           print(f"Unknown benchmark {name}. Choose from {','.join(ALLBENCHMARKS)}",file=sys.stderr)
+           return 2
+
+    baseline=None
+    if args.compare != None:
+       with open(args.compare) as f:
+            baseline={r["name"]:r for r in json.load(f)["results"]}
+
+    tempdir=tempfile.TemporaryDirectory(prefix="dbbench")
+    try:
+       args.dbfile=os.path.join(tempdir.name,"bench.db")
+       results=[]
+       for name in names:
+           print(f"Running {name}...",file=sys.stderr)
+           results += runchild(name,args)
+    finally:
+       tempdir.cleanup()
+
+    target="local stand-in (fakepyodbc/SQLite)" if args.connstring in (None,"") else "ODBC connstring"
+    print(f"Target: {target}  rows={args.rows} ops={args.ops} threads={args.threads} repeat={args.repeat}")
+    regressed=printresults(results,baseline,args.threshold)
+
+    if args.json != None:
+       with open(args.json,"w") as f:
+            json.dump({"python":sys.version.split()[0],"platform":sys.platform,"target":target,
+                       "settings":{"rows":args.rows,"ops":args.ops,"threads":args.threads,
+                                   "repeat":args.repeat,"batchsize":args.batchsize},
+                       "results":results},f,indent=2)
+
+    if len(regressed) > 0:
+       print(f"Regressed more than {args.threshold}%: {', '.join(regressed)}",file=sys.stderr)
+       return 1
+    return 0
+
+if __name__ == "__main__":
+   sys.exit(main())
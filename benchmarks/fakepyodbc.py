@@ -0,0 +1,358 @@
+#-------------------------------------------------------
+# Module: fakepyodbc.py
+# Desc: This module is a small local stand-in for pyodbc
+#       backed by sqlite3. It lets the benchmark suite run
+#       the real DbIbmiOdbc/DbApp code paths on a machine
+#       without the IBM i Access ODBC Driver. Only the parts
+#       of the pyodbc API used by this repository are
+#       provided, and a few DB2 for i SQL forms are rewritten
+#       to their SQLite equivalents.
+#
+#       Not for production use. Timings measure the Python
+#       wrapper overhead plus SQLite, not IBM i.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Cursors take the query timeout from the connection when
+#              created and report HYT00 when it expires
+#
+# Connection string keywords:
+# Database=<file>    SQLite file shared by all connections. Required.
+# Schemas=<a,b>      Library names attached to the file. Default=QIWS
+#
+# Ex: fakepyodbc.connect("Database=/tmp/bench.db;Schemas=BENCH;")
+#-------------------------------------------------------
+import decimal
+import re
+import sqlite3
+import time
+
+# DB-API module globals pyodbc provides
+apilevel="2.0"
+threadsafety=1
+paramstyle="qmark"
+version="fake-1.0"
+
+# ODBC SQL type codes used by cursor.columns()
+SQL_CHAR=1
+SQL_NUMERIC=2
+SQL_DECIMAL=3
+SQL_INTEGER=4
+SQL_SMALLINT=5
+SQL_FLOAT=6
+SQL_DOUBLE=8
+SQL_VARCHAR=12
+SQL_LONGVARCHAR=-1
+SQL_BINARY=-2
+SQL_VARBINARY=-3
+SQL_LONGVARBINARY=-4
+SQL_BIGINT=-5
+SQL_WCHAR=-8
+SQL_WVARCHAR=-9
+SQL_REAL=7
+SQL_TYPE_DATE=91
+SQL_TYPE_TIME=92
+SQL_TYPE_TIMESTAMP=93
+
+class Error(Exception):
+    pass
+
+class DatabaseError(Error):
+    pass
+
+class OperationalError(DatabaseError):
+    pass
+
+class ProgrammingError(DatabaseError):
+    pass
+
+class IntegrityError(DatabaseError):
+    pass
+
+class DataError(DatabaseError):
+    pass
+
+# NUMERIC/DECIMAL columns come back as Decimal like pyodbc
+sqlite3.register_converter("NUMERIC",lambda value: decimal.Decimal(value.decode()))
+sqlite3.register_converter("DECIMAL",lambda value: decimal.Decimal(value.decode()))
+sqlite3.register_adapter(decimal.Decimal,str)
+
+_typenames={"NUMERIC":SQL_NUMERIC,"DECIMAL":SQL_DECIMAL,"CHAR":SQL_CHAR,"VARCHAR":SQL_VARCHAR,
+            "INTEGER":SQL_INTEGER,"INT":SQL_INTEGER,"SMALLINT":SQL_SMALLINT,"DOUBLE":SQL_DOUBLE,
+            "FLOAT":SQL_FLOAT,"DATE":SQL_TYPE_DATE,"TIMESTAMP":SQL_TYPE_TIMESTAMP}
+
+# DB2 for i forms rewritten for SQLite
+_rewrites=[
+    (re.compile(r"\s+with\s+(nc|none|cs|chg|rs|rr|ur|all)\s*$",re.IGNORECASE),""),
+    (re.compile(r"\s+on\s+rollback\s+retain\s+cursors",re.IGNORECASE),""),
+    (re.compile(r"^\s*values\s+(.+)$",re.IGNORECASE|re.DOTALL),r"select \1"),
+    (re.compile(r"\s+from\s+sysibm\.sysdummy1",re.IGNORECASE),""),
+    (re.compile(r"fetch\s+first\s+(\d+)\s+rows?\s+only",re.IGNORECASE),r"limit \1"),
+    (re.compile(r"cast\(\s*\?\s+as\s+[a-z]+(?:\s*\(\s*\d+\s*(?:,\s*\d+\s*)?\))?\s*\)",re.IGNORECASE),"?"),
+    (re.compile(r"\bmod\(\s*([^,()]+(?:\([^()]*\))?)\s*,\s*([^()]+?)\s*\)",re.IGNORECASE),r"(\1 % \2)"),
+    (re.compile(r"\bccsid\s+\d+",re.IGNORECASE),""),
+]
+
+def _rewrite(sql):
+    #----------------------------------------------------------
+    # Function: _rewrite
+    # Desc: Rewrite DB2 for i SQL forms used by this repo to SQLite
+    # :param sql: SQL statement
+    # :return: SQLite SQL statement
+    #----------------------------------------------------------
+    for regex,replacement in _rewrites:
+        sql=regex.sub(replacement,sql)
+    return sql
+
+def _mapexception(e,timedout=False):
+    #----------------------------------------------------------
+    # Function: _mapexception
+    # Desc: Map a sqlite3 exception to the pyodbc exception classes
+    # :param e: sqlite3 exception
+    # :param timedout: True if the query timeout stopped the statement
+    # :return: pyodbc style exception
+    #----------------------------------------------------------
+    if isinstance(e,sqlite3.IntegrityError):
+       return IntegrityError("23000",str(e))
+    if isinstance(e,sqlite3.OperationalError) and "interrupted" in str(e):
+       if timedout:
+          return OperationalError("HYT00","Timeout expired")
+       return OperationalError("HY008","Operation canceled")
+    return ProgrammingError("42000",str(e))
+
+class Row(tuple):
+    #-------------------------------------------------------
+    # Class: Row
+    # Desc: Plain tuple row. Unlike pyodbc.Row there is no column
+    #       name attribute access, so code under test must index rows
+    #       by position.
+    #-------------------------------------------------------
+    __slots__=()
+
+class _ColumnRow():
+    #-------------------------------------------------------
+    # Class: _ColumnRow
+    # Desc: Row returned by Cursor.columns()
+    #-------------------------------------------------------
+
+    def __init__(self,**values):
+        self.__dict__.update(values)
+
+def _wrap(row):
+    return row if isinstance(row,_ColumnRow) else Row(row)
+
+class Cursor():
+
+    def __init__(self,connection):
+        self.connection=connection
+        self.arraysize=1
+        self.fast_executemany=False
+        self.description=None
+        self.rowcount=-1
+        self._cursor=None
+        self._pending=[]
+        self._inputsizes=None
+        self._closed=False
+        # Like pyodbc the query timeout is fixed when the cursor is created
+        self.timeout=connection.timeout
+
+    def _checkopen(self):
+        if self._closed:
+           raise ProgrammingError("HY010","Attempt to use a closed cursor.")
+        if self.connection._db == None:
+           raise ProgrammingError("08003","Connection is closed")
+
+    def execute(self,sql,*parms):
+        self._checkopen()
+        if len(parms) == 1 and isinstance(parms[0],(list,tuple)):
+           parms=parms[0]
+        self.connection._starttimer(self.timeout)
+        try:
+           self._cursor=self.connection._db.execute(_rewrite(sql),tuple(parms))
+        except sqlite3.Error as e:
+           raise _mapexception(e,self.connection._timedout)
+        finally:
+           self.connection._stoptimer()
+        self._pending=[]
+        self.rowcount=self._cursor.rowcount
+        if self._cursor.description != None:
+           # Peek at the first row to report column types
+           first=self._cursor.fetchone()
+           if first != None:
+              self._pending=[first]
+           self.description=[self._describe(desc[0],first[i] if first != None else None)
+                             for i,desc in enumerate(self._cursor.description)]
+        else:
+           self.description=None
+        return self
+
+    def _describe(self,name,value):
+        #-------------------------------------------------------
+        # Function: _describe
+        # Desc: Build a pyodbc style description entry from a value
+        #-------------------------------------------------------
+        typecode=type(value) if value != None else str
+        precision=None
+        scale=None
+        if isinstance(value,decimal.Decimal):
+           exponent=value.as_tuple().exponent
+           scale=-exponent if exponent < 0 else 0
+           precision=max(len(value.as_tuple().digits),scale + 1)
+        elif isinstance(value,str):
+           precision=len(value)
+        return (name.upper(),typecode,precision,precision,precision,scale,True)
+
+    def executemany(self,sql,seq):
+        self._checkopen()
+        self.connection._starttimer(self.timeout)
+        try:
+           self._cursor=self.connection._db.executemany(_rewrite(sql),[tuple(row) for row in seq])
+        except sqlite3.Error as e:
+           raise _mapexception(e,self.connection._timedout)
+        finally:
+           self.connection._stoptimer()
+        self._pending=[]
+        self.description=None
+        self.rowcount=self._cursor.rowcount
+
+    def setinputsizes(self,sizes):
+        self._inputsizes=sizes
+
+    def fetchone(self):
+        self._checkopen()
+        if self._pending:
+           return _wrap(self._pending.pop(0))
+        if self._cursor == None:
+           return None
+        row=self._cursor.fetchone()
+        return _wrap(row) if row != None else None
+
+    def fetchmany(self,size=None):
+        self._checkopen()
+        if size == None:
+           size=self.arraysize
+        rows=self._pending[:size]
+        self._pending=self._pending[size:]
+        if len(rows) < size and self._cursor != None:
+           rows.extend(self._cursor.fetchmany(size - len(rows)))
+        return [_wrap(row) for row in rows]
+
+    def fetchall(self):
+        self._checkopen()
+        rows=self._pending
+        self._pending=[]
+        if self._cursor != None:
+           rows.extend(self._cursor.fetchall())
+        return [_wrap(row) for row in rows]
+
+    def __iter__(self):
+        while True:
+            row=self.fetchone()
+            if row == None:
+               return
+            yield row
+
+    def columns(self,table=None,catalog=None,schema=None,column=None):
+        self._checkopen()
+        prefix=f"{schema.lower()}." if schema else ""
+        info=self.connection._db.execute(f"pragma {prefix}table_info({table.lower()})").fetchall()
+        rows=[]
+        for cid,name,decltype,notnull,default,pk in info:
+            match=re.match(r"\s*(\w+)\s*(?:\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\))?",decltype or "")
+            typename=match.group(1).upper() if match else "VARCHAR"
+            size=int(match.group(2)) if match and match.group(2) else None
+            digits=int(match.group(3)) if match and match.group(3) else (0 if typename in ("NUMERIC","DECIMAL") else None)
+            if column != None and name.upper() != column.upper():
+               continue
+            rows.append(_ColumnRow(table_cat=None,table_schem=(schema or "").upper(),table_name=table.upper(),
+                                   column_name=name.upper(),data_type=_typenames.get(typename,SQL_VARCHAR),
+                                   type_name=typename,column_size=size,buffer_length=size,
+                                   decimal_digits=digits,num_prec_radix=10 if digits != None else None,
+                                   nullable=0 if notnull else 1,remarks=None,column_def=default,
+                                   ordinal_position=cid + 1,is_nullable="NO" if notnull else "YES"))
+        self._cursor=None
+        self._pending=rows
+        self.description=[("COLUMN_NAME",str,None,None,None,None,True)]
+        return self
+
+    def cancel(self):
+        self.connection._db.interrupt()
+
+    def close(self):
+        self._closed=True
+        self._cursor=None
+        self._pending=[]
+
+class Connection():
+
+    def __init__(self,connstring,timeout=0,autocommit=False):
+        keywords={}
+        for part in connstring.split(";"):
+            if "=" in part:
+               key,value=part.split("=",1)
+               keywords[key.strip().lower()]=value.strip()
+        if "database" not in keywords:
+           raise OperationalError("08001","Database= keyword is required")
+        self._db=sqlite3.connect(":memory:",timeout=30,check_same_thread=False,
+                                 detect_types=sqlite3.PARSE_DECLTYPES)
+        for schema in keywords.get("schemas","QIWS").split(","):
+            self._db.execute("attach database ? as " + schema.strip().lower(),(keywords["database"],))
+        self.timeout=0
+        self.autocommit=autocommit
+        self._timedout=False
+
+    def _starttimer(self,timeout):
+        #-------------------------------------------------------
+        # Function: _starttimer
+        # Desc: Enforce the cursor timeout like the ODBC query timeout
+        #-------------------------------------------------------
+        self._timedout=False
+        if timeout and timeout > 0:
+           deadline=time.monotonic() + timeout
+           def handler():
+               if time.monotonic() > deadline:
+                  self._timedout=True
+                  return 1
+               return 0
+           self._db.set_progress_handler(handler,1000)
+        else:
+           self._db.set_progress_handler(None,1000)
+
+    def _stoptimer(self):
+        self._db.set_progress_handler(None,1000)
+
+    def cursor(self):
+        if self._db == None:
+           raise ProgrammingError("08003","Connection is closed")
+        return Cursor(self)
+
+    def execute(self,sql,*parms):
+        return self.cursor().execute(sql,*parms)
+
+    def commit(self):
+        if self._db == None:
+           raise ProgrammingError("08003","Connection is closed")
+        self._db.commit()
+
+    def rollback(self):
+        if self._db == None:
+           raise ProgrammingError("08003","Connection is closed")
+        self._db.rollback()
+
+    @property
+    def closed(self):
+        return self._db == None
+
+    def close(self):
+        if self._db != None:
+           self._db.close()
+           self._db=None
+
+def connect(connstring,autocommit=False,timeout=0,**kwargs):
+    #----------------------------------------------------------
+    # Function: connect
+    # Desc: Open a stand-in connection
+    # :param connstring: Connection string. See module header.
+    # :return: Connection
+    #----------------------------------------------------------
+    return Connection(connstring,timeout,autocommit)
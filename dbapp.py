@@ -14,11 +14,43 @@
 # its IBM i database functonality from class DbIbmiOdbc
 # which handles ODBC database access. It extends the
 # functionality of DbIbmiOdbc for this specific app.
+#
+# Field values are always passed as parameter markers
+# rather than formatted into the SQL text. This keeps
+# the statement text identical between calls so the 
+# IBM i plan cache can reuse access plans, and avoids
+# SQL injection. Only the library name is part of the text.
 #-------------------------------------------------------
+import itertools
+import re
+import time
+import bisect
+from array import array
 from dbibmiodbc import DbIbmiOdbc
+from dbpartition import DbPartitionedQuery, mod_partitions
+from dbrecord import make_record_class
+from dbload import DbBulkLoader
+from dbmirror import DbMirror
+from dbcache import gettables
+
+# Typed record for Customer Master rows. Same columns as customers.sql.
+# Ex: rec.cusnum, rec.lstnam, rec.todict(), rec.tojson()
+QcustcdtRecord=make_record_class("QcustcdtRecord",
+                                 ["CUSNUM","LSTNAM","INIT","STREET","CITY","STATE",
+                                  "ZIPCOD","CDTLMT","CHGCOD","BALDUE","CDTDUE"],
+                                 charcolumns=["LSTNAM","INIT","STREET","CITY","STATE"])
+
+# Customer Master column SQL types. Used to type parameter markers
+# in MERGE VALUES rows, which DB2 for i can not infer on its own.
+QCUSTCDT_TYPES={"CUSNUM":"NUMERIC(6,0)","LSTNAM":"CHAR(8)","INIT":"CHAR(3)","STREET":"CHAR(13)",
+                "CITY":"CHAR(6)","STATE":"CHAR(2)","ZIPCOD":"NUMERIC(5,0)","CDTLMT":"NUMERIC(4,0)",
+                "CHGCOD":"NUMERIC(1,0)","BALDUE":"NUMERIC(6,2)","CDTDUE":"NUMERIC(6,2)"}
 
 class DbApp(DbIbmiOdbc):
 
+    # Preloaded CUSNUM key indexes by library. See load_qcustcdt_keys.
+    _qcustcdtkeys=None
+
     def insert_qcustcdt(self,cusnum,lstnam,init,street,city,state,zipcod,cdtlmt,chgcod,baldue,cdtdue,library='qiws',nocommit=False):
         #----------------------------------------------------------
         # Function: insert_qcustcdt
@@ -31,12 +63,45 @@ class DbApp(DbIbmiOdbc):
         # :return: True-Success, False-Error. Records affected also set to -2 on errors
         #----------------------------------------------------------
         try:
-           # Create the SQL statement 
-           sql = f"insert into {library}.qcustcdt (cusnum,lstnam,init,street,city,state,zipcod,cdtlmt,chgcod,baldue,cdtdue) VALUES({cusnum},'{lstnam}','{init}','{street}','{city}','{state}',{zipcod},{cdtlmt},{chgcod},{baldue},{cdtdue})"
+           # Create the SQL statement with parameter markers so the
+           # statement text is the same for every customer
+           sql = f"insert into {library}.qcustcdt (cusnum,lstnam,init,street,city,state,zipcod,cdtlmt,chgcod,baldue,cdtdue) VALUES(?,?,?,?,?,?,?,?,?,?,?)"
+           parms = [cusnum,lstnam,init,street,city,state,zipcod,cdtlmt,chgcod,baldue,cdtdue]
 
            # Insert the record
            # Note: self parm not needed for execute when internal class function called
-           rtnexecute=self.execute(sql,nocommit)
+           rtnexecute=self.executeiwthparms(sql,parms,nocommit)
+        
+           # Return result value
+           return rtnexecute
+        
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)           
+            print(e)
+
+            return False
+
+    def insert_many_qcustcdt(self,rows,library='qiws',batchsize=1000,nocommit=False):
+        #----------------------------------------------------------
+        # Function: insert_many_qcustcdt
+        # Desc: Bulk insert records into Customer Master using 
+        #       parameter arrays with a commit every batchsize rows
+        # :param self: Pointer to object instance. 
+        # :param rows: Iterable of row sequences in field order:
+        #  cusnum,lstnam,init,street,city,state,zipcod,cdtlmt,chgcod,baldue,cdtdue
+        # :param library: IBMi library. Default=qiws
+        # :param batchsize: Rows per batch and commit. Default=1000
+        # :param nocommit: Append "with NC" to end of SQL statment to avoid committment control
+        #  True=append "with NC" to SQL for no commit. False=Perform commit. Default=False 
+        # :return: True-Success, False-Error. Records affected also set to -2 on errors
+        #----------------------------------------------------------
+        try:
+           # Create the SQL statement 
+           sql = f"insert into {library}.qcustcdt (cusnum,lstnam,init,street,city,state,zipcod,cdtlmt,chgcod,baldue,cdtdue) VALUES(?,?,?,?,?,?,?,?,?,?,?)"
+
+           # Insert the records in batches
+           rtnexecute=self.executemany(sql,rows,batchsize,nocommit)
         
            # Return result value
            return rtnexecute
@@ -48,6 +113,73 @@ class DbApp(DbIbmiOdbc):
 
             return False
 
+    def load_customers_csv(self,path,library='qiws',table='customers',workers=4,batchsize=1000,
+                           rejectfile=None,checkpointfile=None,columns=None):
+        #----------------------------------------------------------
+        # Function: load_customers_csv
+        # Desc: Bulk load a customer CSV file into the Customer table
+        #       (customers.sql) with several worker connections. Rows
+        #       are validated against the table definition and bad
+        #       rows go to the reject file while the rest commit.
+        #       With a checkpoint file a stopped load can be run again
+        #       and continues where it left off. See dbload.
+        # :param self: Pointer to object instance. 
+        # :param path: CSV file with a header line of column names
+        # :param library: IBMi library. Default=qiws
+        # :param table: Table name. Default=customers
+        # :param workers: Worker threads and connections. Default=4
+        # :param batchsize: Rows per parameter array and commit. Default=1000
+        # :param rejectfile: CSV file for rejected rows. Default=None
+        # :param checkpointfile: JSON restart file. Default=None
+        # :param columns: CSV columns to load. None=All. Default=None
+        # :return: Stats dictionary of read, skipped, loaded, rejected, 
+        #  batches, bisects, retries, seconds and rowspersecond or None on error
+        #----------------------------------------------------------
+        try:
+           loader=DbBulkLoader(self,table,library,batchsize,workers,rejectfile,checkpointfile)
+           return loader.load(path,columns)
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)           
+            print(e)
+
+            return None
+
+    def mirror_qcustcdt(self,path,library='qiws',maxstaleness=300,refreshinterval=60):
+        #----------------------------------------------------------
+        # Function: mirror_qcustcdt
+        # Desc: Keep a local SQLite copy of the Customer Master table
+        #       and answer getexists_qcustcdt and query_qcustcdt from it
+        #       while the copy is at most maxstaleness seconds old.
+        #       The copy is refreshed on a background thread and only
+        #       changed rows are written. Customer changes made through
+        #       this instance send reads to the host until the next
+        #       refresh. See dbmirror.
+        # :param self: Pointer to object instance. 
+        # :param path: SQLite mirror file
+        # :param library: IBMi library. Default=qiws
+        # :param maxstaleness: Oldest copy used in seconds. Default=300
+        # :param refreshinterval: Seconds between refreshes. 0=No background
+        #  refresh. Default=60
+        # :return: DbMirror or None on error
+        #----------------------------------------------------------
+        try:
+           mirror=DbMirror(self,path)
+           if not mirror.add_table("qcustcdt",library,["CUSNUM"]):
+              raise Exception(mirror.getlasterror())
+           if mirror.refresh() == None:
+              raise Exception(mirror.getlasterror())
+           if refreshinterval > 0:
+              mirror.start(refreshinterval)
+           self.use_mirror(mirror,maxstaleness)
+           return mirror
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)           
+            print(e)
+
+            return None
+
     def update_qcustcdt(self,cusnum,lstnam,init,street,city,state,zipcod,cdtlmt,chgcod,baldue,cdtdue,library='qiws',nocommit=False):
         #----------------------------------------------------------
         # Function: update_qcusctdt
@@ -60,12 +192,14 @@ class DbApp(DbIbmiOdbc):
         # :return: True-Success, False-Error. Records affected also set to -2 on errors
         #----------------------------------------------------------
         try:
-           # Create the SQL statement 
-           sql = f"update {library}.qcustcdt set cusnum={cusnum},lstnam='{lstnam}',init='{init}',street='{street}',city='{city}',state='{state}',zipcod={zipcod},cdtlmt={cdtlmt},chgcod={chgcod},baldue={baldue},cdtdue={cdtdue} where cusnum={cusnum}"
+           # Create the SQL statement with parameter markers so the
+           # statement text is the same for every customer
+           sql = f"update {library}.qcustcdt set lstnam=?,init=?,street=?,city=?,state=?,zipcod=?,cdtlmt=?,chgcod=?,baldue=?,cdtdue=? where cusnum=?"
+           parms = [lstnam,init,street,city,state,zipcod,cdtlmt,chgcod,baldue,cdtdue,cusnum]
 
            # Update the record. 
            # Note: self parm not needed for execute when internal class function called
-           rtnexecute=self.execute(sql,nocommit)
+           rtnexecute=self.executeiwthparms(sql,parms,nocommit)
 
            # Return result value
            return rtnexecute
@@ -89,12 +223,12 @@ class DbApp(DbIbmiOdbc):
         # :return: True-Success, False-Error. Records affected also set to -2 on errors
         #----------------------------------------------------------
         try:
-           # Create the SQL statement 
-           sql = f"delete from {library}.qcustcdt where cusnum={cusnum}"
+           # Create the SQL statement with parameter marker
+           sql = f"delete from {library}.qcustcdt where cusnum=?"
         
            # Delete the record
            # Note: self parm not needed for execute when internal class function called
-           rtnexecute=self.execute(sql,nocommit)
+           rtnexecute=self.executeiwthparms(sql,[cusnum],nocommit)
         
            # Return result value
            return rtnexecute
@@ -122,10 +256,17 @@ class DbApp(DbIbmiOdbc):
            self._lastsql=""
            self._rowsaffected=0 # Reset rows affected
 
+           # Answer from the key index if one is loaded
+           keys=self._getkeyindex(library)
+           if keys != None:
+              return 1 if self._inkeyindex(keys[0],int(cusnum)) else 0
+
            # Execute the query to get data
-           cursor=self.execute_query(f"select count(*) as reccount from {library}.qcustcdt where cusnum={cusnum}")
+           cursor=self.execute_query(f"select count(*) as reccount from {library}.qcustcdt where cusnum=?",[cusnum],
+                                     usemirror=True)
            # Return result record count
            reccount =  cursor.fetchone()[0]
+           cursor.close()
 
            # Return record count value from query
            return reccount
@@ -138,13 +279,159 @@ class DbApp(DbIbmiOdbc):
             # return -2 on error 
             return -2 
 
-    def query_qcustcdt(self,wherestmt,library='qiws'):
+    def exists_many_qcustcdt(self,cusnums,library='qiws',chunksize=500,maxindexage=None):
+        #----------------------------------------------------------
+        # Function: exists_many_qcustcdt
+        # Desc: Check which of many customer numbers are in Customer
+        #       Master. With a key index from load_qcustcdt_keys no
+        #       query is run. Otherwise the numbers are sorted and sent
+        #       chunksize at a time in one IN list query per chunk. The
+        #       last chunk is padded with its last number so every chunk
+        #       uses the same statement text and access plan.
+        # :param self: Pointer to object instance. 
+        # :param cusnums: Iterable of customer numbers
+        # :param library: IBMi library. Default=qiws
+        # :param chunksize: Numbers per query. Default=500
+        # :param maxindexage: Use the key index only if loaded within this
+        #  many seconds. None=Any age. Default=None
+        # :return: Set of the customer numbers found, as int, or None on error
+        #----------------------------------------------------------
+        try:
+           # Reset errors and rows affected
+           self._lasterror=""
+           self._rowsaffected=0
+
+           wanted=sorted(set([int(cusnum) for cusnum in cusnums]))
+
+           keys=self._getkeyindex(library,maxindexage)
+           if keys != None:
+              return set([cusnum for cusnum in wanted if self._inkeyindex(keys[0],cusnum)])
+
+           found=set()
+           sql=f"select cusnum from {library}.qcustcdt where cusnum in ({','.join(['?'] * chunksize)})"
+           for start in range(0,len(wanted),chunksize):
+               chunk=wanted[start:start + chunksize]
+               chunk.extend([chunk[-1]] * (chunksize - len(chunk)))
+               cursor=self.execute_query(sql,chunk,False)
+               if cursor == None:
+                  raise Exception(f"Query issue: {self._lasterror}")
+               try:
+                  found.update([int(row[0]) for row in cursor.fetchall()])
+               finally:
+                  cursor.close()
+
+           self._rowsaffected=len(found)
+           return found
+
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)           
+            print(e)
+
+            return None
+
+    def load_qcustcdt_keys(self,library='qiws',chunksize=10000):
+        #----------------------------------------------------------
+        # Function: load_qcustcdt_keys
+        # Desc: Load or reload every CUSNUM of Customer Master into a
+        #       sorted in-memory array. While loaded, getexists_qcustcdt
+        #       and exists_many_qcustcdt answer from it without a query.
+        #       Inserts, deletes and key updates to the table through this
+        #       instance drop the index. Changes by other jobs are only
+        #       seen after the next load, so reload it as often as the
+        #       checks need to be current.
+        # :param self: Pointer to object instance. 
+        # :param library: IBMi library. Default=qiws
+        # :param chunksize: Rows per fetch. Default=10000
+        # :return: Number of keys loaded or -2 on error
+        #----------------------------------------------------------
+        try:
+           # Reset errors and rows affected
+           self._lasterror=""
+           self._rowsaffected=0
+
+           loadedat=time.time()
+           keys=array("q")
+           for rows in self.iter_query_chunks(f"select cusnum from {library}.qcustcdt order by cusnum",None,chunksize):
+               keys.extend([int(row[0]) for row in rows])
+
+           if self._qcustcdtkeys == None:
+              self._qcustcdtkeys={}
+           self._qcustcdtkeys[library.lower()]=(keys,loadedat)
+           self._rowsaffected=len(keys)
+           return len(keys)
+
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)           
+            print(e)
+
+            return -2
+
+    def drop_qcustcdt_keys(self,library=None):
+        #----------------------------------------------------------
+        # Function: drop_qcustcdt_keys
+        # Desc: Drop a key index so checks query the table again
+        # :param self: Pointer to object instance. 
+        # :param library: IBMi library. None=All libraries. Default=None
+        # :return: True-Index dropped
+        #----------------------------------------------------------
+        if self._qcustcdtkeys != None:
+           if library == None:
+              self._qcustcdtkeys={}
+           else:
+              self._qcustcdtkeys.pop(library.lower(),None)
+        return True
+
+    def _getkeyindex(self,library,maxage=None):
+        #----------------------------------------------------------
+        # Function: _getkeyindex
+        # Desc: Get the loaded key index for a library
+        # :param self: Pointer to object instance. 
+        # :param library: IBMi library
+        # :param maxage: Oldest index used in seconds. None=Any age. Default=None
+        # :return: Tuple of (sorted key array, load time) or None
+        #----------------------------------------------------------
+        if self._qcustcdtkeys == None:
+           return None
+        keys=self._qcustcdtkeys.get(library.lower())
+        if keys == None or (maxage != None and time.time() - keys[1] > maxage):
+           return None
+        return keys
+
+    def _inkeyindex(self,keys,cusnum):
+        i=bisect.bisect_left(keys,cusnum)
+        return i < len(keys) and keys[i] == cusnum
+
+    def _invalidatecache(self,sql):
+        #----------------------------------------------------------
+        # Function: _invalidatecache
+        # Desc: Also drop the key indexes when a statement can add,
+        #       remove or renumber Customer Master rows. Updates that
+        #       do not set CUSNUM keep them.
+        # :param self: Pointer to object instance. 
+        # :param sql: Action SQL statement that ran
+        #----------------------------------------------------------
+        super()._invalidatecache(sql)
+        if not self._qcustcdtkeys:
+           return
+        if re.match(r"^\s*call\b",sql,re.IGNORECASE):
+           self.drop_qcustcdt_keys()
+        elif "qcustcdt" in gettables(sql):
+           match=re.match(r"^\s*update\b(.*?)\bset\b(.*?)(\bwhere\b|$)",sql,re.IGNORECASE | re.DOTALL)
+           if match == None or re.search(r"\bcusnum\b",match.group(2),re.IGNORECASE):
+              self.drop_qcustcdt_keys()
+
+    def query_qcustcdt(self,wherestmt,library='qiws',parms=None):
         #----------------------------------------------------------
         # Function: query_qcustcdt
         # Desc: Query Customer Master table records with select where statement
         # :param self: Pointer to object instance. 
-        # :param wherestmt - query where statement if desired
+        # :param wherestmt - query where statement if desired. Can use ? markers
+        #  or named :parm parameters. Ex: "state=:state"
         # :param library: IBMi library. Default=qiws
+        # :param parms: Optional parameters for the where statement. List for ? 
+        #  markers or dictionary for named parameters. Ex: {"state":"MN"}. Default=None
         # :return: Resulting cursor or None on error
         #----------------------------------------------------------
         try:
@@ -165,7 +452,7 @@ class DbApp(DbIbmiOdbc):
            self._lastsql=sql
 
            # Execute the query to get data
-           cursor=self.execute_query(sql)
+           cursor=self.execute_query(sql,parms,usemirror=True)
 
            # Return results cursor
            return cursor
@@ -177,3 +464,248 @@ class DbApp(DbIbmiOdbc):
             
             # Return for no records
             return None
+
+    def iter_qcustcdt(self,wherestmt,library='qiws',chunksize=1000,parms=None,prefetch=0):
+        #----------------------------------------------------------
+        # Function: iter_qcustcdt
+        # Desc: Stream Customer Master table records one row at a time
+        #       with select where statement. Rows are fetched in blocks
+        #       of chunksize so large files do not need to fit in memory.
+        # :param self: Pointer to object instance. 
+        # :param wherestmt - query where statement if desired
+        # :param library: IBMi library. Default=qiws
+        # :param chunksize: Rows per fetch. Default=1000
+        # :param parms: Optional parameters for the where statement. Default=None
+        # :param prefetch: Blocks fetched ahead on a background thread. 0=None. Default=0
+        # :return: Generator of rows. Raises an exception if the query fails.
+        #----------------------------------------------------------
+        # Set main SQL     
+        sql = f"select * from {library}.qcustcdt"
+
+        # Add WHERE statement if criteria passed
+        if wherestmt!="":
+           sql = sql + " WHERE " + wherestmt
+
+        return self.iter_query(sql,parms,chunksize,prefetch)
+
+    def query_qcustcdt_partitioned(self,wherestmt,partitions=4,library='qiws',parms=None,ordered=False,chunksize=1000):
+        #----------------------------------------------------------
+        # Function: query_qcustcdt_partitioned
+        # Desc: Read Customer Master table records in parallel. The 
+        #       query is split into MOD(CUSNUM) partitions that run at 
+        #       the same time on separate connections and the rows are
+        #       merged into one stream. Use for large extracts.
+        #       query = db.query_qcustcdt_partitioned("",8)
+        #       for row in query: ...
+        #       print(query.getstats())
+        # :param self: Pointer to object instance. 
+        # :param wherestmt - query where statement if desired
+        # :param partitions: Number of partitions and connections. Default=4
+        # :param library: IBMi library. Default=qiws
+        # :param parms: Optional parameters for the where statement. List for ? markers. Default=None
+        # :param ordered: True=Rows in partition order. False=Rows as fetched. Default=False
+        # :param chunksize: Rows per fetch. Default=1000
+        # :return: DbPartitionedQuery to iterate
+        #----------------------------------------------------------
+        # Set main SQL. Partition predicate goes in {partition}
+        sql = f"select * from {library}.qcustcdt WHERE "
+
+        # Add WHERE statement if criteria passed
+        if wherestmt!="":
+           sql = sql + "(" + wherestmt + ") AND "
+        sql = sql + "{partition}"
+
+        return DbPartitionedQuery(self,sql,mod_partitions("CUSNUM",partitions),parms,chunksize,ordered=ordered)
+
+    def iter_qcustcdt_records(self,wherestmt,library='qiws',chunksize=1000,parms=None,decimals="decimal"):
+        #----------------------------------------------------------
+        # Function: iter_qcustcdt_records
+        # Desc: Stream Customer Master table records as QcustcdtRecord
+        #       objects with CHAR fields trimmed. 
+        #       for rec in db.iter_qcustcdt_records("state=?",parms=["MN"]):
+        #           print(rec.cusnum,rec.lstnam)
+        # :param self: Pointer to object instance. 
+        # :param wherestmt - query where statement if desired
+        # :param library: IBMi library. Default=qiws
+        # :param chunksize: Rows per fetch. Default=1000
+        # :param parms: Optional parameters for the where statement. Default=None
+        # :param decimals: decimal=BALDUE/CDTDUE etc as Decimal. float=As int or float. Default=decimal
+        # :return: Generator of QcustcdtRecord. Raises an exception if the query fails.
+        #----------------------------------------------------------
+        # Set main SQL     
+        sql = f"select * from {library}.qcustcdt"
+
+        # Add WHERE statement if criteria passed
+        if wherestmt!="":
+           sql = sql + " WHERE " + wherestmt
+
+        return self.iter_records(sql,parms,QcustcdtRecord,chunksize,decimals)
+
+    def query_qcustcdt_records(self,wherestmt,library='qiws',parms=None,decimals="decimal"):
+        #----------------------------------------------------------
+        # Function: query_qcustcdt_records
+        # Desc: Read Customer Master table records into a list of
+        #       QcustcdtRecord objects. Uses a fraction of the memory
+        #       of a list of dicts when holding many rows.
+        # :param self: Pointer to object instance. 
+        # :param wherestmt - query where statement if desired
+        # :param library: IBMi library. Default=qiws
+        # :param parms: Optional parameters for the where statement. Default=None
+        # :param decimals: decimal=BALDUE/CDTDUE etc as Decimal. float=As int or float. Default=decimal
+        # :return: List of QcustcdtRecord or None on error
+        #----------------------------------------------------------
+        # Set main SQL     
+        sql = f"select * from {library}.qcustcdt"
+
+        # Add WHERE statement if criteria passed
+        if wherestmt!="":
+           sql = sql + " WHERE " + wherestmt
+
+        return self.query_records(sql,parms,QcustcdtRecord,10000,decimals)
+
+    def upsert_qcustcdt_many(self,rows,library='qiws',batchsize=500,nocommit=False,staging=False):
+        #----------------------------------------------------------
+        # Function: upsert_qcustcdt_many
+        # Desc: Insert or update Customer Master records by CUSNUM with
+        #       set based MERGE statements instead of an exists check
+        #       plus insert or update per record. 
+        #       Default: each batch of rows is sent as one 
+        #       MERGE INTO ... USING (VALUES ...) statement and committed.
+        #       staging=True: all rows are bulk inserted into a global
+        #       temporary table and merged with one statement and one
+        #       commit. Use for very large sets.
+        #       Existing keys are counted just before each MERGE to split
+        #       the result into inserted and updated rows.
+        # :param self: Pointer to object instance. 
+        # :param rows: Iterable of row sequences in field order:
+        #  cusnum,lstnam,init,street,city,state,zipcod,cdtlmt,chgcod,baldue,cdtdue
+        #  When a CUSNUM appears more than once in a batch the last row wins.
+        #  With staging=True CUSNUM values must be unique.
+        # :param library: IBMi library. Default=qiws
+        # :param batchsize: Rows per MERGE statement, or per insert batch 
+        #  when staging. Default=500
+        # :param nocommit: Append "with NC" to end of SQL statment to avoid committment control
+        #  True=append "with NC" to SQL for no commit. False=Perform commit. Default=False 
+        # :param staging: True=Merge from a global temporary table. Default=False
+        # :return: Dictionary of inserted and updated row counts or None on error.
+        #  On error getlasterror() includes the counts committed before the error.
+        #----------------------------------------------------------
+        columns=QcustcdtRecord._columns
+        collist=",".join(columns)
+        updatelist=",".join([f"{column}=s.{column}" for column in columns[1:]])
+        withnc=" with NC" if nocommit else ""
+        inserted=0
+        updated=0
+
+        try:
+           # Reset errors and rows affected
+           self._lasterror=""
+           self._rowsaffected=0
+
+           if staging:
+              # A transaction scope keeps the session table and the
+              # MERGE on one connection, including pooled instances
+              with self.transaction() as tx:
+                   if not self.execute(f"DECLARE GLOBAL TEMPORARY TABLE SESSION.QCUSTSTG AS "
+                                       f"(SELECT * FROM {library}.qcustcdt) WITH NO DATA ON COMMIT PRESERVE ROWS WITH REPLACE"):
+                      raise Exception(self._lasterror)
+                   sql = f"insert into SESSION.QCUSTSTG ({collist}) VALUES({','.join(['?'] * len(columns))})"
+                   if not self.executemany(sql,rows,batchsize,nocommit):
+                      raise Exception(self._lasterror)
+                   staged=self._queryvalue("select count(*) from SESSION.QCUSTSTG")
+                   newrows=self._queryvalue(f"select count(*) from SESSION.QCUSTSTG s where not exists "
+                                            f"(select 1 from {library}.qcustcdt t where t.cusnum=s.cusnum)")
+                   sql = (f"MERGE INTO {library}.qcustcdt t USING SESSION.QCUSTSTG s ON t.cusnum=s.cusnum "
+                          f"WHEN MATCHED THEN UPDATE SET {updatelist} "
+                          f"WHEN NOT MATCHED THEN INSERT ({collist}) VALUES({','.join(['s.' + c for c in columns])}){withnc}")
+                   if not self.execute(sql):
+                      raise Exception(self._lasterror)
+                   self.execute("DROP TABLE SESSION.QCUSTSTG")
+              if tx.rolledback:
+                 raise Exception(self._lasterror)
+              inserted=newrows
+              updated=staged - newrows
+           else:
+              rowiter=iter(rows)
+              while True:
+                  batch=list(itertools.islice(rowiter,batchsize))
+                  if len(batch) == 0:
+                     break
+
+                  # Duplicate keys in one MERGE source are an error on DB2
+                  batch=list(dict([(row[0],row) for row in batch]).values())
+                  keys=[row[0] for row in batch]
+
+                  # Typed markers, one VALUES row per record
+                  rowmarkers="(" + ",".join([f"CAST(? AS {QCUSTCDT_TYPES[c]})" for c in columns]) + ")"
+                  sql = (f"MERGE INTO {library}.qcustcdt t USING (VALUES {','.join([rowmarkers] * len(batch))}) "
+                         f"AS s ({collist}) ON t.cusnum=s.cusnum "
+                         f"WHEN MATCHED THEN UPDATE SET {updatelist} "
+                         f"WHEN NOT MATCHED THEN INSERT ({collist}) VALUES({','.join(['s.' + c for c in columns])}){withnc}")
+                  parms=[value for row in batch for value in row]
+
+                  # Count and merge on the same connection and commit
+                  with self.transaction() as tx:
+                       existing=self._queryvalue(f"select count(*) from {library}.qcustcdt where cusnum in "
+                                                 f"({','.join(['?'] * len(keys))})",keys)
+                       if not self.executeiwthparms(sql,parms):
+                          raise Exception(self._lasterror)
+                  if tx.rolledback:
+                     raise Exception(self._lasterror)
+                  inserted += len(batch) - existing
+                  updated += existing
+
+           self._rowsaffected=inserted + updated
+           self._lasterror=f"SQL upsert completed. Inserted: {inserted} Updated: {updated}"
+           return {"inserted":inserted,"updated":updated}
+
+        except Exception as e:
+            # Set error message
+            self._lasterror=f"{e} Inserted before error: {inserted} Updated before error: {updated}"
+            self._rowsaffected=-2
+            print(e)
+            return None
+
+    def _queryvalue(self,sql,parms=None):
+        #----------------------------------------------------------
+        # Function: _queryvalue
+        # Desc: Run a query that returns a single value
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL query
+        # :param parms: Optional SQL parameters. Default=None
+        # :return: First column of the first row. Raises an exception on error.
+        #----------------------------------------------------------
+        cursor=self.execute_query(sql,parms,False)
+        if cursor == None:
+           raise Exception(f"Query issue: {self._lasterror}")
+        try:
+           return cursor.fetchone()[0]
+        finally:
+           cursor.close()
+
+    def query_qcustcdt_page(self,wherestmt,pagesize=100,token=None,library='qiws',parms=None):
+        #----------------------------------------------------------
+        # Function: query_qcustcdt_page
+        # Desc: Read one page of Customer Master records in CUSNUM order
+        #       using keyset pagination. Every page costs about the same
+        #       as the first since no rows are skipped with OFFSET.
+        #       rows,token = db.query_qcustcdt_page("state=?",50,parms=["MN"])
+        #       while token != None:
+        #          rows,token = db.query_qcustcdt_page("state=?",50,token,parms=["MN"])
+        # :param self: Pointer to object instance. 
+        # :param wherestmt - query where statement if desired
+        # :param pagesize: Rows per page. Default=100
+        # :param token: Continuation token from the previous page. None=First page. Default=None
+        # :param library: IBMi library. Default=qiws
+        # :param parms: Optional parameters for the where statement. Default=None
+        # :return: Tuple of (rows,nexttoken). nexttoken is None on the last page.
+        #  (None,None) on error.
+        #----------------------------------------------------------
+        # Set main SQL     
+        sql = f"select * from {library}.qcustcdt"
+
+        # Add WHERE statement if criteria passed
+        if wherestmt!="":
+           sql = sql + " WHERE " + wherestmt
+
+        return self.query_page(sql,["CUSNUM"],pagesize,token,parms)
@@ -0,0 +1,489 @@
+#-------------------------------------------------------
+# Module: dbasync.py
+# Desc: This module contains asyncio wrapper classes for
+#       DbIbmiOdbc and DbApp so FastAPI and other asyncio
+#       apps can call the database without blocking the
+#       event loop. Each pyodbc call runs on a dedicated
+#       thread pool sized to the connection budget and a
+#       semaphore makes bursts of requests queue in the
+#       event loop instead of piling up host server jobs.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Deadlines entered in a task apply to its calls, and a
+#              cancelled task cancels the statement it is waiting on
+# 10/18/2026 - Concurrency slots are released when a call returns. Cursor
+#              fetches run on their own thread pool, one at a time per
+#              cursor. Generator methods are wrapped as async iterators.
+#
+# Usage:
+# pool = DbConnectionPool(odbcconnstring,minsize=2,maxsize=10)
+# adb = AsyncDbApp(pool=pool)
+# rows = await adb.fetch("select * from qiws.qcustcdt where state=?",["MN"])
+# ok = await adb.insert_qcustcdt(...)
+# async for row in adb.iter_query("select * from qiws.qcustcdt"):
+# async for row in await adb.iter_qcustcdt("state=?",parms=["MN"]):
+#
+# Note: Transaction scopes are tracked per thread so a
+# transaction cannot span several awaits. Put the whole
+# unit of work in a function and pass it to run():
+# await adb.run(myunitofwork)
+#
+# Time limits:
+# with adb.getdb().deadline(2.0):
+#    rows = await adb.fetch(sql,parms)
+# rows = await asyncio.wait_for(adb.fetch(sql,parms),2.0)
+#-------------------------------------------------------
+import asyncio
+import contextvars
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from dbibmiodbc import DbIbmiOdbc
+from dbapp import DbApp
+from dbtimeout import DbDeadline
+
+class AsyncDbIbmiOdbc():
+
+    # Database class wrapped by this async class
+    _dbclass=DbIbmiOdbc
+
+    # Methods that only read instance state and are called directly
+    _syncmethods=("getlasterror","getlastrowsaffected","getlastsql","isopen",
+                  "getconn","getpool","getnewguid","bindparms","intransaction")
+
+    def __init__(self,db_connstring=None,pool=None,maxconcurrency=None,db=None):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor
+        # :param self: Object instance
+        # :param db_connstring: ODBC connection string for a single connection. Default=None
+        # :param pool: DbConnectionPool to borrow connections from. Default=None
+        # :param maxconcurrency: Maximum database calls running at once.
+        #        Default=pool maxsize, or 1 without a pool since a single
+        #        pyodbc connection cannot be used by two threads at once.
+        # :param db: Existing DbIbmiOdbc/DbApp instance to wrap instead of
+        #        creating one. Default=None
+        #-------------------------------------------------------
+        if db == None:
+           db=self._dbclass(db_connstring,pool)
+        self._db=db
+
+        pool=db.getpool()
+        if pool == None:
+           maxconcurrency=1
+        elif maxconcurrency == None:
+           maxconcurrency=pool.stats()["maxsize"]
+        self._maxconcurrency=maxconcurrency
+
+        self._executor=ThreadPoolExecutor(max_workers=maxconcurrency,thread_name_prefix="dbibmiodbc")
+        self._semaphore=asyncio.Semaphore(maxconcurrency)
+
+        # Fetches from open cursors get their own threads so they are
+        # never queued behind calls waiting for a pooled connection that
+        # only those fetches can give back. A single connection stays
+        # on the one database thread.
+        if pool == None:
+           self._fetchexecutor=self._executor
+        else:
+           self._fetchexecutor=ThreadPoolExecutor(max_workers=maxconcurrency,thread_name_prefix="dbibmiodbcfetch")
+
+    def getdb(self):
+        #-------------------------------------------------------
+        # Function: getdb
+        # Desc: Get the wrapped synchronous database object
+        # :param self: Pointer to object instance.
+        # :return: DbIbmiOdbc/DbApp instance
+        #-------------------------------------------------------
+        return self._db
+
+    async def _runheld(self,func,*args,**kwargs):
+        #-------------------------------------------------------
+        # Function: _runheld
+        # Desc: Run a blocking call on the database thread pool. The
+        #       caller must already hold a semaphore slot.
+        # :param self: Pointer to object instance.
+        # :param func: Function to call
+        # :return: Function result
+        #-------------------------------------------------------
+        return await self._runon(self._executor,func,*args,**kwargs)
+
+    async def _runfetch(self,func,*args):
+        #-------------------------------------------------------
+        # Function: _runfetch
+        # Desc: Run a fetch from an open cursor or generator on the
+        #       fetch thread pool. No semaphore slot is needed.
+        # :param self: Pointer to object instance.
+        # :param func: Function to call
+        # :return: Function result
+        #-------------------------------------------------------
+        return await self._runon(self._fetchexecutor,func,*args)
+
+    async def _runon(self,executor,func,*args,**kwargs):
+        #-------------------------------------------------------
+        # Function: _runon
+        # Desc: Run a blocking call on a thread pool. The call runs
+        #       in a copy of the task context so deadlines entered in
+        #       the task apply. If the task is cancelled while waiting
+        #       the running statement is cancelled too.
+        # :param self: Pointer to object instance.
+        # :param executor: Thread pool
+        # :param func: Function to call
+        # :return: Function result
+        #-------------------------------------------------------
+        loop=asyncio.get_running_loop()
+        handle=DbDeadline()
+        context=contextvars.copy_context()
+
+        def run():
+            with handle:
+                return func(*args,**kwargs)
+
+        try:
+           return await loop.run_in_executor(executor,functools.partial(context.run,run))
+        except asyncio.CancelledError:
+           handle.cancel()
+           raise
+
+    async def _call(self,func,*args,**kwargs):
+        #-------------------------------------------------------
+        # Function: _call
+        # Desc: Wait for a semaphore slot then run a blocking call on
+        #       the database thread pool. The slot is given back when
+        #       the call returns. Open cursors keep their pooled
+        #       connection until they are closed or fully read.
+        # :param self: Pointer to object instance.
+        # :param func: Function to call
+        # :return: Function result, cursors wrapped as DbAsyncCursor
+        #  and generators as DbAsyncIterator
+        #-------------------------------------------------------
+        async with self._semaphore:
+           result=await self._runheld(func,*args,**kwargs)
+        if hasattr(result,"fetchmany") and hasattr(result,"description"):
+           return DbAsyncCursor(self,result)
+        if inspect.isgenerator(result):
+           return DbAsyncIterator(self,result)
+        return result
+
+    def __getattr__(self,name):
+        #-------------------------------------------------------
+        # Function: __getattr__
+        # Desc: Expose every other method of the wrapped database
+        #       object as a coroutine. Ex: await adb.insert_qcustcdt(...)
+        #       Generator methods return a DbAsyncIterator.
+        #       Ex: async for row in await adb.iter_qcustcdt(""):
+        # :param self: Pointer to object instance.
+        # :param name: Attribute name
+        # :return: Coroutine function or attribute value
+        #-------------------------------------------------------
+        if name.startswith("_"):
+           raise AttributeError(name)
+        attr=getattr(self._db,name)
+        if not callable(attr) or name in self._syncmethods:
+           return attr
+
+        async def asyncmethod(*args,**kwargs):
+            return await self._call(attr,*args,**kwargs)
+        asyncmethod.__name__=name
+        return asyncmethod
+
+    async def run(self,func,*args,**kwargs):
+        #-------------------------------------------------------
+        # Function: run
+        # Desc: Run any blocking function on the database thread pool.
+        #       Use for transaction scopes and other multi statement
+        #       work that must stay on one thread.
+        # :param self: Pointer to object instance.
+        # :param func: Function to call
+        # :return: Function result
+        #-------------------------------------------------------
+        return await self._call(func,*args,**kwargs)
+
+    async def execute(self,sql,nocommit=False,debug=False,timeout=None):
+        #-------------------------------------------------------
+        # Function: execute
+        # Desc: Async DbIbmiOdbc.execute
+        # :return: True-Success, False-Error
+        #-------------------------------------------------------
+        return await self._call(self._db.execute,sql,nocommit,debug,timeout)
+
+    async def executeiwthparms(self,sql,parms,nocommit=False,debug=False,timeout=None):
+        #-------------------------------------------------------
+        # Function: executeiwthparms
+        # Desc: Async DbIbmiOdbc.executeiwthparms
+        # :return: True-Success, False-Error
+        #-------------------------------------------------------
+        return await self._call(self._db.executeiwthparms,sql,parms,nocommit,debug,timeout)
+
+    async def executemany(self,sql,rows,batchsize=1000,nocommit=False,fastexecutemany=True,debug=False,timeout=None):
+        #-------------------------------------------------------
+        # Function: executemany
+        # Desc: Async DbIbmiOdbc.executemany. rows is read on a
+        #       worker thread so it should be a list or a generator
+        #       that does not touch the event loop.
+        # :return: True-Success, False-Error
+        #-------------------------------------------------------
+        return await self._call(self._db.executemany,sql,rows,batchsize,nocommit,fastexecutemany,debug,
+                                timeout=timeout)
+
+    async def execute_query(self,sql,parms=None,timeout=None):
+        #-------------------------------------------------------
+        # Function: execute_query
+        # Desc: Async DbIbmiOdbc.execute_query
+        # :return: DbAsyncCursor or None on error. Close the cursor or
+        #  read all rows to free its connection.
+        #-------------------------------------------------------
+        return await self._call(self._db.execute_query,sql,parms,timeout=timeout)
+
+    async def fetch(self,sql,parms=None,timeout=None):
+        #-------------------------------------------------------
+        # Function: fetch
+        # Desc: Run a query and return all rows
+        # :param self: Pointer to object instance.
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters. Default=None
+        # :param timeout: Seconds to run the query and read the rows. Default=None
+        # :return: List of rows or None on error
+        #-------------------------------------------------------
+        def fetchall():
+            cursor1=self._db.execute_query(sql,parms,timeout=timeout)
+            if cursor1 == None:
+               return None
+            try:
+               return cursor1.fetchall()
+            finally:
+               cursor1.close()
+        return await self._call(fetchall)
+
+    async def fetchone(self,sql,parms=None,timeout=None):
+        #-------------------------------------------------------
+        # Function: fetchone
+        # Desc: Run a query and return the first row
+        # :param self: Pointer to object instance.
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters. Default=None
+        # :param timeout: Seconds to run the query and read the row. Default=None
+        # :return: Row, or None when there are no rows or on error
+        #-------------------------------------------------------
+        def fetchfirst():
+            cursor1=self._db.execute_query(sql,parms,timeout=timeout)
+            if cursor1 == None:
+               return None
+            try:
+               return cursor1.fetchone()
+            finally:
+               cursor1.close()
+        return await self._call(fetchfirst)
+
+    async def iter_query_chunks(self,sql,parms=None,chunksize=1000):
+        #-------------------------------------------------------
+        # Function: iter_query_chunks
+        # Desc: Async generator yielding lists of up to chunksize rows.
+        #       Each block is fetched on the database thread pool.
+        # :param self: Pointer to object instance.
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters. Default=None
+        # :param chunksize: Rows per fetch. Default=1000
+        # :return: Async generator of row lists. Raises an exception if the query fails.
+        #-------------------------------------------------------
+        cursor1=await self.execute_query(sql,parms)
+        if cursor1 == None:
+           raise Exception(f"Query issue: {self._db.getlasterror()}")
+        try:
+           while True:
+               rows=await cursor1.fetchmany(chunksize)
+               if len(rows) == 0:
+                  break
+               yield rows
+               if len(rows) < chunksize:
+                  break
+        finally:
+           await cursor1.close()
+
+    async def iter_query(self,sql,parms=None,chunksize=1000):
+        #-------------------------------------------------------
+        # Function: iter_query
+        # Desc: Async generator yielding one row at a time while
+        #       fetching blocks of chunksize rows in the background.
+        #       async for row in adb.iter_query(sql):
+        # :param self: Pointer to object instance.
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters. Default=None
+        # :param chunksize: Rows per fetch. Default=1000
+        # :return: Async generator of rows. Raises an exception if the query fails.
+        #-------------------------------------------------------
+        async for rows in self.iter_query_chunks(sql,parms,chunksize):
+            for row in rows:
+                yield row
+
+    async def close(self):
+        #-------------------------------------------------------
+        # Function: close
+        # Desc: Close the wrapped connection or owned pool and stop
+        #       the database thread pool.
+        # :param self: Pointer to object instance.
+        # :return: True-Success, False-Error
+        #-------------------------------------------------------
+        rtn=await self._call(self._db.close_connection)
+        self._executor.shutdown(wait=True)
+        self._fetchexecutor.shutdown(wait=True)
+        return rtn
+
+class AsyncDbApp(AsyncDbIbmiOdbc):
+    #-------------------------------------------------------
+    # Class: AsyncDbApp
+    # Desc: Async wrapper for the DbApp business layer. Every
+    #       DbApp method is available as a coroutine.
+    #       ok = await adb.insert_qcustcdt(...)
+    #       cursor1 = await adb.query_qcustcdt("state=?",parms=["MN"])
+    #       rows = await cursor1.fetchall()
+    #-------------------------------------------------------
+    _dbclass=DbApp
+
+class DbAsyncCursor():
+    #-------------------------------------------------------
+    # Class: DbAsyncCursor
+    # Desc: Async wrapper around a query cursor. Fetches run on
+    #       the fetch thread pool one at a time, so tasks sharing
+    #       the cursor take turns. The cursor is closed when all
+    #       rows have been read.
+    #-------------------------------------------------------
+
+    def __init__(self,owner,cursor):
+        self._owner=owner
+        self._cursor=cursor
+        self._closed=False
+        self._lock=asyncio.Lock()
+        self.description=cursor.description
+
+    async def _fetch(self,func,*args):
+        #-------------------------------------------------------
+        # Function: _fetch
+        # Desc: Run a fetch on the fetch thread pool. If the task
+        #       is cancelled while waiting the fetch is cancelled too.
+        # :param self: Pointer to object instance.
+        # :param func: Cursor fetch method
+        # :return: Fetch result
+        #-------------------------------------------------------
+        async with self._lock:
+           if self._closed:
+              raise Exception("Cursor is closed")
+           try:
+              return await self._owner._runfetch(func,*args)
+           except asyncio.CancelledError:
+              try:
+                 self._cursor.cancel()
+              except Exception:
+                 pass
+              raise
+
+    async def fetchone(self):
+        row=await self._fetch(self._cursor.fetchone)
+        if row == None:
+           await self.close()
+        return row
+
+    async def fetchmany(self,size=None):
+        if size == None:
+           size=self._cursor.arraysize
+        rows=await self._fetch(self._cursor.fetchmany,size)
+        if len(rows) < size:
+           await self.close()
+        return rows
+
+    async def fetchall(self):
+        rows=await self._fetch(self._cursor.fetchall)
+        await self.close()
+        return rows
+
+    async def close(self):
+        async with self._lock:
+           if self._closed:
+              return
+           self._closed=True
+           await self._owner._runfetch(self._cursor.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self,exc_type,exc,tb):
+        await self.close()
+        return False
+
+class DbAsyncIterator():
+    #-------------------------------------------------------
+    # Class: DbAsyncIterator
+    # Desc: Async iterator over a generator returned by a database
+    #       method such as iter_qcustcdt or iter_records. The first
+    #       step, which usually runs the query, takes a concurrency
+    #       slot. Later steps run on the fetch thread pool and read
+    #       about batchrows rows per step so the event loop is never
+    #       blocked by a fetch. Blocks yielded by chunk generators
+    #       count as their number of rows.
+    #       async for row in await adb.iter_qcustcdt("state=?",parms=["MN"]):
+    #-------------------------------------------------------
+
+    # Rows read per step on the fetch thread pool
+    batchrows=1000
+
+    def __init__(self,owner,generator):
+        self._owner=owner
+        self._generator=generator
+        self._pending=[]
+        self._started=False
+        self._done=False
+        self._lock=asyncio.Lock()
+
+    def _step(self):
+        #-------------------------------------------------------
+        # Function: _step
+        # Desc: Read the next items from the generator. Runs on a
+        #       database thread.
+        # :param self: Pointer to object instance.
+        # :return: List of items. Empty when the generator is done.
+        #-------------------------------------------------------
+        items=[]
+        rows=0
+        for item in self._generator:
+            items.append(item)
+            rows += len(item) if isinstance(item,list) else 1
+            if rows >= self.batchrows:
+               break
+        return items
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        async with self._lock:
+           if len(self._pending) == 0 and not self._done:
+              if not self._started:
+                 self._started=True
+                 async with self._owner._semaphore:
+                    items=await self._owner._runheld(self._step)
+              else:
+                 items=await self._owner._runfetch(self._step)
+              if len(items) == 0:
+                 self._done=True
+              self._pending=items[::-1]
+           if len(self._pending) == 0:
+              raise StopAsyncIteration
+           return self._pending.pop()
+
+    async def aclose(self):
+        #-------------------------------------------------------
+        # Function: aclose
+        # Desc: Stop early and close the generator and its cursor
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        async with self._lock:
+           self._done=True
+           self._pending=[]
+           await self._owner._runfetch(self._generator.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self,exc_type,exc,tb):
+        await self.aclose()
+        return False
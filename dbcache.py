@@ -0,0 +1,395 @@
+#-------------------------------------------------------
+# Module: dbcache.py
+# Desc: This module contains an opt-in query result cache
+#       for the DbIbmiOdbc class. Results are keyed by the
+#       normalized SQL text plus parameter values, expire
+#       after a TTL and are evicted least recently used
+#       first when the entry or byte limit is reached.
+#       Entries for a table are dropped automatically when
+#       an action statement (insert, update, delete, merge
+#       etc) runs against that table through DbIbmiOdbc.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Per table generation counters so a result read before an
+#              invalidation is not stored after it
+# 10/18/2026 - Queries with unhashable parameter values skip the cache
+#
+# Usage:
+# db.enable_cache(ttl=60,maxentries=5000,maxbytes=50000000)
+# cursor1 = db.execute_query(sql,parms) # Cached when repeated
+# print(db.getcachestats())
+#
+# Note: Changes made outside this process or by SQL that
+# does not pass through DbIbmiOdbc are not seen until the
+# TTL expires. Only cache reference data that can tolerate that.
+#-------------------------------------------------------
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Quoted string literals and delimited identifiers are kept as is
+_quotedregex=re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+
+# Table references following these keywords
+_tableregex=re.compile(r"\b(?:from|join|into|update|table)\s+((?:\"[^\"]+\"|[\w#@$]+)(?:\s*[./]\s*(?:\"[^\"]+\"|[\w#@$]+))?)",re.IGNORECASE)
+
+# Statements that change data or definitions
+_actionregex=re.compile(r"^\s*(insert|update|delete|merge|truncate|alter|drop|create|rename|label|comment|grant|revoke|call)\b",re.IGNORECASE)
+
+def normalizesql(sql):
+    #----------------------------------------------------------
+    # Function: normalizesql
+    # Desc: Normalize SQL text for use as a cache key. Whitespace is
+    #       collapsed and text is lower cased outside of quoted
+    #       literals and delimited identifiers.
+    # :param sql: SQL statement
+    # :return: Normalized SQL
+    #----------------------------------------------------------
+    parts=[]
+    pos=0
+    for match in _quotedregex.finditer(sql):
+        parts.append(" ".join(sql[pos:match.start()].split()).lower())
+        parts.append(match.group(0))
+        pos=match.end()
+    parts.append(" ".join(sql[pos:].split()).lower())
+    return " ".join([part for part in parts if part != ""])
+
+def gettables(sql):
+    #----------------------------------------------------------
+    # Function: gettables
+    # Desc: Get the base table names referenced by an SQL statement.
+    #       Library qualifiers are dropped so qiws.qcustcdt, QIWS/QCUSTCDT
+    #       and an unqualified qcustcdt all map to qcustcdt. This can
+    #       over match across libraries, which only costs extra misses.
+    # :param sql: SQL statement
+    # :return: Set of lower case table names
+    #----------------------------------------------------------
+    # Blank out string literals so their contents are not matched
+    stripped=re.sub(r"'(?:[^']|'')*'","''",sql)
+    tables=set()
+    for match in _tableregex.finditer(stripped):
+        name=re.split(r"\s*[./]\s*",match.group(1))[-1]
+        if name.startswith('"'):
+           name=name.strip('"')
+        else:
+           name=name.lower()
+        tables.add(name)
+    return tables
+
+def isactionsql(sql):
+    #----------------------------------------------------------
+    # Function: isactionsql
+    # Desc: Check if an SQL statement can change table data
+    # :param sql: SQL statement
+    # :return: True-Action statement, False-Query
+    #----------------------------------------------------------
+    return _actionregex.match(sql) != None
+
+def _estimatesize(rows):
+    #----------------------------------------------------------
+    # Function: _estimatesize
+    # Desc: Rough memory size of a list of rows in bytes
+    # :param rows: List of rows
+    # :return: Estimated bytes
+    #----------------------------------------------------------
+    size=sys.getsizeof(rows)
+    for row in rows:
+        size += 64
+        for value in row:
+            size += sys.getsizeof(value)
+    return size
+
+class _DbCacheEntry():
+    #-------------------------------------------------------
+    # Class: _DbCacheEntry
+    # Desc: One cached result set
+    #-------------------------------------------------------
+    __slots__=("description","rows","expires","size","tables")
+
+    def __init__(self,description,rows,expires,size,tables):
+        self.description=description
+        self.rows=rows
+        self.expires=expires
+        self.size=size
+        self.tables=tables
+
+class DbQueryCache():
+
+    def __init__(self,ttl=60,maxentries=1000,maxbytes=None,maxrows=10000):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. A cache can be shared by many DbIbmiOdbc
+        #       instances in the same process.
+        # :param self: Object instance
+        # :param ttl: Seconds a result stays valid. Default=60
+        # :param maxentries: Maximum cached results. Default=1000
+        # :param maxbytes: Maximum estimated bytes of cached rows. None=No limit. Default=None
+        # :param maxrows: Results with more rows than this are not cached. Default=10000
+        #-------------------------------------------------------
+        self._ttl=ttl
+        self._maxentries=maxentries
+        self._maxbytes=maxbytes
+        self._maxrows=maxrows
+        self._lock=threading.Lock()
+        self._entries=OrderedDict()
+        self._bytes=0
+
+        # Invalidation counts by table and for clear(). A result is only
+        # stored if none of its tables were invalidated while it was read.
+        self._generations={}
+        self._cleared=0
+
+        # Counters exposed via stats()
+        self._hits=0
+        self._misses=0
+        self._evictions=0
+        self._expirations=0
+        self._invalidations=0
+        self._stale=0
+
+    def getmaxrows(self):
+        #-------------------------------------------------------
+        # Function: getmaxrows
+        # Desc: Get the largest result row count that will be cached
+        # :param self: Pointer to object instance.
+        # :return: Row limit
+        #-------------------------------------------------------
+        return self._maxrows
+
+    def makekey(self,sql,parms=None):
+        #-------------------------------------------------------
+        # Function: makekey
+        # Desc: Build the cache key for a query
+        # :param self: Pointer to object instance.
+        # :param sql: SQL query with ? markers
+        # :param parms: SQL parameter values or None
+        # :return: Hashable key or None when a parameter value is not
+        #  hashable (bytearray, list), in which case the query is not cached
+        #-------------------------------------------------------
+        if parms == None:
+           return (normalizesql(sql),())
+        key=(normalizesql(sql),tuple(parms))
+        try:
+           hash(key)
+        except TypeError:
+           return None
+        return key
+
+    def generation(self,sql):
+        #-------------------------------------------------------
+        # Function: generation
+        # Desc: Get the invalidation state of the tables a query reads.
+        #       Call before running the query and pass the result to put.
+        # :param self: Pointer to object instance.
+        # :param sql: SQL query
+        # :return: Opaque generation value
+        #-------------------------------------------------------
+        tables=gettables(sql)
+        with self._lock:
+            return (self._cleared,tuple([self._generations.get(table,0) for table in sorted(tables)]))
+
+    def _remove_locked(self,key):
+        #-------------------------------------------------------
+        # Function: _remove_locked
+        # Desc: Drop one entry. Caller must hold the lock.
+        # :param self: Pointer to object instance.
+        # :param key: Cache key
+        #-------------------------------------------------------
+        entry=self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self,key):
+        #-------------------------------------------------------
+        # Function: get
+        # Desc: Look up a cached result
+        # :param self: Pointer to object instance.
+        # :param key: Cache key from makekey
+        # :return: Tuple of (description,rows) or None on a miss
+        #-------------------------------------------------------
+        with self._lock:
+            entry=self._entries.get(key)
+            if entry == None:
+               self._misses += 1
+               return None
+            if time.monotonic() >= entry.expires:
+               self._remove_locked(key)
+               self._expirations += 1
+               self._misses += 1
+               return None
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.description,entry.rows
+
+    def put(self,key,sql,description,rows,generation=None):
+        #-------------------------------------------------------
+        # Function: put
+        # Desc: Store a result and evict least recently used entries
+        #       until the entry and byte limits are met. If any table of
+        #       the query was invalidated since generation was taken the
+        #       rows may predate the change and are not stored.
+        # :param self: Pointer to object instance.
+        # :param key: Cache key from makekey
+        # :param sql: SQL query, used to find the tables it reads
+        # :param description: Cursor description
+        # :param rows: List of rows
+        # :param generation: Value from generation() taken before the
+        #  query ran. None=Do not check. Default=None
+        # :return: True-Cached, False-Too large or stale
+        #-------------------------------------------------------
+        if len(rows) > self._maxrows:
+           return False
+        size=_estimatesize(rows)
+        if self._maxbytes != None and size > self._maxbytes:
+           return False
+        tables=gettables(sql)
+        entry=_DbCacheEntry(description,rows,time.monotonic() + self._ttl,size,tables)
+        with self._lock:
+            if generation != None and generation != (self._cleared,tuple([self._generations.get(table,0) for table in sorted(tables)])):
+               self._stale += 1
+               return False
+            if key in self._entries:
+               self._remove_locked(key)
+            self._entries[key]=entry
+            self._bytes += size
+            while len(self._entries) > self._maxentries or (self._maxbytes != None and self._bytes > self._maxbytes):
+                self._remove_locked(next(iter(self._entries)))
+                self._evictions += 1
+        return True
+
+    def invalidate(self,tables):
+        #-------------------------------------------------------
+        # Function: invalidate
+        # Desc: Drop every cached result that reads any of the tables
+        # :param self: Pointer to object instance.
+        # :param tables: Iterable of table names from gettables
+        # :return: Number of entries dropped
+        #-------------------------------------------------------
+        tables=set(tables)
+        if len(tables) == 0:
+           return 0
+        with self._lock:
+            for table in tables:
+                self._generations[table]=self._generations.get(table,0) + 1
+            keys=[key for key,entry in self._entries.items() if not entry.tables.isdisjoint(tables)]
+            for key in keys:
+                self._remove_locked(key)
+            self._invalidations += len(keys)
+            return len(keys)
+
+    def invalidatesql(self,sql):
+        #-------------------------------------------------------
+        # Function: invalidatesql
+        # Desc: Drop cached results affected by an action statement.
+        #       CALL can change any table so it clears the whole cache.
+        # :param self: Pointer to object instance.
+        # :param sql: SQL statement that ran
+        # :return: Number of entries dropped
+        #-------------------------------------------------------
+        if not isactionsql(sql):
+           return 0
+        if re.match(r"^\s*call\b",sql,re.IGNORECASE):
+           return self.clear()
+        return self.invalidate(gettables(sql))
+
+    def clear(self):
+        #-------------------------------------------------------
+        # Function: clear
+        # Desc: Drop all cached results
+        # :param self: Pointer to object instance.
+        # :return: Number of entries dropped
+        #-------------------------------------------------------
+        with self._lock:
+            count=len(self._entries)
+            self._cleared += 1
+            self._entries.clear()
+            self._bytes=0
+            self._invalidations += count
+            return count
+
+    def stats(self):
+        #-------------------------------------------------------
+        # Function: stats
+        # Desc: Get cache counters
+        # :param self: Pointer to object instance.
+        # :return: Dictionary of hits, misses, hitratio, entries, bytes etc
+        #-------------------------------------------------------
+        with self._lock:
+            lookups=self._hits + self._misses
+            return {"hits":self._hits,
+                    "misses":self._misses,
+                    "hitratio":self._hits / lookups if lookups > 0 else 0.0,
+                    "entries":len(self._entries),
+                    "bytes":self._bytes,
+                    "evictions":self._evictions,
+                    "expirations":self._expirations,
+                    "invalidations":self._invalidations,
+                    "stale":self._stale,
+                    "maxentries":self._maxentries,
+                    "maxbytes":self._maxbytes,
+                    "ttl":self._ttl}
+
+class DbCachedCursor():
+    #-------------------------------------------------------
+    # Class: DbCachedCursor
+    # Desc: Read only cursor over a list of rows. Returned by
+    #       DbIbmiOdbc.execute_query on a cache hit. When a result
+    #       was too large to cache, the rows already read are
+    #       served first and the rest come from the live cursor.
+    #-------------------------------------------------------
+
+    def __init__(self,description,rows,tail=None):
+        self.description=description
+        self.rowcount=-1
+        self.arraysize=1
+        self._rows=rows
+        self._pos=0
+        self._tail=tail
+
+    def fetchone(self):
+        if self._pos < len(self._rows):
+           row=self._rows[self._pos]
+           self._pos += 1
+           return row
+        if self._tail != None:
+           return self._tail.fetchone()
+        return None
+
+    def fetchmany(self,size=None):
+        if size == None:
+           size=self.arraysize
+        rows=self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        if len(rows) < size and self._tail != None:
+           rows=rows + self._tail.fetchmany(size - len(rows))
+        return rows
+
+    def fetchall(self):
+        rows=self._rows[self._pos:]
+        self._pos=len(self._rows)
+        if self._tail != None:
+           rows=rows + self._tail.fetchall()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row=self.fetchone()
+            if row == None:
+               return
+            yield row
+
+    def close(self):
+        self._pos=len(self._rows)
+        if self._tail != None:
+           self._tail.close()
+           self._tail=None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc,tb):
+        self.close()
+        return False
@@ -0,0 +1,243 @@
+#-------------------------------------------------------
+# Module: dbcolumnar.py
+# Desc: This module contains columnar fetch functions that
+#       read query results block by block straight into
+#       typed column buffers instead of keeping a list of
+#       pyodbc Row objects. Numeric columns are stored in
+#       compact array.array buffers (int64/float64) and can
+#       be returned as NumPy arrays or a PyArrow table.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Fixed Arrow types for date/time/binary columns so
+#              Parquet row groups share one schema
+# 10/18/2026 - NumPy string columns no longer truncated to the declared size
+#
+# Type mapping from cursor.description:
+# int, NUMERIC/DECIMAL with scale 0 and precision <= 18 -> int64
+# float, NUMERIC/DECIMAL with scale > 0 -> float64
+#        (or decimal128 when decimals="decimal")
+# str (CHAR/VARCHAR) -> fixed width string, trailing blanks trimmed
+# anything else (dates, timestamps, binary) -> object
+#        (date32, timestamp, time64 or binary in Arrow)
+#
+# NumPy and PyArrow are optional and only needed for the
+# function that returns that format.
+# pip install numpy pyarrow
+#-------------------------------------------------------
+import array
+import datetime
+import decimal
+
+try:
+   import numpy as np
+except ImportError:
+   np=None
+
+try:
+   import pyarrow as pa
+except ImportError:
+   pa=None
+
+class DbColumnBuffer():
+    #-------------------------------------------------------
+    # Class: DbColumnBuffer
+    # Desc: Append only typed buffer for one result column
+    #       with a null mask that is only created when a null
+    #       value is actually seen.
+    #-------------------------------------------------------
+
+    def __init__(self,description,decimals="float",trim=True):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. Picks the buffer type from the column
+        #       description.
+        # :param self: Object instance
+        # :param description: One cursor.description entry
+        # :param decimals: float=NUMERIC/DECIMAL as float64.
+        #        decimal=Keep exact Decimal values. Default=float
+        # :param trim: Trim trailing blanks from CHAR values. Default=True
+        #-------------------------------------------------------
+        self.name=description[0]
+        self.typecode=description[1]
+        self.size=description[3]
+        self.precision=description[4]
+        self.scale=description[5]
+        self.trim=trim
+        self.nulls=None
+        self.count=0
+
+        if self.typecode == int or (self.typecode == decimal.Decimal and self.scale == 0
+                                    and self.precision != None and self.precision <= 18):
+           self.kind="int"
+           self.values=array.array("q")
+           self._missing=0
+        elif self.typecode == float or (self.typecode == decimal.Decimal and decimals == "float"):
+           self.kind="float"
+           self.values=array.array("d")
+           self._missing=float("nan")
+        elif self.typecode == decimal.Decimal:
+           self.kind="decimal"
+           self.values=[]
+           self._missing=None
+        elif self.typecode == str:
+           self.kind="str"
+           self.values=[]
+           self._missing=""
+        else:
+           self.kind="object"
+           self.values=[]
+           self._missing=None
+
+    def append(self,rows,index):
+        #-------------------------------------------------------
+        # Function: append
+        # Desc: Append one column of a block of rows
+        # :param self: Pointer to object instance.
+        # :param rows: List of rows
+        # :param index: Column position in the row
+        #-------------------------------------------------------
+        values=[row[index] for row in rows]
+
+        # Null handling only costs anything when nulls exist
+        if None in values:
+           if self.nulls == None:
+              self.nulls=bytearray(self.count)
+           self.nulls.extend([1 if value == None else 0 for value in values])
+           values=[self._missing if value == None else value for value in values]
+        elif self.nulls != None:
+           self.nulls.extend(bytes(len(values)))
+
+        if self.kind == "int":
+           self.values.extend([int(value) for value in values])
+        elif self.kind == "float":
+           self.values.extend([float(value) for value in values])
+        elif self.kind == "str" and self.trim:
+           self.values.extend([value.rstrip(" ") for value in values])
+        else:
+           self.values.extend(values)
+        self.count += len(values)
+
+    def tonumpy(self):
+        #-------------------------------------------------------
+        # Function: tonumpy
+        # Desc: Convert the buffer to a NumPy array. Integer and string
+        #       columns with nulls are returned as masked arrays.
+        # :param self: Pointer to object instance.
+        # :return: numpy array
+        #-------------------------------------------------------
+        if self.kind == "int":
+           values=np.frombuffer(self.values,dtype=np.int64) if self.count > 0 else np.zeros(0,dtype=np.int64)
+        elif self.kind == "float":
+           values=np.frombuffer(self.values,dtype=np.float64) if self.count > 0 else np.zeros(0,dtype=np.float64)
+        elif self.kind == "str":
+           # Width comes from the longest value, not the declared column
+           # size, so values longer than the description are not cut off
+           values=np.array(self.values,dtype=str) if self.count > 0 else np.zeros(0,dtype="U1")
+        else:
+           values=np.empty(self.count,dtype=object)
+           values[:]=self.values
+        if self.nulls != None and self.kind != "float":
+           return np.ma.MaskedArray(values,mask=np.frombuffer(bytes(self.nulls),dtype=np.bool_))
+        return values
+
+    def arrowtype(self):
+        #-------------------------------------------------------
+        # Function: arrowtype
+        # Desc: Get the PyArrow type for the column. The type comes from
+        #       the description only, so every block of a query maps to
+        #       the same type even when a block is all nulls.
+        # :param self: Pointer to object instance.
+        # :return: pyarrow DataType
+        #-------------------------------------------------------
+        if self.kind == "int":
+           return pa.int64()
+        if self.kind == "float":
+           return pa.float64()
+        if self.kind == "decimal":
+           if self.precision == None or self.scale == None:
+              return pa.string()
+           return pa.decimal128(self.precision,self.scale)
+        if self.kind == "str":
+           return pa.string()
+        if self.typecode == datetime.datetime:
+           return pa.timestamp("us")
+        if self.typecode == datetime.date:
+           return pa.date32()
+        if self.typecode == datetime.time:
+           return pa.time64("us")
+        if self.typecode in (bytes,bytearray):
+           return pa.binary()
+        if self.typecode == bool:
+           return pa.bool_()
+        return pa.string()
+
+    def toarrow(self):
+        #-------------------------------------------------------
+        # Function: toarrow
+        # Desc: Convert the buffer to a PyArrow array
+        # :param self: Pointer to object instance.
+        # :return: pyarrow Array
+        #-------------------------------------------------------
+        mask=None
+        if self.nulls != None:
+           mask=np.frombuffer(bytes(self.nulls),dtype=np.bool_) if np != None else [b == 1 for b in self.nulls]
+        if self.kind == "int":
+           values=np.frombuffer(self.values,dtype=np.int64) if np != None and self.count > 0 else self.values.tolist()
+           return pa.array(values,type=pa.int64(),mask=mask)
+        if self.kind == "float":
+           values=np.frombuffer(self.values,dtype=np.float64) if np != None and self.count > 0 else self.values.tolist()
+           return pa.array(values,type=pa.float64(),mask=mask)
+        arrowtype=self.arrowtype()
+        values=self.values
+        if arrowtype == pa.string() and self.kind != "str":
+           values=[None if value == None else str(value) for value in values]
+        return pa.array(values,type=arrowtype,mask=mask)
+
+def read_columns(cursor,chunksize=10000,decimals="float",trim=True):
+    #----------------------------------------------------------
+    # Function: read_columns
+    # Desc: Read all rows from a query cursor into typed column
+    #       buffers, one fetchmany block at a time. The cursor is
+    #       closed when done.
+    # :param cursor: Open query cursor
+    # :param chunksize: Rows per fetchmany call. Default=10000
+    # :param decimals: float or decimal. See DbColumnBuffer. Default=float
+    # :param trim: Trim trailing blanks from CHAR values. Default=True
+    # :return: List of DbColumnBuffer in column order
+    #----------------------------------------------------------
+    try:
+       buffers=[DbColumnBuffer(desc,decimals,trim) for desc in cursor.description]
+       while True:
+           rows=cursor.fetchmany(chunksize)
+           if len(rows) == 0:
+              break
+           for index,buffer in enumerate(buffers):
+               buffer.append(rows,index)
+           if len(rows) < chunksize:
+              break
+       return buffers
+    finally:
+       cursor.close()
+
+def columns_to_numpy(buffers):
+    #----------------------------------------------------------
+    # Function: columns_to_numpy
+    # Desc: Convert column buffers to NumPy arrays
+    # :param buffers: List of DbColumnBuffer
+    # :return: Dictionary of column name to numpy array
+    #----------------------------------------------------------
+    if np == None:
+       raise ImportError("numpy is required for columnar NumPy results. pip install numpy")
+    return {buffer.name:buffer.tonumpy() for buffer in buffers}
+
+def columns_to_arrow(buffers):
+    #----------------------------------------------------------
+    # Function: columns_to_arrow
+    # Desc: Convert column buffers to a PyArrow table
+    # :param buffers: List of DbColumnBuffer
+    # :return: pyarrow Table
+    #----------------------------------------------------------
+    if pa == None:
+       raise ImportError("pyarrow is required for Arrow results. pip install pyarrow")
+    return pa.table([buffer.toarrow() for buffer in buffers],names=[buffer.name for buffer in buffers])
@@ -0,0 +1,333 @@
+#!/QOpenSys/pkgs/bin/python3
+#-------------------------------------------------------
+# Module: dbdaemon.py
+# Desc: This module contains a long running database daemon
+#       that keeps a warm pool of DbIbmiOdbc connections and
+#       serves DbApp method calls over a Unix domain socket.
+#       Short lived scripts connect with the thin client in
+#       dbdaemonclient.py and skip loading pyodbc and the
+#       ODBC connect on every run. Query results are streamed
+#       back to the client in blocks as they are fetched.
+#
+#       Each client connection gets its own DbApp instance on
+#       the shared pool, so getlasterror() etc are per client.
+#       Each call borrows a pooled connection and commits on
+#       its own. Transactions across calls are not supported.
+#
+#       The socket file is created with owner only access.
+#       Any local process running as that user can run SQL
+#       through the daemon with the daemon's credentials.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Stream column lists include size, precision and scale
+# 10/18/2026 - Optional statement fingerprint stats and slow query log
+#
+# Parameters:
+# --socket <path>        Unix socket path. Default=/tmp/dbibmiodbc.sock
+# --connstring <str>     ODBC connection string. Default=*LOCAL DSN below
+# --minsize <n>          Connections kept open. Default=2
+# --maxsize <n>          Maximum connections. Default=10
+# --chunksize <n>        Rows per streamed block. Default=1000
+# --querystats           Collect statement fingerprint stats for odbcquerystats.py
+# --slowseconds <n>      Log statements slower than n seconds. Implies --querystats
+# --slowlog <file>       Slow query log file. Default=stderr
+#
+# Ex: nohup python3 dbdaemon.py --socket /tmp/dbibmiodbc.sock &
+#     python3 odbcread_qcustcdt.py --daemon /tmp/dbibmiodbc.sock
+#-------------------------------------------------------
+import argparse
+import itertools
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from dbapp import DbApp
+from dbpool import DbConnectionPool
+from dbmetrics import DbMetrics
+from dbquerystats import DbQueryStats
+from dbdaemonclient import DEFAULT_SOCKET, encodeline, decodeline
+
+# Methods that manage connections or instance state and
+# are not available to clients
+_deniedmethods=set(["create_connection","close_connection","create_pool","use_pool","getpool",
+                    "getconn","getconnstring","transaction","enable_cache","use_cache",
+                    "disable_cache","enable_metrics","use_metrics","enable_metadata",
+                    "use_metadata","enable_querystats","use_querystats","getquerystats"])
+
+class _DbDaemonHandler(socketserver.StreamRequestHandler):
+    #-------------------------------------------------------
+    # Class: _DbDaemonHandler
+    # Desc: Serves the requests of one client connection
+    #-------------------------------------------------------
+
+    def handle(self):
+        daemon=self.server.daemon
+        db=daemon.newdb()
+        while True:
+            line=self.rfile.readline()
+            if line == b"":
+               break
+            try:
+               request=decodeline(line)
+            except Exception as e:
+               self._send({"ok":False,"error":f"Bad request: {e}"})
+               continue
+            daemon.count("requests")
+            try:
+               op=request.get("op")
+               if op == "call":
+                  self._call(db,request)
+               elif op == "ping":
+                  self._send({"ok":True,"result":{"pid":os.getpid(),"uptime":time.monotonic() - daemon.started}})
+               elif op == "stats":
+                  self._send({"ok":True,"result":daemon.stats()})
+               elif op == "querystats":
+                  self._send({"ok":True,"result":daemon.querystats(request.get("reset",False))})
+               elif op == "shutdown":
+                  self._send({"ok":True,"result":True})
+                  threading.Thread(target=daemon.shutdown,daemon=True).start()
+               else:
+                  self._send({"ok":False,"error":f"Unknown op {op}"})
+            except (BrokenPipeError,ConnectionResetError):
+               break
+            except Exception as e:
+               daemon.count("errors")
+               self._send({"ok":False,"error":str(e)})
+
+    def _send(self,message):
+        self.wfile.write(encodeline(message))
+
+    def _status(self,db,message):
+        #-------------------------------------------------------
+        # Function: _status
+        # Desc: Add the instance status values to a reply
+        #-------------------------------------------------------
+        message["lasterror"]=db.getlasterror()
+        message["lastsql"]=db.getlastsql()
+        message["rowsaffected"]=db.getlastrowsaffected()
+        return message
+
+    def _call(self,db,request):
+        #-------------------------------------------------------
+        # Function: _call
+        # Desc: Run one DbApp method and send its result. Cursors and
+        #       generators are streamed in blocks.
+        #-------------------------------------------------------
+        method=request.get("method","")
+        if method.startswith("_") or method in _deniedmethods or not callable(getattr(db,method,None)):
+           raise Exception(f"Method {method} is not available")
+        result=getattr(db,method)(*request.get("args",[]),**request.get("kwargs",{}))
+
+        if hasattr(result,"fetchmany"):
+           self._stream(db,result,result.description)
+        elif hasattr(result,"__next__") or hasattr(result,"iter_chunks"):
+           self._stream(db,result,None)
+        else:
+           self._send(self._status(db,{"ok":True,"result":result}))
+
+    def _stream(self,db,result,description):
+        #-------------------------------------------------------
+        # Function: _stream
+        # Desc: Send a cursor or generator result as blocks of rows
+        #-------------------------------------------------------
+        chunksize=self.server.daemon.chunksize
+        columns=[[desc[0],getattr(desc[1],"__name__","str"),desc[3],desc[4],desc[5]]
+                 for desc in description] if description else []
+        self._send({"ok":True,"stream":True,"columns":columns})
+        self.server.daemon.count("streams")
+        rowcount=0
+        try:
+           rowiter=iter(result)
+           while True:
+               if hasattr(result,"fetchmany"):
+                  rows=result.fetchmany(chunksize)
+               else:
+                  rows=list(itertools.islice(rowiter,chunksize))
+               if len(rows) == 0:
+                  break
+               self._send({"rows":[list(row) for row in rows]})
+               rowcount += len(rows)
+               if len(rows) < chunksize:
+                  break
+           self._send(self._status(db,{"end":True,"rowcount":rowcount}))
+        except (BrokenPipeError,ConnectionResetError):
+           raise
+        except Exception as e:
+           self.server.daemon.count("errors")
+           self._send({"end":True,"rowcount":rowcount,"error":str(e)})
+        finally:
+           # Hands a pooled connection back
+           if hasattr(result,"close"):
+              result.close()
+
+class _DbDaemonServer(socketserver.ThreadingMixIn,socketserver.UnixStreamServer):
+    daemon_threads=True
+
+class DbDaemon():
+
+    def __init__(self,db_connstring,socketpath=DEFAULT_SOCKET,minsize=2,maxsize=10,chunksize=1000,dbclass=DbApp,
+                 querystats=None):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. Opens the connection pool.
+        # :param self: Object instance
+        # :param db_connstring: ODBC connection string for IBM i
+        # :param socketpath: Unix socket path. Default=DEFAULT_SOCKET
+        # :param minsize: Connections kept open. Default=2
+        # :param maxsize: Maximum connections. Default=10
+        # :param chunksize: Rows per streamed block. Default=1000
+        # :param dbclass: DbIbmiOdbc subclass whose methods are served. Default=DbApp
+        # :param querystats: DbQueryStats shared by all clients. None=Off. Default=None
+        #-------------------------------------------------------
+        self.socketpath=socketpath
+        self.chunksize=chunksize
+        self.started=time.monotonic()
+        self._dbclass=dbclass
+        self._pool=DbConnectionPool(db_connstring,minsize=minsize,maxsize=maxsize)
+        self._server=None
+        self._lock=threading.Lock()
+        self._counters={"connections":0,"requests":0,"streams":0,"errors":0}
+        # One metrics object for all clients so the stats hook is added once
+        self._querystats=querystats
+        self._metrics=None
+        if querystats != None:
+           self._metrics=DbMetrics()
+           querystats.attach(self._metrics)
+
+    def newdb(self):
+        #-------------------------------------------------------
+        # Function: newdb
+        # Desc: Create the database instance for one client connection
+        # :param self: Pointer to object instance.
+        # :return: dbclass instance on the shared pool
+        #-------------------------------------------------------
+        self.count("connections")
+        db=self._dbclass(pool=self._pool)
+        if self._querystats != None:
+           db.use_metrics(self._metrics)
+           db.use_querystats(self._querystats)
+        return db
+
+    def count(self,name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        #-------------------------------------------------------
+        # Function: stats
+        # Desc: Get request counters and connection pool stats
+        # :param self: Pointer to object instance.
+        # :return: Dictionary
+        #-------------------------------------------------------
+        with self._lock:
+            counters=dict(self._counters)
+        counters["pool"]=self._pool.stats()
+        counters["uptime"]=time.monotonic() - self.started
+        return counters
+
+    def querystats(self,reset=False):
+        #-------------------------------------------------------
+        # Function: querystats
+        # Desc: Get statement fingerprint stats
+        # :param self: Pointer to object instance.
+        # :param reset: Clear the stats after reading them. Default=False
+        # :return: DbQueryStats snapshot dictionary. Raises an exception
+        #  if the daemon was started without stats.
+        #-------------------------------------------------------
+        if self._querystats == None:
+           raise Exception("Query stats are off. Start the daemon with --querystats")
+        snapshot=self._querystats.snapshot()
+        if reset:
+           self._querystats.reset()
+        return snapshot
+
+    def _removestale(self):
+        #-------------------------------------------------------
+        # Function: _removestale
+        # Desc: Remove a socket file left by a daemon that is no longer
+        #       running. Raises an exception if a daemon is answering.
+        #-------------------------------------------------------
+        if not os.path.exists(self.socketpath):
+           return
+        probe=socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        try:
+           probe.connect(self.socketpath)
+           raise Exception(f"A daemon is already listening on {self.socketpath}")
+        except (ConnectionRefusedError,FileNotFoundError):
+           os.unlink(self.socketpath)
+        finally:
+           probe.close()
+
+    def serve_forever(self):
+        #-------------------------------------------------------
+        # Function: serve_forever
+        # Desc: Listen on the socket until shutdown() is called
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        self._removestale()
+        oldmask=os.umask(0o177)
+        try:
+           self._server=_DbDaemonServer(self.socketpath,_DbDaemonHandler)
+        finally:
+           os.umask(oldmask)
+        self._server.daemon=self
+        try:
+           self._server.serve_forever()
+        finally:
+           self._server.server_close()
+           self._pool.close()
+           if os.path.exists(self.socketpath):
+              os.unlink(self.socketpath)
+
+    def shutdown(self):
+        #-------------------------------------------------------
+        # Function: shutdown
+        # Desc: Stop serving. Returns once serve_forever has stopped.
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        if self._server != None:
+           self._server.shutdown()
+
+#------------------------------------------------
+# Main script logic
+#------------------------------------------------
+def main():
+    # Run natively on IBM i as current user with *LOCAL DSN
+    odbcconnstring="DSN=*LOCAL;CommitMode=1;EXTCOLINFO=1;"
+
+    parser=argparse.ArgumentParser(description="Serve DbApp calls over a Unix socket.")
+    parser.add_argument("--socket",default=DEFAULT_SOCKET,help="Unix socket path")
+    parser.add_argument("--connstring",default=odbcconnstring,help="ODBC connection string")
+    parser.add_argument("--minsize",type=int,default=2,help="Connections kept open")
+    parser.add_argument("--maxsize",type=int,default=10,help="Maximum connections")
+    parser.add_argument("--chunksize",type=int,default=1000,help="Rows per streamed block")
+    parser.add_argument("--querystats",action="store_true",help="Collect statement fingerprint stats")
+    parser.add_argument("--slowseconds",type=float,default=None,help="Log statements slower than this")
+    parser.add_argument("--slowlog",default=None,help="Slow query log file. Default=stderr")
+    args=parser.parse_args()
+
+    querystats=None
+    if args.querystats or args.slowseconds != None:
+       querystats=DbQueryStats(slowseconds=args.slowseconds,slowlog=args.slowlog)
+
+    daemon=DbDaemon(args.connstring,args.socket,args.minsize,args.maxsize,args.chunksize,querystats=querystats)
+
+    # Stop cleanly on SIGTERM from the scheduler or kill
+    def stop(signum,frame):
+        threading.Thread(target=daemon.shutdown,daemon=True).start()
+    signal.signal(signal.SIGTERM,stop)
+
+    print(f"Listening on {args.socket}",file=sys.stderr)
+    try:
+       daemon.serve_forever()
+    except KeyboardInterrupt:
+       pass
+    print("Daemon stopped",file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+   sys.exit(main())
@@ -0,0 +1,349 @@
+#-------------------------------------------------------
+# Module: dbdaemonclient.py
+# Desc: This module contains a thin client for the database
+#       daemon in dbdaemon.py. It only imports the Python
+#       standard library, so a script in client mode starts
+#       without loading pyodbc or opening an ODBC connection.
+#       Any DbApp method can be called on the client as if it
+#       were a local DbApp instance. Query results are
+#       streamed back in blocks as they are fetched.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Cursor description includes size, precision and scale when sent
+# 10/18/2026 - Added querystats request
+#
+# Usage:
+# db = DbDaemonClient("/tmp/dbibmiodbc.sock")
+# cursor1 = db.query_qcustcdt("state=?",parms=["MN"])
+# for row in cursor1:
+#    print(row)
+# ok = db.insert_qcustcdt(...)
+# print(db.getlasterror())
+# db.close_connection()
+#
+# Protocol: one JSON request per line, answered by JSON lines.
+# {"op":"call","method":"...","args":[...],"kwargs":{...}}
+# -> {"ok":true,"result":...,"lasterror":"...","lastsql":"...","rowsaffected":n}
+# -> or {"ok":true,"stream":true,"columns":[[name,type,size,precision,scale],...]}
+#       {"rows":[[...],...]} ... {"end":true,"rowcount":n,...}
+# -> or {"ok":false,"error":"..."}
+# Decimal, date/time and bytes values are sent as tagged objects.
+#-------------------------------------------------------
+import base64
+import datetime
+import decimal
+import json
+import socket
+
+# Default socket path used by the daemon and the scripts
+DEFAULT_SOCKET="/tmp/dbibmiodbc.sock"
+
+# Type names sent in stream column lists
+_typenames={"str":str,"int":int,"float":float,"bool":bool,"Decimal":decimal.Decimal,
+            "date":datetime.date,"time":datetime.time,"datetime":datetime.datetime,
+            "bytes":bytes,"bytearray":bytearray}
+
+def encodevalue(value):
+    #----------------------------------------------------------
+    # Function: encodevalue
+    # Desc: json.dumps default function for values JSON can not hold
+    # :param value: Value
+    # :return: Tagged dictionary
+    #----------------------------------------------------------
+    if isinstance(value,decimal.Decimal):
+       return {"$dec":str(value)}
+    if isinstance(value,datetime.datetime):
+       return {"$dt":value.isoformat()}
+    if isinstance(value,datetime.date):
+       return {"$date":value.isoformat()}
+    if isinstance(value,datetime.time):
+       return {"$time":value.isoformat()}
+    if isinstance(value,(bytes,bytearray)):
+       return {"$bytes":base64.b64encode(value).decode("ascii")}
+    if isinstance(value,tuple) or hasattr(value,"__iter__"):
+       return list(value)
+    return str(value)
+
+def decodevalue(obj):
+    #----------------------------------------------------------
+    # Function: decodevalue
+    # Desc: json.loads object_hook that restores tagged values
+    # :param obj: Decoded JSON object
+    # :return: Value
+    #----------------------------------------------------------
+    if len(obj) == 1:
+       if "$dec" in obj:
+          return decimal.Decimal(obj["$dec"])
+       if "$dt" in obj:
+          return datetime.datetime.fromisoformat(obj["$dt"])
+       if "$date" in obj:
+          return datetime.date.fromisoformat(obj["$date"])
+       if "$time" in obj:
+          return datetime.time.fromisoformat(obj["$time"])
+       if "$bytes" in obj:
+          return base64.b64decode(obj["$bytes"])
+    return obj
+
+def encodeline(message):
+    #----------------------------------------------------------
+    # Function: encodeline
+    # Desc: Encode one protocol message
+    # :param message: Dictionary
+    # :return: UTF-8 bytes ending in a newline
+    #----------------------------------------------------------
+    return (json.dumps(message,default=encodevalue,separators=(",",":")) + "\n").encode("utf-8")
+
+def decodeline(line):
+    #----------------------------------------------------------
+    # Function: decodeline
+    # Desc: Decode one protocol message
+    # :param line: Bytes or str
+    # :return: Dictionary
+    #----------------------------------------------------------
+    return json.loads(line,object_hook=decodevalue)
+
+class DbDaemonError(Exception):
+    pass
+
+class DbDaemonCursor():
+    #-------------------------------------------------------
+    # Class: DbDaemonCursor
+    # Desc: Read only cursor over a result streamed by the daemon.
+    #       Supports description, fetchone, fetchmany, fetchall,
+    #       iteration and close like a pyodbc cursor.
+    #-------------------------------------------------------
+
+    def __init__(self,client,columns):
+        self._client=client
+        # Size, precision and scale follow the name and type
+        self.description=[(column[0],_typenames.get(column[1],str),None)
+                          + (tuple(column[2:5]) if len(column) >= 5 else (None,None,None)) + (True,)
+                          for column in columns]
+        self.rowcount=-1
+        self.arraysize=1
+        self._rows=[]
+        self._pos=0
+        self._done=False
+
+    def _more(self):
+        #-------------------------------------------------------
+        # Function: _more
+        # Desc: Read the next block of rows from the daemon
+        # :param self: Pointer to object instance.
+        # :return: True-Rows read, False-End of result
+        #-------------------------------------------------------
+        if self._done:
+           return False
+        message=self._client._readmessage()
+        if "rows" in message:
+           self._rows=message["rows"]
+           self._pos=0
+           return True
+        self._done=True
+        self._client._endstream(self,message)
+        return False
+
+    def fetchone(self):
+        while self._pos >= len(self._rows):
+            if not self._more():
+               return None
+        row=self._rows[self._pos]
+        self._pos += 1
+        return row
+
+    def fetchmany(self,size=None):
+        if size == None:
+           size=self.arraysize
+        rows=[]
+        while len(rows) < size:
+            if self._pos >= len(self._rows) and not self._more():
+               break
+            take=self._rows[self._pos:self._pos + size - len(rows)]
+            self._pos += len(take)
+            rows.extend(take)
+        return rows
+
+    def fetchall(self):
+        rows=self._rows[self._pos:]
+        self._pos=len(self._rows)
+        while self._more():
+            rows.extend(self._rows)
+            self._pos=len(self._rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row=self.fetchone()
+            if row == None:
+               return
+            yield row
+
+    def close(self):
+        # Read and drop the rest of the stream so the
+        # connection is ready for the next request
+        while self._more():
+            pass
+        self._rows=[]
+        self._pos=0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc,tb):
+        self.close()
+        return False
+
+class DbDaemonClient():
+
+    def __init__(self,socketpath=DEFAULT_SOCKET,timeout=None):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. Connects to the daemon.
+        # :param self: Object instance
+        # :param socketpath: Daemon Unix socket path. Default=DEFAULT_SOCKET
+        # :param timeout: Socket timeout in seconds. None=Wait forever. Default=None
+        #-------------------------------------------------------
+        self._socketpath=socketpath
+        self._sock=socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(socketpath)
+        self._file=self._sock.makefile("rb")
+        self._active=None
+        self._lasterror=""
+        self._lastsql=""
+        self._rowsaffected=0
+
+    def _readmessage(self):
+        line=self._file.readline()
+        if line == b"":
+           raise DbDaemonError("Daemon closed the connection")
+        return decodeline(line)
+
+    def _endstream(self,cursor,message):
+        #-------------------------------------------------------
+        # Function: _endstream
+        # Desc: Record the final status of a streamed result
+        #-------------------------------------------------------
+        if self._active is cursor:
+           self._active=None
+        self._setstatus(message)
+        if "error" in message:
+           raise DbDaemonError(message["error"])
+
+    def _setstatus(self,message):
+        self._lasterror=message.get("lasterror",message.get("error",""))
+        self._lastsql=message.get("lastsql","")
+        self._rowsaffected=message.get("rowsaffected",0)
+
+    def request(self,message):
+        #-------------------------------------------------------
+        # Function: request
+        # Desc: Send one request and read the reply
+        # :param self: Pointer to object instance.
+        # :param message: Request dictionary
+        # :return: Result value, or DbDaemonCursor for streamed results.
+        #  Raises DbDaemonError if the daemon could not run the request.
+        #-------------------------------------------------------
+        # Finish reading an unread stream first
+        if self._active != None:
+           self._active.close()
+        self._sock.sendall(encodeline(message))
+        reply=self._readmessage()
+        if not reply.get("ok",False):
+           self._lasterror=reply.get("error","")
+           raise DbDaemonError(self._lasterror)
+        if reply.get("stream",False):
+           self._active=DbDaemonCursor(self,reply["columns"])
+           return self._active
+        self._setstatus(reply)
+        return reply.get("result")
+
+    def call(self,method,*args,**kwargs):
+        #-------------------------------------------------------
+        # Function: call
+        # Desc: Call a DbApp method in the daemon
+        # :param self: Pointer to object instance.
+        # :param method: Method name. Ex: query_qcustcdt
+        # :return: Method result. Cursors and generators are returned as
+        #  a DbDaemonCursor.
+        #-------------------------------------------------------
+        return self.request({"op":"call","method":method,"args":list(args),"kwargs":kwargs})
+
+    def __getattr__(self,name):
+        # Anything not defined here is a remote DbApp method
+        if name.startswith("_"):
+           raise AttributeError(name)
+        def remote(*args,**kwargs):
+            return self.call(name,*args,**kwargs)
+        remote.__name__=name
+        return remote
+
+    def ping(self):
+        #-------------------------------------------------------
+        # Function: ping
+        # Desc: Check that the daemon is answering
+        # :param self: Pointer to object instance.
+        # :return: Dictionary of daemon pid and uptime
+        #-------------------------------------------------------
+        return self.request({"op":"ping"})
+
+    def stats(self):
+        #-------------------------------------------------------
+        # Function: stats
+        # Desc: Get daemon request counters and connection pool stats
+        # :param self: Pointer to object instance.
+        # :return: Dictionary
+        #-------------------------------------------------------
+        return self.request({"op":"stats"})
+
+    def querystats(self,reset=False):
+        #-------------------------------------------------------
+        # Function: querystats
+        # Desc: Get the daemon statement fingerprint stats. The daemon
+        #       must be started with --querystats.
+        # :param self: Pointer to object instance.
+        # :param reset: Clear the stats after reading them. Default=False
+        # :return: DbQueryStats snapshot dictionary
+        #-------------------------------------------------------
+        return self.request({"op":"querystats","reset":reset})
+
+    def shutdown(self):
+        #-------------------------------------------------------
+        # Function: shutdown
+        # Desc: Ask the daemon to stop
+        # :param self: Pointer to object instance.
+        # :return: True-Stop requested
+        #-------------------------------------------------------
+        return self.request({"op":"shutdown"})
+
+    def isopen(self):
+        try:
+           self.ping()
+           return True
+        except Exception:
+           return False
+
+    def getlasterror(self):
+        return self._lasterror
+
+    def getlastsql(self):
+        return self._lastsql
+
+    def getlastrowsaffected(self):
+        return self._rowsaffected
+
+    def close_connection(self):
+        #-------------------------------------------------------
+        # Function: close_connection
+        # Desc: Disconnect from the daemon. The daemon keeps its
+        #       database connections open for the next client.
+        # :param self: Pointer to object instance.
+        # :return: True-Closed
+        #-------------------------------------------------------
+        try:
+           self._file.close()
+           self._sock.close()
+        except Exception:
+           pass
+        return True
@@ -0,0 +1,508 @@
+#-------------------------------------------------------
+# Module: dbexport.py
+# Desc: This module contains streaming export functions
+#       that write the rows of an open query cursor to a
+#       file as they are fetched. Only one block of rows
+#       is held in memory at a time so exports run in
+#       constant memory regardless of table size.
+#
+# Update Info:
+# 10/18/2026 - Initial version. JSON array and NDJSON output.
+# 10/18/2026 - Optional trimming of CHAR columns from table metadata
+# 10/18/2026 - Added CSV (optionally gzip) and Parquet export with
+#              column selection
+# 10/18/2026 - Typed JSON value encoders from the cursor description and
+#              optional JSON encoding of row blocks in worker processes
+#
+# Parquet export requires pyarrow: pip install pyarrow
+#-------------------------------------------------------
+import csv
+import json
+import math
+import datetime
+import decimal
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from dbcolumnar import DbColumnBuffer
+
+try:
+   import pyarrow as pa
+   import pyarrow.parquet as pq
+except ImportError:
+   pa=None
+   pq=None
+
+def getcolumnnames(cursor):
+    #----------------------------------------------------------
+    # Function: getcolumnnames
+    # Desc: Get field metadata names from a cursor
+    # :param cursor: Open query cursor
+    # :return: List of column names
+    #----------------------------------------------------------
+    return [desc[0] for desc in cursor.description]
+
+def _jsonkeys(column_names):
+    #----------------------------------------------------------
+    # Function: _jsonkeys
+    # Desc: Encode each column name once as a ready to write JSON
+    #       object key prefix so rows don't need a dict per row.
+    #       Spacing matches json.dumps defaults.
+    # :param column_names: List of column names
+    # :return: List of encoded key prefixes
+    #----------------------------------------------------------
+    return [json.dumps(name) + ": " for name in column_names]
+
+def _jsonrow(keys,row):
+    #----------------------------------------------------------
+    # Function: _jsonrow
+    # Desc: Encode one row as a JSON object. Output matches
+    #       json.dumps(dict(zip(column_names,row)),default=str)
+    # :param keys: Encoded key prefixes from _jsonkeys
+    # :param row: Row values
+    # :return: JSON object string
+    #----------------------------------------------------------
+    return "{" + ", ".join([key + json.dumps(value,default=str) for key,value in zip(keys,row)]) + "}"
+
+# JSON string encoder used by json.dumps with default settings
+_encodestr=json.encoder.encode_basestring_ascii
+
+# Encoders built in each worker process, by column spec
+_workerencoders={}
+
+# Values sent to workers as their str() text. Pickling Decimal
+# costs more than encoding it, and str() matches default=str.
+_quotedtypes=(decimal.Decimal,datetime.date,datetime.datetime,datetime.time)
+
+def _jsonvalue(value):
+    return json.dumps(value,default=str)
+
+def _jsonkind(typecode):
+    #----------------------------------------------------------
+    # Function: _jsonkind
+    # Desc: Get the JSON encoder kind for a cursor description type
+    # :param typecode: cursor.description type code. Ex: decimal.Decimal
+    # :return: str, decimal, int, float, temporal or other
+    #----------------------------------------------------------
+    if typecode == str:
+       return "str"
+    if typecode == decimal.Decimal:
+       return "decimal"
+    if typecode == int:
+       return "int"
+    if typecode == float:
+       return "float"
+    if typecode in (datetime.date,datetime.datetime,datetime.time):
+       return "temporal"
+    return "other"
+
+def _jsonencoder(kind,trim=False):
+    #----------------------------------------------------------
+    # Function: _jsonencoder
+    # Desc: Get a value encoder for one column. Each encoder handles
+    #       the column type directly and passes any other value,
+    #       including None, to json.dumps so the output is the same
+    #       as json.dumps(value,default=str): Decimal, dates and times
+    #       become strings.
+    # :param kind: Kind from _jsonkind, or quoted for str() text of
+    #  values in _quotedtypes
+    # :param trim: True=Trim trailing blanks from strings. Default=False
+    # :return: Function of value returning JSON text
+    #----------------------------------------------------------
+    if kind == "str" and trim:
+       def encode(value):
+           if type(value) is str:
+              return _encodestr(value.rstrip(" "))
+           return "null" if value is None else _jsonvalue(value)
+    elif kind == "str":
+       def encode(value):
+           if type(value) is str:
+              return _encodestr(value)
+           return "null" if value is None else _jsonvalue(value)
+    elif kind == "decimal":
+       def encode(value):
+           if type(value) is decimal.Decimal:
+              return '"' + str(value) + '"'
+           return "null" if value is None else _jsonvalue(value)
+    elif kind == "int":
+       def encode(value):
+           if type(value) is int:
+              return int.__repr__(value)
+           return "null" if value is None else _jsonvalue(value)
+    elif kind == "float":
+       def encode(value):
+           if type(value) is float and math.isfinite(value):
+              return float.__repr__(value)
+           return "null" if value is None else _jsonvalue(value)
+    elif kind == "quoted":
+       def encode(value):
+           if type(value) is str:
+              return '"' + value + '"'
+           return "null" if value is None else _jsonvalue(value)
+    elif kind == "temporal":
+       temporaltypes=(datetime.date,datetime.datetime,datetime.time)
+       def encode(value):
+           if type(value) in temporaltypes:
+              return '"' + str(value) + '"'
+           return "null" if value is None else _jsonvalue(value)
+    elif trim:
+       def encode(value):
+           if type(value) is str:
+              value=value.rstrip(" ")
+           return _jsonvalue(value)
+    else:
+       encode=_jsonvalue
+    return encode
+
+def _jsonspec(column_names,description,trimindex):
+    #----------------------------------------------------------
+    # Function: _jsonspec
+    # Desc: Describe the exported columns for JSON encoding. The spec
+    #       is small and picklable so it can be sent to worker processes.
+    # :param column_names: Exported column names
+    # :param description: cursor.description entries of the exported columns
+    # :param trimindex: Column positions from _trimindex
+    # :return: Tuple of (names,kinds,trims)
+    #----------------------------------------------------------
+    return (tuple(column_names),
+            tuple([_jsonkind(desc[1]) for desc in description]),
+            tuple([i in trimindex for i in range(len(column_names))]))
+
+def _jsonencoders(spec):
+    #----------------------------------------------------------
+    # Function: _jsonencoders
+    # Desc: Build the key prefixes and value encoders for a spec
+    # :param spec: Spec from _jsonspec
+    # :return: Tuple of (keys,encoders)
+    #----------------------------------------------------------
+    names,kinds,trims=spec
+    return (_jsonkeys(names),[_jsonencoder(kind,trim) for kind,trim in zip(kinds,trims)])
+
+def _jsonblock(keys,encoders,rows,ndjson):
+    #----------------------------------------------------------
+    # Function: _jsonblock
+    # Desc: Encode a block of rows as JSON objects
+    # :param keys: Encoded key prefixes from _jsonkeys
+    # :param encoders: Value encoders from _jsonencoders
+    # :param rows: List of rows
+    # :param ndjson: True=One object per line. False=Comma separated.
+    # :return: JSON text for the block
+    #----------------------------------------------------------
+    objects=["{" + ", ".join([key + encode(value) for key,encode,value in zip(keys,encoders,row)]) + "}"
+             for row in rows]
+    if ndjson:
+       return "\n".join(objects) + "\n"
+    return ", ".join(objects)
+
+def _jsonworkerspec(spec):
+    #----------------------------------------------------------
+    # Function: _jsonworkerspec
+    # Desc: Get the spec used by workers for rows from _jsonworkerrows
+    # :param spec: Spec from _jsonspec
+    # :return: Spec with decimal and temporal columns as quoted
+    #----------------------------------------------------------
+    names,kinds,trims=spec
+    return (names,tuple(["quoted" if kind in ("decimal","temporal") else kind for kind in kinds]),trims)
+
+def _jsonworkerrows(rows):
+    #----------------------------------------------------------
+    # Function: _jsonworkerrows
+    # Desc: Convert a block of rows to tuples that pickle quickly.
+    #       Driver row objects may not pickle at all.
+    # :param rows: List of rows
+    # :return: List of tuples
+    #----------------------------------------------------------
+    return [tuple([str(value) if type(value) in _quotedtypes else value for value in row]) for row in rows]
+
+def _jsonworkerblock(spec,rows,ndjson):
+    #----------------------------------------------------------
+    # Function: _jsonworkerblock
+    # Desc: Encode a block of rows in a worker process. Encoders are
+    #       built once per worker and spec.
+    # :param spec: Spec from _jsonworkerspec
+    # :param rows: List of row tuples from _jsonworkerrows
+    # :param ndjson: True=One object per line
+    # :return: JSON text for the block
+    #----------------------------------------------------------
+    encoders=_workerencoders.get(spec)
+    if encoders == None:
+       encoders=_jsonencoders(spec)
+       _workerencoders[spec]=encoders
+    return _jsonblock(encoders[0],encoders[1],rows,ndjson)
+
+def _trimindex(column_names,trimcolumns):
+    #----------------------------------------------------------
+    # Function: _trimindex
+    # Desc: Get the positions of the columns to trim
+    # :param column_names: List of column names
+    # :param trimcolumns: Column names to trim or None
+    # :return: List of column positions
+    #----------------------------------------------------------
+    if not trimcolumns:
+       return []
+    trimset=set([name.upper() for name in trimcolumns])
+    return [i for i,name in enumerate(column_names) if name.upper() in trimset]
+
+def _selectindex(column_names,columns):
+    #----------------------------------------------------------
+    # Function: _selectindex
+    # Desc: Get the positions of the columns to export
+    # :param column_names: List of cursor column names
+    # :param columns: Column names to export in output order or None for all
+    # :return: List of column positions. Raises ValueError for an unknown column.
+    #----------------------------------------------------------
+    if not columns:
+       return list(range(len(column_names)))
+    positions=dict([(name.upper(),i) for i,name in enumerate(column_names)])
+    index=[]
+    for name in columns:
+        if name.strip().upper() not in positions:
+           raise ValueError(f"Column {name} is not in the query results")
+        index.append(positions[name.strip().upper()])
+    return index
+
+def _selectrows(rows,selectindex,count):
+    #----------------------------------------------------------
+    # Function: _selectrows
+    # Desc: Pick the exported columns from a block of rows
+    # :param rows: List of rows
+    # :param selectindex: Column positions from _selectindex
+    # :param count: Number of columns in the cursor
+    # :return: List of rows
+    #----------------------------------------------------------
+    if selectindex == list(range(count)):
+       return rows
+    return [[row[i] for i in selectindex] for row in rows]
+
+def _trimrows(rows,trimindex):
+    #----------------------------------------------------------
+    # Function: _trimrows
+    # Desc: Trim trailing blanks from selected columns of a block of rows
+    # :param rows: List of rows
+    # :param trimindex: Column positions from _trimindex
+    # :return: List of rows
+    #----------------------------------------------------------
+    if len(trimindex) == 0:
+       return rows
+    trimmed=[]
+    for row in rows:
+        values=list(row)
+        for i in trimindex:
+            if values[i] != None:
+               values[i]=values[i].rstrip(" ")
+        trimmed.append(values)
+    return trimmed
+
+def export_json(cursor,outfile,ndjson=False,chunksize=1000,rootname="records",trimcolumns=None,columns=None,
+                workers=0):
+    #----------------------------------------------------------
+    # Function: export_json
+    # Desc: Stream all rows from a query cursor to a file as JSON.
+    #       Column names and value encoders are set up from the cursor
+    #       once and reused. Output is the same as json.dumps with
+    #       default=str. With workers, blocks are encoded in a pool
+    #       of processes while the next blocks are fetched, and written
+    #       in fetch order. At most two blocks per worker are in flight.
+    #       The cursor is closed when done.
+    # :param cursor: Open query cursor. Ex: from DbApp.query_qcustcdt
+    # :param outfile: Writable text file object. Ex: sys.stdout
+    # :param ndjson: True=Newline delimited JSON, one object per line.
+    #  False=Single JSON object with a rootname array. Default=False
+    # :param chunksize: Rows per fetchmany call and file write. Default=1000
+    # :param rootname: Name of the array in JSON array mode. Default=records
+    # :param trimcolumns: Column names to trim trailing blanks from. 
+    #  Ex: db.getcharcolumns("QCUSTCDT","QIWS"). Default=None
+    # :param columns: Column names to export in output order. None=All. Default=None
+    # :param workers: Worker processes for JSON encoding. 0 or 1=Encode in
+    #  this process. Use when the export is CPU bound. Default=0
+    # :return: Number of rows written
+    #----------------------------------------------------------
+    reccount=0
+    pool=None
+    try:
+       allnames=getcolumnnames(cursor)
+       selectindex=_selectindex(allnames,columns)
+       column_names=[allnames[i] for i in selectindex]
+       trimindex=_trimindex(column_names,trimcolumns)
+       spec=_jsonspec(column_names,[cursor.description[i] for i in selectindex],trimindex)
+       keys,encoders=_jsonencoders(spec)
+       pending=collections.deque()
+       if workers > 1:
+          pool=ProcessPoolExecutor(workers)
+          workerspec=_jsonworkerspec(spec)
+
+       def writeblock(text):
+           # Build one string per block so there is
+           # a single write call per fetch
+           if text == "":
+              return
+           if not ndjson and writeblock.written:
+              outfile.write(", ")
+           outfile.write(text)
+           writeblock.written=True
+       writeblock.written=False
+
+       if not ndjson:
+          outfile.write("{" + json.dumps(rootname) + ":[")
+
+       while True:
+           rows=cursor.fetchmany(chunksize)
+           if len(rows) == 0:
+              break
+           fetched=len(rows)
+           rows=_selectrows(rows,selectindex,len(allnames))
+
+           if pool == None:
+              writeblock(_jsonblock(keys,encoders,rows,ndjson))
+           else:
+              pending.append(pool.submit(_jsonworkerblock,workerspec,_jsonworkerrows(rows),ndjson))
+              if len(pending) >= workers * 2:
+                 writeblock(pending.popleft().result())
+           reccount += fetched
+
+           if fetched < chunksize:
+              break
+
+       while len(pending) > 0:
+           writeblock(pending.popleft().result())
+
+       if not ndjson:
+          outfile.write("]}\n")
+
+       return reccount
+    finally:
+       if pool != None:
+          pool.shutdown(cancel_futures=True)
+       cursor.close()
+
+def _csvconverters(description):
+    #----------------------------------------------------------
+    # Function: _csvconverters
+    # Desc: Get a value converter for each column from the cursor
+    #       description. Numbers, Decimal, dates and strings are
+    #       written by the csv module as is. Binary is written as hex.
+    # :param description: cursor.description entries of the exported columns
+    # :return: List of column positions and converter functions
+    #----------------------------------------------------------
+    converters=[]
+    for i,desc in enumerate(description):
+        if desc[1] in (bytes,bytearray):
+           converters.append((i,lambda value: value.hex()))
+    return converters
+
+def export_csv(cursor,outfile,chunksize=1000,header=True,trimcolumns=None,columns=None,delimiter=","):
+    #----------------------------------------------------------
+    # Function: export_csv
+    # Desc: Stream all rows from a query cursor to a file as CSV.
+    #       Null values are written as empty fields.
+    #       The cursor is closed when done.
+    #       For gzip output open the file with 
+    #       gzip.open(path,"wt",encoding="utf-8",newline="")
+    # :param cursor: Open query cursor. Ex: from DbApp.query_qcustcdt
+    # :param outfile: Writable text file object opened with newline="". Ex: sys.stdout
+    # :param chunksize: Rows per fetchmany call and file write. Default=1000
+    # :param header: True=Write a column name header line. Default=True
+    # :param trimcolumns: Column names to trim trailing blanks from. Default=None
+    # :param columns: Column names to export in output order. None=All. Default=None
+    # :param delimiter: Field delimiter. Default=,
+    # :return: Number of rows written
+    #----------------------------------------------------------
+    reccount=0
+    try:
+       allnames=getcolumnnames(cursor)
+       selectindex=_selectindex(allnames,columns)
+       column_names=[allnames[i] for i in selectindex]
+       trimindex=_trimindex(column_names,trimcolumns)
+       converters=_csvconverters([cursor.description[i] for i in selectindex])
+       writer=csv.writer(outfile,delimiter=delimiter)
+
+       if header:
+          writer.writerow(column_names)
+
+       while True:
+           rows=cursor.fetchmany(chunksize)
+           if len(rows) == 0:
+              break
+           fetched=len(rows)
+           rows=_trimrows(_selectrows(rows,selectindex,len(allnames)),trimindex)
+           if len(converters) > 0:
+              rows=[list(row) for row in rows]
+              for row in rows:
+                  for i,convert in converters:
+                      if row[i] != None:
+                         row[i]=convert(row[i])
+
+           # One writerows call per fetch
+           writer.writerows(rows)
+           reccount += fetched
+
+           if fetched < chunksize:
+              break
+
+       return reccount
+    finally:
+       cursor.close()
+
+def export_parquet(cursor,path,chunksize=10000,rowgroupsize=100000,trimcolumns=None,columns=None,
+                   decimals="decimal",compression="snappy"):
+    #----------------------------------------------------------
+    # Function: export_parquet
+    # Desc: Stream all rows from a query cursor to a Parquet file.
+    #       Rows are fetched in blocks into typed column buffers and
+    #       written as one row group every rowgroupsize rows, so only
+    #       one row group is held in memory. Column types come from
+    #       the cursor description. See dbcolumnar for the mapping.
+    #       The cursor is closed when done. Requires pyarrow.
+    # :param cursor: Open query cursor. Ex: from DbApp.query_qcustcdt
+    # :param path: Output file path or writable binary file object
+    # :param chunksize: Rows per fetchmany call. Default=10000
+    # :param rowgroupsize: Rows per Parquet row group. Default=100000
+    # :param trimcolumns: Column names to trim trailing blanks from. 
+    #  None=Trim all CHAR/VARCHAR columns. Default=None
+    # :param columns: Column names to export in output order. None=All. Default=None
+    # :param decimals: decimal=NUMERIC/DECIMAL with scale as decimal128.
+    #  float=float64. Default=decimal
+    # :param compression: Parquet compression codec. Default=snappy
+    # :return: Number of rows written
+    #----------------------------------------------------------
+    reccount=0
+    writer=None
+    try:
+       if pq == None:
+          raise ImportError("pyarrow is required for Parquet export. pip install pyarrow")
+       allnames=getcolumnnames(cursor)
+       selectindex=_selectindex(allnames,columns)
+       trimset=None if trimcolumns == None else set([name.upper() for name in trimcolumns])
+
+       def newbuffers():
+           return [DbColumnBuffer(cursor.description[i],decimals,
+                                  trimset == None or allnames[i].upper() in trimset)
+                   for i in selectindex]
+
+       buffers=newbuffers()
+       schema=pa.schema([(buffer.name,buffer.arrowtype()) for buffer in buffers])
+       writer=pq.ParquetWriter(path,schema,compression=compression)
+
+       def writegroup(buffers):
+           writer.write_table(pa.table([buffer.toarrow() for buffer in buffers],schema=schema))
+
+       while True:
+           rows=cursor.fetchmany(chunksize)
+           if len(rows) == 0:
+              break
+           for buffer,index in zip(buffers,selectindex):
+               buffer.append(rows,index)
+           reccount += len(rows)
+           if buffers[0].count >= rowgroupsize:
+              writegroup(buffers)
+              buffers=newbuffers()
+           if len(rows) < chunksize:
+              break
+
+       if buffers[0].count > 0 or reccount == 0:
+          writegroup(buffers)
+
+       return reccount
+    finally:
+       if writer != None:
+          writer.close()
+       cursor.close()
@@ -7,6 +7,24 @@
 #
 # Update Info:
 # 4/29/2024 - Initial version 
+# 10/18/2026 - Optional connection pool. Methods borrow a
+#              connection per call when a pool is attached.
+# 10/18/2026 - Added executemany for batched parameter array inserts
+# 10/18/2026 - Added iter_query/iter_query_chunks streaming generators
+# 10/18/2026 - Named :parm parameters via sqlparams in addition to ? markers
+# 10/18/2026 - Added transaction() unit of work scope with savepoints
+# 10/18/2026 - Optional query result cache with write through invalidation
+# 10/18/2026 - Optional timing and metrics instrumentation via dbmetrics
+# 10/18/2026 - Added fetch_columns/query_arrow columnar fetch
+# 10/18/2026 - Added iter_records/query_records typed record rows
+# 10/18/2026 - Optional table metadata cache used for record classes and input sizes
+# 10/18/2026 - Added query_page keyset pagination
+# 10/18/2026 - Background prefetch for streamed queries via dbprefetch
+# 10/18/2026 - Query timeouts, deadlines and cancel via dbtimeout
+# 10/18/2026 - Optional statement fingerprint stats and slow query log via dbquerystats
+# 10/18/2026 - Optional read routing to a local dbmirror copy of slow changing tables
+# 10/18/2026 - Added newinstance for worker threads sharing this configuration
+# 10/18/2026 - Time limit released before the connection goes back to the pool
 #
 # Links:
 #
@@ -35,6 +53,23 @@
 import pyodbc as db2
 import uuid
 import sqlparams
+import itertools
+import threading
+import time
+import re
+from dbpool import DbConnectionPool, DbPooledCursor, DbPoolTimeout, isconnectionerror
+from dbcache import DbQueryCache, DbCachedCursor
+from dbmetrics import DbMetrics, DbMeteredCursor
+from dbcolumnar import read_columns, columns_to_numpy, columns_to_arrow
+from dbrecord import read_records, make_record_class
+from dbmetadata import DbMetadataCache, load_columns, getinputsizes, getcharcolumns
+from dbpage import parsekeys, page_sql, encodetoken, decodetoken
+from dbprefetch import DbPrefetchReader
+from dbtimeout import DbDeadline, DbQueryTimeout, DbTimedCursor, start_watch
+from dbquerystats import DbQueryStats
+
+# INSERT INTO lib.table (columns) VALUES(markers)
+_insertregex=re.compile(r"^\s*insert\s+into\s+([\w#@$\"./]+)\s*\(([^)]*)\)\s*values\s*\(([^)]*)\)\s*(?:with\s+nc)?\s*$",re.IGNORECASE)
 
 class DbIbmiOdbc():
  
@@ -45,20 +80,37 @@ class DbIbmiOdbc():
     _lasterror=""
     _lastsql=""
     _rowsaffected=0
+    _dbpool=None
+    _dbpoolowned=False
+    _dbcache=None
+    _dbmetrics=None
+    _dbmetadata=None
+    _querytimeout=None
+    _dbquerystats=None
+    _dbmirror=None
+    _mirrorstaleness=300
+    # Converts named :parm style SQL to ? markers for pyodbc
+    _namedparms=sqlparams.SQLParams("named","qmark")
 
-    def __init__(self,db_connstring=None):
+    def __init__(self,db_connstring=None,pool=None):
         #-------------------------------------------------------
         # Function: __init__
         # Desc: Constructor
         # :param self: Object instance
         # :param db_file: File name or default to None if no file 
         #        needs to be opened yet
+        # :param pool: Optional DbConnectionPool to borrow connections from.
+        #        A pool can be shared by many instances. Default=None
         # :return: Connection or None on error 
         #-------------------------------------------------------
+        # Open transaction scopes are tracked per thread
+        self._txlocal=threading.local()
         try:
            _dbopen=False
            _dbconn=None
-           if db_connstring != None and db_connstring != "":
+           if pool != None:
+              self.use_pool(pool)
+           elif db_connstring != None and db_connstring != "":
               self.create_connection(db_connstring)
            else:
               print("No ODBC connection string passed in. Need to create connection later.")
@@ -116,6 +168,9 @@ class DbIbmiOdbc():
         # :param self: Pointer to object instance. 
         # :return: True-Db is open, False=Db is not open
         #-------------------------------------------------------
+        #Pooled mode is open as long as the pool is open
+        if self._dbpool != None:
+           return not self._dbpool.isclosed()
         #return DB open status
         return self._dbopen
 
@@ -123,12 +178,689 @@ class DbIbmiOdbc():
         #-------------------------------------------------------
         # Function: getconn
         # Desc: Get database connection object 
+        # Note: In pooled mode there is no dedicated connection so
+        # this returns None. Use getpool() instead.
         # :param self: Pointer to object instance. 
         # :return: Connection value
         #-------------------------------------------------------
         #return conn object
         return self._dbconn
+
+    def getconnstring(self):
+        #-------------------------------------------------------
+        # Function: getconnstring
+        # Desc: Get the connection string used to open the connection 
+        #       or create the pool. Used to open extra connections.
+        # :param self: Pointer to object instance. 
+        # :return: Connection string or "" if not known
+        #-------------------------------------------------------
+        return self._dbconnstring
+
+    def getpool(self):
+        #-------------------------------------------------------
+        # Function: getpool
+        # Desc: Get connection pool object 
+        # :param self: Pointer to object instance. 
+        # :return: DbConnectionPool or None if not pooled
+        #-------------------------------------------------------
+        return self._dbpool
+
+    def use_pool(self,pool):
+        #-------------------------------------------------------
+        # Function: use_pool
+        # Desc: Attach an existing connection pool. The pool is not
+        #       closed by close_connection since other instances may
+        #       be sharing it.
+        # :param self: Pointer to object instance. 
+        # :param pool: DbConnectionPool instance
+        # :return: True-Pool attached
+        #-------------------------------------------------------
+        self._dbpool=pool
+        self._dbpoolowned=False
+        self._dbconnstring=pool.getconnstring()
+        self._dbopen=True
+        if self._dbmetrics != None:
+           pool.use_metrics(self._dbmetrics)
+        return True
+
+    def newinstance(self,pool=None):
+        #-------------------------------------------------------
+        # Function: newinstance
+        # Desc: Create an instance for another thread that shares this
+        #       instance's default query timeout, metrics, statement
+        #       stats, metadata cache, result cache and mirror, so work
+        #       done on worker threads is limited, measured and
+        #       invalidates the same way. Deadlines are per context,
+        #       so run the worker in contextvars.copy_context() to
+        #       carry them over.
+        # :param self: Pointer to object instance. 
+        # :param pool: DbConnectionPool to borrow from. Default=This instance's
+        #  pool, or a new connection from the connection string without one
+        # :return: DbIbmiOdbc instance
+        #-------------------------------------------------------
+        if pool == None:
+           pool=self._dbpool
+        if pool != None:
+           db=DbIbmiOdbc(pool=pool)
+        else:
+           db=DbIbmiOdbc(self._dbconnstring)
+        db._querytimeout=self._querytimeout
+        db._dbquerystats=self._dbquerystats
+        db.use_metrics(self._dbmetrics)
+        db._dbmetadata=self._dbmetadata
+        db._dbcache=self._dbcache
+        db._dbmirror=self._dbmirror
+        db._mirrorstaleness=self._mirrorstaleness
+        return db
+
+    def create_pool(self,db_connstring,minsize=1,maxsize=10,idletimeout=300,maxlifetime=3600,probeinterval=30,checkouttimeout=30):
+        #-------------------------------------------------------
+        # Function: create_pool
+        # Desc: Create a connection pool owned by this instance. 
+        #       See DbConnectionPool for parameter details.
+        # :param self: Pointer to object instance. 
+        # :param db_connstring: ODBC connection string for IBM i
+        # :param minsize: Connections kept open when idle. Default=1
+        # :param maxsize: Maximum open connections. Default=10
+        # :param idletimeout: Seconds before surplus idle connections close. Default=300
+        # :param maxlifetime: Seconds before a connection is replaced. Default=3600
+        # :param probeinterval: Idle seconds before a liveness probe. Default=30
+        # :param checkouttimeout: Seconds to wait for a free connection. Default=30
+        # :return: True-Pool open, False-Error 
+        #-------------------------------------------------------
+        try:
+           self._dbpool=DbConnectionPool(db_connstring,minsize=minsize,maxsize=maxsize,
+                                         idletimeout=idletimeout,maxlifetime=maxlifetime,
+                                         probeinterval=probeinterval,checkouttimeout=checkouttimeout)
+           self._dbpoolowned=True
+           self._dbconnstring=db_connstring
+           self._dbopen=True
+           if self._dbmetrics != None:
+              self._dbpool.use_metrics(self._dbmetrics)
+           return True
+        except Exception as e:
+            self._lasterror=str(e)
+            print(e)
+            return False
+
+    def _borrowconn(self,watch=None):
+        #-------------------------------------------------------
+        # Function: _borrowconn
+        # Desc: Get the connection to use for one call. Uses the
+        #       connection of the open transaction scope if any, 
+        #       checks out from the pool when pooled, otherwise 
+        #       returns the instance connection. Pair with _returnconn.
+        # :param self: Pointer to object instance. 
+        # :param watch: DbStatementWatch of the call. The pool wait is
+        #  limited to the time the call has left. Default=None
+        # :return: Connection
+        #-------------------------------------------------------
+        tx=self._currenttx()
+        if tx != None:
+           return tx._conn
+        if self._dbpool != None:
+           remaining=watch.remaining() if watch != None else None
+           if remaining == None or remaining >= self._dbpool.getcheckouttimeout():
+              return self._dbpool.checkout()
+           try:
+              return self._dbpool.checkout(remaining)
+           except DbPoolTimeout:
+              raise DbQueryTimeout(f"Query time limit of {watch.limit} seconds used up waiting for a pooled connection")
+        return self._dbconn
+
+    def _returnconn(self,conn,error=None):
+        #-------------------------------------------------------
+        # Function: _returnconn
+        # Desc: Give back a connection from _borrowconn. A pooled 
+        #       connection that failed with a connection level error 
+        #       is discarded instead of reused.
+        # :param self: Pointer to object instance. 
+        # :param conn: Connection from _borrowconn
+        # :param error: Exception raised while using it, if any
+        #-------------------------------------------------------
+        # Connection stays pinned while a transaction scope is open
+        tx=self._currenttx()
+        if tx != None and tx._conn is conn:
+           return
+        if self._dbpool != None and conn != None:
+           self._dbpool.checkin(conn,discard=error != None and isconnectionerror(error))
+
+    def _commit(self,conn):
+        #-------------------------------------------------------
+        # Function: _commit
+        # Desc: Commit after a statement unless a transaction scope is
+        #       open, in which case the commit happens at scope exit.
+        # :param self: Pointer to object instance. 
+        # :param conn: Connection to commit
+        # :return: True-Committed, False-Deferred to transaction scope
+        #-------------------------------------------------------
+        if self._currenttx() != None:
+           return False
+        conn.commit()
+        return True
+
+    def _rollback(self,conn):
+        #-------------------------------------------------------
+        # Function: _rollback
+        # Desc: Roll back after a failed statement without letting a
+        #       broken connection raise a second error. Inside a
+        #       transaction scope the scope is marked rollback only
+        #       and is rolled back when it exits.
+        # :param self: Pointer to object instance. 
+        # :param conn: Connection to roll back
+        #-------------------------------------------------------
+        tx=self._currenttx()
+        if tx != None:
+           tx.setrollbackonly()
+           return
+        try:
+           if conn != None:
+              conn.rollback()
+        except Exception as e:
+           print(e)
+
+    def _txstack(self):
+        #-------------------------------------------------------
+        # Function: _txstack
+        # Desc: Get the open transaction scopes for the current thread
+        # :param self: Pointer to object instance. 
+        # :return: List of DbTransaction, innermost last
+        #-------------------------------------------------------
+        stack=getattr(self._txlocal,"stack",None)
+        if stack == None:
+           stack=[]
+           self._txlocal.stack=stack
+        return stack
+
+    def _currenttx(self):
+        #-------------------------------------------------------
+        # Function: _currenttx
+        # Desc: Get the innermost open transaction scope for this thread
+        # :param self: Pointer to object instance. 
+        # :return: DbTransaction or None
+        #-------------------------------------------------------
+        stack=getattr(self._txlocal,"stack",None)
+        if stack:
+           return stack[-1]
+        return None
+
+    def intransaction(self):
+        #-------------------------------------------------------
+        # Function: intransaction
+        # Desc: Check if a transaction scope is open on this thread
+        # :param self: Pointer to object instance. 
+        # :return: True-Transaction open, False-No transaction
+        #-------------------------------------------------------
+        return self._currenttx() != None
+
+    def transaction(self):
+        #-------------------------------------------------------
+        # Function: transaction
+        # Desc: Start a unit of work. Statements run through execute, 
+        #       executeiwthparms, executemany and the DbApp methods
+        #       inside the scope share one connection and are committed
+        #       once when the scope exits instead of after each statement.
+        #       The scope is rolled back if an exception is raised or if
+        #       any statement in it fails. Nested scopes use savepoints
+        #       so an inner failure only undoes the inner work.
+        #       Requires commitment control (CommitMode=1 or higher).
+        #       Statements run with nocommit "with NC" are not part of
+        #       the unit of work.
+        #       with db.transaction() as tx:
+        #          db.insert_qcustcdt(...)
+        #          db.update_qcustcdt(...)
+        #       if tx.rolledback: print(db.getlasterror())
+        # :param self: Pointer to object instance. 
+        # :return: DbTransaction context manager
+        #-------------------------------------------------------
+        return DbTransaction(self)
     
+    def enable_cache(self,ttl=60,maxentries=1000,maxbytes=None,maxrows=10000):
+        #-------------------------------------------------------
+        # Function: enable_cache
+        # Desc: Turn on the query result cache for execute_query. 
+        #       Repeated queries with the same SQL and parameters are
+        #       served from memory until the TTL expires or an action
+        #       statement run through this class changes the table.
+        #       See DbQueryCache for details.
+        # :param self: Pointer to object instance. 
+        # :param ttl: Seconds a result stays valid. Default=60
+        # :param maxentries: Maximum cached results. Default=1000
+        # :param maxbytes: Maximum estimated bytes cached. None=No limit. Default=None
+        # :param maxrows: Larger results are not cached. Default=10000
+        # :return: True-Cache enabled
+        #-------------------------------------------------------
+        self._dbcache=DbQueryCache(ttl,maxentries,maxbytes,maxrows)
+        return True
+
+    def use_cache(self,cache):
+        #-------------------------------------------------------
+        # Function: use_cache
+        # Desc: Attach an existing DbQueryCache so several instances
+        #       share cached results and invalidations.
+        # :param self: Pointer to object instance. 
+        # :param cache: DbQueryCache instance or None to turn caching off
+        # :return: True-Cache attached
+        #-------------------------------------------------------
+        self._dbcache=cache
+        return True
+
+    def disable_cache(self):
+        #-------------------------------------------------------
+        # Function: disable_cache
+        # Desc: Turn off the query result cache
+        # :param self: Pointer to object instance. 
+        # :return: True-Cache disabled
+        #-------------------------------------------------------
+        self._dbcache=None
+        return True
+
+    def getcache(self):
+        #-------------------------------------------------------
+        # Function: getcache
+        # Desc: Get query result cache object 
+        # :param self: Pointer to object instance. 
+        # :return: DbQueryCache or None if caching is off
+        #-------------------------------------------------------
+        return self._dbcache
+
+    def getcachestats(self):
+        #-------------------------------------------------------
+        # Function: getcachestats
+        # Desc: Get query result cache hit/miss counters
+        # :param self: Pointer to object instance. 
+        # :return: Dictionary of counters or None if caching is off
+        #-------------------------------------------------------
+        if self._dbcache == None:
+           return None
+        return self._dbcache.stats()
+
+    def _invalidatecache(self,sql):
+        #-------------------------------------------------------
+        # Function: _invalidatecache
+        # Desc: Drop cached results for tables changed by an action 
+        #       statement, and cached metadata for tables changed by DDL.
+        #       Inside a transaction scope the statement is remembered
+        #       and invalidated again when the scope ends, since results
+        #       read before commit or rollback may be stale.
+        # :param self: Pointer to object instance. 
+        # :param sql: Action SQL statement that ran
+        #-------------------------------------------------------
+        if self._dbmetadata != None:
+           self._dbmetadata.invalidatesql(sql)
+        if self._dbmirror != None:
+           self._dbmirror.markdirty(sql)
+        if self._dbcache == None:
+           return
+        self._dbcache.invalidatesql(sql)
+        stack=self._txstack()
+        if len(stack) > 0:
+           stack[0]._actionsql.append(sql)
+
+    def enable_metadata(self,ttl=3600,maxtables=1000,source="odbc"):
+        #-------------------------------------------------------
+        # Function: enable_metadata
+        # Desc: Turn on the table metadata cache. Column definitions
+        #       are read from the catalog once per table and reused by
+        #       getcolumns, get_record_class and executemany input sizes.
+        #       See DbMetadataCache for details.
+        # :param self: Pointer to object instance. 
+        # :param ttl: Seconds a table definition stays valid. Default=3600
+        # :param maxtables: Maximum tables kept. Default=1000
+        # :param source: odbc=SQLColumns catalog call. syscolumns=QSYS2.SYSCOLUMNS. Default=odbc
+        # :return: True-Metadata cache enabled
+        #-------------------------------------------------------
+        self._dbmetadata=DbMetadataCache(ttl,maxtables,source)
+        return True
+
+    def use_metadata(self,metadata):
+        #-------------------------------------------------------
+        # Function: use_metadata
+        # Desc: Attach an existing DbMetadataCache so several instances
+        #       share table definitions.
+        # :param self: Pointer to object instance. 
+        # :param metadata: DbMetadataCache instance or None to turn it off
+        # :return: True-Metadata cache attached
+        #-------------------------------------------------------
+        self._dbmetadata=metadata
+        return True
+
+    def getmetadata(self):
+        #-------------------------------------------------------
+        # Function: getmetadata
+        # Desc: Get the table metadata cache object
+        # :param self: Pointer to object instance. 
+        # :return: DbMetadataCache or None if the metadata cache is off
+        #-------------------------------------------------------
+        return self._dbmetadata
+
+    def getcolumns(self,table,library,source=None):
+        #-------------------------------------------------------
+        # Function: getcolumns
+        # Desc: Get column definitions for a table. Served from the
+        #       metadata cache when enabled, otherwise read from the
+        #       catalog on every call.
+        # :param self: Pointer to object instance. 
+        # :param table: Table name. Ex: QCUSTCDT
+        # :param library: Library name. Ex: QIWS
+        # :param source: odbc or syscolumns. None=Cache setting or odbc. Default=None
+        # :return: List of DbColumn(name,typename,sqltype,size,scale,nullable,
+        #  ordinal,default,text) or None on error
+        #-------------------------------------------------------
+        conn1=None
+        error=None
+        try:
+           if self._dbmetadata != None:
+              columns=self._dbmetadata.get(table,library)
+              if columns != None:
+                 return columns
+              if source == None:
+                 source=self._dbmetadata.getsource()
+
+           token=self._metricsbegin("metadata",f"{library}.{table}")
+           start=time.perf_counter()
+           try:
+              conn1=self._borrowconn()
+              columns=load_columns(conn1,table,library,source or "odbc")
+           except Exception as e:
+              error=e
+              self._metricsend(token,None,1,e)
+              raise
+           self._metricsend(token,len(columns),1)
+
+           if self._dbmetadata != None:
+              self._dbmetadata.put(table,library,columns,time.perf_counter() - start)
+           return columns
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)
+            print(e)
+            return None
+        finally:
+            if conn1 != None:
+               self._returnconn(conn1,error)
+
+    def get_record_class(self,table,library,name=None):
+        #-------------------------------------------------------
+        # Function: get_record_class
+        # Desc: Get a record class for a table built from its column
+        #       definitions, with CHAR columns trimmed. Built once per
+        #       cached table definition when the metadata cache is on.
+        #       recs = db.query_records(sql,recordclass=db.get_record_class("QCUSTCDT","QIWS"))
+        # :param self: Pointer to object instance. 
+        # :param table: Table name
+        # :param library: Library name
+        # :param name: Class name. Default=table name in title case + Record
+        # :return: Record class or None on error
+        #-------------------------------------------------------
+        if name == None:
+           name=table.strip().title() + "Record"
+
+        def build(columns):
+            return make_record_class(name,[column.name for column in columns],
+                                     getcharcolumns(columns))
+
+        columns=self.getcolumns(table,library)
+        if columns == None:
+           return None
+        if self._dbmetadata != None:
+           recordclass=self._dbmetadata.getextra(table,library,f"recordclass:{name}",build)
+           if recordclass != None:
+              return recordclass
+        return build(columns)
+
+    def getcharcolumns(self,table,library):
+        #-------------------------------------------------------
+        # Function: getcharcolumns
+        # Desc: Get the names of the fixed length CHAR/GRAPHIC columns 
+        #       of a table. Ex: to trim them in exports.
+        # :param self: Pointer to object instance. 
+        # :param table: Table name
+        # :param library: Library name
+        # :return: List of column names or None on error
+        #-------------------------------------------------------
+        columns=self.getcolumns(table,library)
+        if columns == None:
+           return None
+        return getcharcolumns(columns)
+
+    def _getinputsizes(self,sql):
+        #-------------------------------------------------------
+        # Function: _getinputsizes
+        # Desc: Get setinputsizes values for an INSERT statement whose
+        #       markers map one to one to a column list, from cached
+        #       metadata. Anything else returns None so the driver
+        #       describes the parameters itself.
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL statement with ? markers
+        # :return: List of (sqltype,size,scale) or None
+        #-------------------------------------------------------
+        if self._dbmetadata == None:
+           return None
+        match=_insertregex.match(sql)
+        if match == None:
+           return None
+        names=match.group(2).split(",")
+        markers=match.group(3).split(",")
+        if len(names) != len(markers) or any([marker.strip() != "?" for marker in markers]):
+           return None
+        parts=re.split(r"\s*[./]\s*",match.group(1))
+        if len(parts) != 2:
+           return None
+        columns=self.getcolumns(parts[1].strip('"'),parts[0].strip('"'))
+        if columns == None:
+           return None
+        try:
+           return getinputsizes(columns,names)
+        except KeyError:
+           return None
+
+    def set_querytimeout(self,seconds):
+        #-------------------------------------------------------
+        # Function: set_querytimeout
+        # Desc: Set the default time limit for each execute, 
+        #       executeiwthparms, executemany and execute_query call.
+        #       A call that runs longer is cancelled and fails with
+        #       DbQueryTimeout. For a query the limit also covers
+        #       fetching the rows.
+        # :param self: Pointer to object instance. 
+        # :param seconds: Seconds or None for no limit
+        # :return: True-Timeout set
+        #-------------------------------------------------------
+        self._querytimeout=seconds
+        return True
+
+    def getquerytimeout(self):
+        #-------------------------------------------------------
+        # Function: getquerytimeout
+        # Desc: Get the default time limit per call
+        # :param self: Pointer to object instance. 
+        # :return: Seconds or None for no limit
+        #-------------------------------------------------------
+        return self._querytimeout
+
+    def deadline(self,seconds=None):
+        #-------------------------------------------------------
+        # Function: deadline
+        # Desc: Create a time budget for a group of calls. While it is
+        #       entered with a with statement every call in this thread
+        #       or asyncio task gets only the time left. Call cancel()
+        #       on it from another thread to stop the running statement.
+        #       Ex: with db.deadline(2.0): 
+        #              db.query_qcustcdt(...)
+        # :param self: Pointer to object instance. 
+        # :param seconds: Time budget in seconds. None=Cancel only. Default=None
+        # :return: DbDeadline
+        #-------------------------------------------------------
+        return DbDeadline(seconds)
+
+    def _startwatch(self,timeout):
+        #-------------------------------------------------------
+        # Function: _startwatch
+        # Desc: Start the time limit for one call
+        # :param self: Pointer to object instance. 
+        # :param timeout: Seconds passed to the call or None for the default
+        # :return: DbStatementWatch
+        #-------------------------------------------------------
+        return start_watch(timeout if timeout != None else self._querytimeout)
+
+    def enable_metrics(self,buckets=None,callerlabels=True):
+        #-------------------------------------------------------
+        # Function: enable_metrics
+        # Desc: Turn on timing and metrics for connect, execute, 
+        #       executeiwthparms, executemany, execute_query and fetch.
+        #       See DbMetrics for details.
+        # :param self: Pointer to object instance. 
+        # :param buckets: Latency bucket bounds in seconds. Default=dbmetrics.DEFAULT_BUCKETS
+        # :param callerlabels: Record calling method names. Default=True
+        # :return: True-Metrics enabled
+        #-------------------------------------------------------
+        if buckets == None:
+           metrics=DbMetrics(callerlabels=callerlabels)
+        else:
+           metrics=DbMetrics(buckets,callerlabels)
+        return self.use_metrics(metrics)
+
+    def use_metrics(self,metrics):
+        #-------------------------------------------------------
+        # Function: use_metrics
+        # Desc: Attach an existing DbMetrics so several instances
+        #       report into the same histograms. Also records new
+        #       connections opened by the attached pool.
+        # :param self: Pointer to object instance. 
+        # :param metrics: DbMetrics instance or None to turn metrics off
+        # :return: True-Metrics attached
+        #-------------------------------------------------------
+        self._dbmetrics=metrics
+        if self._dbpool != None:
+           self._dbpool.use_metrics(metrics)
+        if self._dbquerystats != None and metrics != None:
+           self._dbquerystats.attach(metrics)
+        return True
+
+    def getmetrics(self):
+        #-------------------------------------------------------
+        # Function: getmetrics
+        # Desc: Get metrics object. Use snapshot() or prometheus() on it.
+        # :param self: Pointer to object instance. 
+        # :return: DbMetrics or None if metrics are off
+        #-------------------------------------------------------
+        return self._dbmetrics
+
+    def enable_querystats(self,maxfingerprints=1000,slowseconds=None,slowlog=None,logparms=True):
+        #-------------------------------------------------------
+        # Function: enable_querystats
+        # Desc: Turn on per statement shape statistics and the slow
+        #       query log. Statements are grouped by fingerprint with
+        #       literals replaced by ? markers. Metrics are turned on
+        #       too since the statistics are fed by a metrics hook.
+        #       See DbQueryStats for details.
+        # :param self: Pointer to object instance. 
+        # :param maxfingerprints: Most fingerprints kept. Default=1000
+        # :param slowseconds: Log statements that take longer. None=No slow log. Default=None
+        # :param slowlog: Slow log file path or file object. Default=sys.stderr
+        # :param logparms: Include parameter values in the slow log. Default=True
+        # :return: True-Statistics enabled
+        #-------------------------------------------------------
+        return self.use_querystats(DbQueryStats(maxfingerprints,slowseconds,slowlog,logparms))
+
+    def use_querystats(self,querystats):
+        #-------------------------------------------------------
+        # Function: use_querystats
+        # Desc: Attach an existing DbQueryStats so several instances
+        #       report into the same table
+        # :param self: Pointer to object instance. 
+        # :param querystats: DbQueryStats instance
+        # :return: True-Statistics attached
+        #-------------------------------------------------------
+        self._dbquerystats=querystats
+        if self._dbmetrics == None:
+           self.enable_metrics()
+        else:
+           querystats.attach(self._dbmetrics)
+        return True
+
+    def use_mirror(self,mirror,maxstaleness=300):
+        #-------------------------------------------------------
+        # Function: use_mirror
+        # Desc: Attach a local table mirror. Queries run with
+        #       usemirror=True are answered from the mirror when every
+        #       table they read was refreshed within maxstaleness
+        #       seconds and has not been changed through this instance
+        #       since. See DbMirror for details.
+        # :param self: Pointer to object instance. 
+        # :param mirror: DbMirror instance or None to stop routing
+        # :param maxstaleness: Oldest mirror copy used in seconds. Default=300
+        # :return: True-Mirror attached
+        #-------------------------------------------------------
+        self._dbmirror=mirror
+        self._mirrorstaleness=maxstaleness
+        return True
+
+    def getmirror(self):
+        #-------------------------------------------------------
+        # Function: getmirror
+        # Desc: Get the attached table mirror
+        # :param self: Pointer to object instance. 
+        # :return: DbMirror or None if no mirror is attached
+        #-------------------------------------------------------
+        return self._dbmirror
+
+    def getquerystats(self):
+        #-------------------------------------------------------
+        # Function: getquerystats
+        # Desc: Get statement statistics. Use report(), top() or save() on it.
+        # :param self: Pointer to object instance. 
+        # :return: DbQueryStats or None if statistics are off
+        #-------------------------------------------------------
+        return self._dbquerystats
+
+    def _metricsbegin(self,op,sql=None,parms=None):
+        #-------------------------------------------------------
+        # Function: _metricsbegin
+        # Desc: Start timing an operation if metrics are enabled
+        # :param self: Pointer to object instance. 
+        # :param op: Operation name
+        # :param sql: SQL statement if any
+        # :param parms: SQL parameters if any
+        # :return: Token for _metricsend or None
+        #-------------------------------------------------------
+        if self._dbmetrics == None:
+           return None
+        return self._dbmetrics.begin(op,sql,parms)
+
+    def _metricsend(self,token,rows=None,roundtrips=1,error=None,cached=False):
+        #-------------------------------------------------------
+        # Function: _metricsend
+        # Desc: Record an operation started with _metricsbegin
+        # :param self: Pointer to object instance. 
+        # :param token: Token from _metricsbegin or None
+        # :param rows: Rows affected or fetched
+        # :param roundtrips: Server round trips made
+        # :param error: Exception if the operation failed
+        # :param cached: True if served from the result cache
+        #-------------------------------------------------------
+        if token != None:
+           self._dbmetrics.end(token,rows,roundtrips,error,cached)
+
+    def bindparms(self,sql,parms):
+        #-------------------------------------------------------
+        # Function: bindparms
+        # Desc: Convert SQL with named :parm parameters to ? parameter 
+        #       markers when parms is a dictionary. A list or tuple of 
+        #       parms for ? markers is passed through unchanged.
+        #       Ex: bindparms("select * from qiws.qcustcdt where state=:state",{"state":"MN"})
+        #       Note: Named parameters are not detected inside quoted literals
+        #       so avoid :name text in string constants.
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL statement
+        # :param parms: Dictionary of named parms, or list/tuple for ? markers
+        # :return: Tuple of (sql,parms) ready for pyodbc
+        #-------------------------------------------------------
+        if isinstance(parms,dict):
+           return self._namedparms.format(sql,parms)
+        return sql,parms
+
     def create_connection(self,db_connstring):
         #-------------------------------------------------------
         # Function: create_connection
@@ -142,16 +874,20 @@ class DbIbmiOdbc():
         conn = None 
 
         #Let's try and open the database. Will auto-create if not found.
+        token=self._metricsbegin("connect")
         try:
             conn = db2.connect(db_connstring)
+            self._metricsend(token)
 
             # Set open flag = true
             if conn != None:
                #Save open connection info internally in the class 
                self._dbopen=True 
                self._dbconn = conn
+               self._dbconnstring = db_connstring
             return self._dbopen;
         except Exception as e:
+            self._metricsend(token,error=e)
             print(e)
             return False
 
@@ -165,6 +901,14 @@ class DbIbmiOdbc():
 
         # Let's attempt to close our database connection 
         try:
+            # Pooled mode. Only close a pool we created ourselves.
+            if self._dbpool != None:
+               if self._dbpoolowned:
+                  self._dbpool.close()
+               self._dbpool=None
+               self._dbpoolowned=False
+               self._dbopen=False
+               return True
             self._dbconn.close()
             #Release object. Not sure if needed or automatic ?
             conn=None
@@ -174,7 +918,7 @@ class DbIbmiOdbc():
             print(e)
             return False
 
-    def execute(self,sql,nocommit=False,debug=False):
+    def execute(self,sql,nocommit=False,debug=False,timeout=None):
         #----------------------------------------------------------
         # Function: execute
         # Desc: Execute an SQL action query that does not return results
@@ -182,8 +926,13 @@ class DbIbmiOdbc():
         # :param sql: SQL action query
         # :param nocommit: Append "with NC" to end of SQL statment to avoid committment control
         #  True=append "with NC" to SQL for no commit. False=Perform commit. Default=False 
+        # :param timeout: Seconds before the statement is cancelled. 
+        #  Default=set_querytimeout value
         # :return: True-Success, False-Error. Records affected also set to -2 on errors
         #----------------------------------------------------------
+        conn1 = None
+        watch = None
+        token = self._metricsbegin("execute",sql)
         try:
             
             # Reset errors and rows affected
@@ -191,8 +940,9 @@ class DbIbmiOdbc():
             self._rowsaffected=0 # Reset rows affected
             self._lastsql=""
             
-            # Get connection
-            conn1 = self._dbconn
+            # Start the time limit and get connection
+            watch = self._startwatch(timeout)
+            conn1 = self._borrowconn(watch)
 
             # If no commit, add "with NC" to end of SQL
             if (nocommit): 
@@ -219,7 +969,7 @@ class DbIbmiOdbc():
             self._lastsql=sql
                 
             #Execute the action query                
-            results=conn1.execute(sql) 
+            results=watch.cursor(conn1).execute(sql) 
 
             #Save rows affected
             # https://github.com/mkleehammer/pyodbc/issues/829
@@ -228,19 +978,31 @@ class DbIbmiOdbc():
             # Commit transaction. 
             # Actual commit appears to be 
             # ignored if CommitMode=0 on connection
-            conn1.commit()
+            # Deferred when a transaction scope is open
+            committed=self._commit(conn1)
             
             # Print debug info if debug enabled
             if (debug):               
-                print("Transaction Commit") 
+                print("Transaction Commit" if committed else "Transaction Commit deferred") 
+
+            # Drop cached results for the changed table
+            self._invalidatecache(sql)
 
             self._lasterror="SQL execute action appears to have completed."
+
+            # Statement plus commit round trips
+            self._metricsend(token,self._rowsaffected,2 if committed else 1)
             
             return True
         except Exception as e:
+            # Report a cancelled statement as a timeout or cancel
+            if watch != None:
+               e=watch.translate(e)
+
             # Set error message
             self._lasterror=str(e)
             print(e)  
+            self._metricsend(token,None,1,e)
 
             # Set rows affected to -2 to indicate errors
             self._rowsaffected=-2
@@ -248,26 +1010,45 @@ class DbIbmiOdbc():
             # Roll back any changes                        
             # Actual rollback appears to be 
             # ignored if CommitMode=0 on connection
-            self._dbconn.rollback() 
+            self._rollback(conn1) 
 
             # Print debug info if debug enabled
             if (debug):               
                print("Transaction Rollback") 
 
+            # Stop the time limit, then hand back pooled connection
+            if watch != None:
+               watch.release()
+            self._returnconn(conn1,e)
+            conn1=None
+
             return False
+        finally:
+            # Stop the time limit before the connection can be
+            # borrowed again, then hand back pooled connection
+            if watch != None:
+               watch.release()
+            self._returnconn(conn1)
 
-    def executeiwthparms(self,sql,parms,nocommit=False,debug=False):
+    def executeiwthparms(self,sql,parms,nocommit=False,debug=False,timeout=None):
         #----------------------------------------------------------
         # Function: executewithparms
-        # TODO: Need to test with parameter markers.
-        # Desc: Execute an SQL action query that does not return results
+        # Desc: Execute an SQL action query that does not return results.
+        #       Use parameter markers instead of inlining values so the 
+        #       statement text is identical on every call and the server
+        #       can reuse its access plan.
         # :param self: Pointer to object instance. 
-        # :param sql: SQL action query
+        # :param sql: SQL action query with ? markers or named :parm parameters
         # :param nocommit: Append "with NC" to end of SQL statment to avoid committment control
         #  True=append "with NC" to SQL for no commit. False=Perform commit. Default=False 
-        # :param parms: SQL parameters array
+        # :param parms: SQL parameters array for ? markers or dictionary for named parameters
+        # :param timeout: Seconds before the statement is cancelled. 
+        #  Default=set_querytimeout value
         # :return: True-Success, False-Error. Records affected also set to -2 on errors
         #----------------------------------------------------------
+        conn1 = None
+        watch = None
+        token = self._metricsbegin("executeiwthparms",sql,parms)
         try:
             
             # Reset errors and rows affected
@@ -275,8 +1056,9 @@ class DbIbmiOdbc():
             self._rowsaffected=0 # Reset rows affected
             self._lastsql=""
             
-            # Get connection
-            conn1 = self._dbconn
+            # Start the time limit and get connection
+            watch = self._startwatch(timeout)
+            conn1 = self._borrowconn(watch)
 
             # If no commit, add "with NC" to end of SQL
             if (nocommit): 
@@ -299,11 +1081,14 @@ class DbIbmiOdbc():
             if (debug):               
                print("Transaction Begin") 
 
+            # Convert named parameters to ? markers
+            sql,parms=self.bindparms(sql,parms)
+
             # Save last SQL statement
             self._lastsql=sql
                 
             #Execute the action query with parameters
-            results=conn1.execute(sql,parms) 
+            results=watch.cursor(conn1).execute(sql,parms) 
 
             #Save rows affected
             # https://github.com/mkleehammer/pyodbc/issues/829
@@ -312,19 +1097,31 @@ class DbIbmiOdbc():
             # Commit transaction. 
             # Actual commit appears to be 
             # ignored if CommitMode=0 on connection
-            conn1.commit()
+            # Deferred when a transaction scope is open
+            committed=self._commit(conn1)
             
             # Print debug info if debug enabled
             if (debug):               
-                print("Transaction Commit") 
+                print("Transaction Commit" if committed else "Transaction Commit deferred") 
+
+            # Drop cached results for the changed table
+            self._invalidatecache(sql)
 
             self._lasterror="SQL executewithparms action appears to have completed."
+
+            # Statement plus commit round trips
+            self._metricsend(token,self._rowsaffected,2 if committed else 1)
            
             return True
         except Exception as e:
+            # Report a cancelled statement as a timeout or cancel
+            if watch != None:
+               e=watch.translate(e)
+
             # Set error message
             self._lasterror=str(e)
             print(e)  
+            self._metricsend(token,None,1,e)
 
             # Set rows affected to -2 to indicate errors
             self._rowsaffected=-2
@@ -332,35 +1129,281 @@ class DbIbmiOdbc():
             # Roll back any changes                        
             # Actual rollback appears to be 
             # ignored if CommitMode=0 on connection
-            self._dbconn.rollback() 
+            self._rollback(conn1) 
+
+            # Print debug info if debug enabled
+            if (debug):               
+               print("Transaction Rollback") 
+
+            # Stop the time limit, then hand back pooled connection
+            if watch != None:
+               watch.release()
+            self._returnconn(conn1,e)
+            conn1=None
+
+            return False
+        finally:
+            # Stop the time limit before the connection can be
+            # borrowed again, then hand back pooled connection
+            if watch != None:
+               watch.release()
+            self._returnconn(conn1)
+
+    def executemany(self,sql,rows,batchsize=1000,nocommit=False,fastexecutemany=True,debug=False,inputsizes=None,timeout=None,
+                    quiet=False):
+        #----------------------------------------------------------
+        # Function: executemany
+        # Desc: Execute an SQL action query with parameter markers once
+        #       for each row. Rows are sent to the server as parameter 
+        #       arrays of batchsize rows with a commit after each batch
+        #       instead of one round trip and commit per row.
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL action query with ? markers or named :parm parameters
+        # :param rows: Iterable of parameter sequences, or of dictionaries when
+        #  named parameters are used. Can be a generator.
+        # :param batchsize: Rows per parameter array and commit. Default=1000
+        # :param nocommit: Append "with NC" to end of SQL statment to avoid committment control
+        #  True=append "with NC" to SQL for no commit. False=Perform commit. Default=False 
+        # :param fastexecutemany: Use pyodbc fast_executemany parameter arrays. Default=True
+        # :param inputsizes: List of (sqltype,size,scale) for cursor.setinputsizes.
+        #  None=From the metadata cache for a simple INSERT when it is enabled.
+        #  False=Let the driver describe the parameters. Default=None
+        # :param timeout: Seconds before the whole call is cancelled. 
+        #  Default=set_querytimeout value
+        # :param quiet: True=Do not print errors. They are still available
+        #  from getlasterror(). Default=False
+        # :return: True-Success, False-Error. Records affected also set to -2 on errors.
+        #  On error batches before the failing one have already been committed.
+        #----------------------------------------------------------
+        conn1 = None
+        watch = None
+        rowscommitted = 0
+        roundtrips = 0
+        token = self._metricsbegin("executemany",sql)
+        try:
+            
+            # Reset errors and rows affected
+            self._lasterror=""
+            self._rowsaffected=0 # Reset rows affected
+            self._lastsql=""
+
+            if batchsize < 1:
+               raise ValueError("batchsize must be at least 1")
+            
+            # Start the time limit and get connection
+            watch = self._startwatch(timeout)
+            conn1 = self._borrowconn(watch)
+
+            # If no commit, add "with NC" to end of SQL
+            if (nocommit): 
+               # Check if "with nc" already ends the statement. 
+               # If so, don't add "with nc"
+               if (sql.lower().endswith("with nc")==False): 
+                  sql=f"{sql} with NC"
+
+            # Print SQL if debug enabled
+            if (debug):               
+               print(f"SQL:{sql}")   
+
+            # Save last SQL statement
+            self._lastsql=sql
+
+            # One cursor is reused for every batch so the 
+            # statement is only prepared once
+            cursor1=watch.cursor(conn1)
+            cursor1.fast_executemany=fastexecutemany
+
+            # Known column types save a describe per parameter
+            if inputsizes == None:
+               inputsizes=self._getinputsizes(sql)
+            if inputsizes:
+               cursor1.setinputsizes(inputsizes)
+
+            rowiter=iter(rows)
+            while True:
+                batch=list(itertools.islice(rowiter,batchsize))
+                if len(batch) == 0:
+                   break
+
+                if (debug):               
+                   print(f"Batch Begin: {len(batch)} rows") 
+
+                # Convert named parameter rows to ? marker rows
+                batchsql=sql
+                if isinstance(batch[0],dict):
+                   batchsql,batch=self._namedparms.formatmany(sql,batch)
+                   self._lastsql=batchsql
+
+                # Send the whole batch as a parameter array
+                cursor1.executemany(batchsql,batch)
+                roundtrips += 1
+
+                # Commit transaction. 
+                # Actual commit appears to be 
+                # ignored if CommitMode=0 on connection
+                # Deferred when a transaction scope is open
+                if self._commit(conn1):
+                   roundtrips += 1
+
+                # rowcount is not reliable for parameter arrays 
+                # so count the rows we sent
+                rowscommitted += len(batch)
+
+                if (debug):               
+                   print(f"Batch Commit: {rowscommitted} rows total") 
+
+            cursor1.close()
+
+            self._rowsaffected=rowscommitted
+            # Drop cached results for the changed table
+            self._invalidatecache(sql)
+
+            self._lasterror="SQL executemany action appears to have completed."
+            self._metricsend(token,rowscommitted,roundtrips)
+            
+            return True
+        except Exception as e:
+            # Report a cancelled statement as a timeout or cancel
+            if watch != None:
+               e=watch.translate(e)
+
+            # Set error message
+            self._lasterror=f"{e} Rows committed before error: {rowscommitted}"
+            if not quiet:
+               print(e)  
+            self._metricsend(token,rowscommitted,roundtrips + 1,e)
+
+            # Set rows affected to -2 to indicate errors
+            self._rowsaffected=-2
+
+            # Roll back the failing batch
+            # Actual rollback appears to be 
+            # ignored if CommitMode=0 on connection
+            self._rollback(conn1) 
 
             # Print debug info if debug enabled
             if (debug):               
                print("Transaction Rollback") 
 
+            # Stop the time limit, then hand back pooled connection
+            if watch != None:
+               watch.release()
+            self._returnconn(conn1,e)
+            conn1=None
+
             return False
+        finally:
+            # Stop the time limit before the connection can be
+            # borrowed again, then hand back pooled connection
+            if watch != None:
+               watch.release()
+            self._returnconn(conn1)
 
-    def execute_query(self,sql):
+    def execute_query(self,sql,parms=None,usecache=True,timeout=None,usemirror=False):
         #----------------------------------------------------------
         # Function: execute_query
         # Desc: Execute an SQL query that does return results
         # :param self: Pointer to object instance. 
         # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters array for ? markers or 
+        #  dictionary for named :parm parameters. Default=None
+        # :param usecache: Use the query result cache if enabled. Default=True
+        # :param timeout: Seconds to run the query and fetch its rows before
+        #  it is cancelled. Default=set_querytimeout value
+        # :param usemirror: Read from the attached table mirror when it is
+        #  fresh enough. Default=False
         # :return: Resulting cursor or None on error
         #----------------------------------------------------------
+        token = self._metricsbegin("execute_query",sql,parms)
         try:
 
             # Reset errors and rows affected
             self._lasterror=""
             self._lastsql=""
             self._rowsaffected=0 # Reset rows affected
+
+            # Convert named parameters to ? markers
+            if parms != None:
+               sql,parms=self.bindparms(sql,parms)
    
             # Save last SQL statement
             self._lastsql=sql
 
+            # Check the table mirror. Reads inside a transaction
+            # scope must see its own uncommitted changes.
+            if self._dbmirror != None and usemirror and self._currenttx() == None:
+               cursor1=self._dbmirror.query(sql,parms,self._mirrorstaleness)
+               if cursor1 != None:
+                  self._metricsend(token,None,0)
+                  return cursor1
+
+            # Check the result cache. Results read inside a transaction
+            # scope may be uncommitted so they are never cached.
+            cachekey=None
+            if self._dbcache != None and usecache and self._currenttx() == None:
+               cachekey=self._dbcache.makekey(sql,parms)
+            if cachekey != None:
+               # Taken before the query runs so a write that lands
+               # while it runs keeps the result out of the cache
+               generation=self._dbcache.generation(sql)
+               cached=self._dbcache.get(cachekey)
+               if cached != None:
+                  self._metricsend(token,len(cached[1]),0,cached=True)
+                  return DbCachedCursor(cached[0],cached[1])
+
+            # Start the time limit and get connection
+            watch = self._startwatch(timeout)
+            conn1 = self._borrowconn(watch)
+
             # Run SQL query 
-            cursor1 = self._dbconn.cursor()
-            cursor1.execute(sql)
+            try:
+               cursor1 = watch.cursor(conn1)
+               if parms == None:
+                  cursor1.execute(sql)
+               else:
+                  cursor1.execute(sql,parms)
+            except Exception as e:
+               watch.release()
+               e=watch.translate(e)
+               self._returnconn(conn1,e)
+               raise e
+            self._metricsend(token)
+            token=None
+
+            # Fetches stay under the time limit
+            if watch.active:
+               cursor1=DbTimedCursor(cursor1,watch)
+
+            # Pooled connection stays checked out until
+            # the cursor is closed or fully read. Inside a
+            # transaction scope the connection is already pinned.
+            if self._dbpool != None and self._currenttx() == None:
+               cursor1=DbPooledCursor(cursor1,self._dbpool,conn1)
+
+            # Record fetch calls
+            if self._dbmetrics != None:
+               cursor1=DbMeteredCursor(cursor1,self._dbmetrics,sql)
+
+            # Cache miss. Read up to the cache row limit. If the
+            # result is bigger, hand back the rows read so far
+            # followed by the rest of the live cursor.
+            if cachekey != None:
+               maxrows=self._dbcache.getmaxrows()
+               description=cursor1.description
+               try:
+                  rows=cursor1.fetchmany(maxrows + 1)
+               except Exception:
+                  # Closing hands back the connection and time limit
+                  try:
+                     cursor1.close()
+                  except Exception:
+                     pass
+                  raise
+               if len(rows) <= maxrows:
+                  cursor1.close()
+                  self._dbcache.put(cachekey,sql,description,rows,generation)
+                  return DbCachedCursor(description,rows)
+               return DbCachedCursor(description,rows,cursor1)
 
             # Return results cursor
             return cursor1
@@ -369,5 +1412,379 @@ class DbIbmiOdbc():
             # Set error message
             self._lasterror=str(e)
             print(e)  
+            self._metricsend(token,None,1,e)
             return None
-     
+
+    def iter_query_chunks(self,sql,parms=None,chunksize=1000,prefetch=0):
+        #----------------------------------------------------------
+        # Function: iter_query_chunks
+        # Desc: Generator that runs an SQL query and yields lists of up 
+        #       to chunksize rows using fetchmany, so only one block of
+        #       rows is held in memory at a time. The cursor is closed
+        #       when the rows run out or the caller stops early.
+        #       Network block size is set by the BlockFetch/BlockSize
+        #       connection string keywords of the IBM i Access ODBC Driver.
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters array or named parameter dictionary. Default=None
+        # :param chunksize: Rows per fetchmany call. Default=1000
+        # :param prefetch: Blocks fetched ahead on a background thread while
+        #  the caller works on the current block. 0=Fetch in the caller. Default=0
+        # :return: Generator of row lists. Raises an exception if the query fails.
+        #  getlastrowsaffected() returns the number of rows read so far.
+        #----------------------------------------------------------
+        if chunksize < 1:
+           raise ValueError("chunksize must be at least 1")
+
+        # Execute the query to get a cursor
+        # Streamed results bypass the result cache
+        cursor1=self.execute_query(sql,parms,False)
+        if cursor1 == None:
+           raise Exception(f"Query issue: {self._lasterror}")
+
+        rowcount=0
+        try:
+           cursor1.arraysize=chunksize
+           if prefetch > 0:
+              cursor1=DbPrefetchReader(cursor1,chunksize,prefetch)
+           while True:
+               rows=cursor1.fetchmany(chunksize)
+               if len(rows) == 0:
+                  break
+               rowcount += len(rows)
+               self._rowsaffected=rowcount
+               yield rows
+               if len(rows) < chunksize:
+                  break
+        except Exception as e:
+           # Set error message
+           self._lasterror=str(e)
+           print(e)
+           raise
+        finally:
+           # Close cursor on exhaustion, error or early break.
+           # Returns the connection when pooled.
+           try:
+              cursor1.close()
+           except Exception:
+              pass
+
+    def iter_query(self,sql,parms=None,chunksize=1000,prefetch=0):
+        #----------------------------------------------------------
+        # Function: iter_query
+        # Desc: Generator that runs an SQL query and yields one row at a
+        #       time while fetching from the server in blocks of chunksize
+        #       rows. Use instead of fetchall for large result sets.
+        #       for row in db.iter_query("select * from qiws.qcustcdt"):
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters array or named parameter dictionary. Default=None
+        # :param chunksize: Rows per fetchmany call. Default=1000
+        # :param prefetch: Blocks fetched ahead on a background thread. 0=None. Default=0
+        # :return: Generator of rows. Raises an exception if the query fails.
+        #  getlastrowsaffected() returns the number of rows read so far.
+        #----------------------------------------------------------
+        for rows in self.iter_query_chunks(sql,parms,chunksize,prefetch):
+            yield from rows
+
+    def prefetch_query(self,sql,parms=None,chunksize=1000,depth=2):
+        #----------------------------------------------------------
+        # Function: prefetch_query
+        # Desc: Run an SQL query and return a cursor like reader that
+        #       fetches the next blocks of rows on a background thread
+        #       while the caller processes the current ones. Useful for
+        #       exports where writing rows takes about as long as the 
+        #       fetch. See dbprefetch.
+        #       reader = db.prefetch_query("select * from qiws.qcustcdt")
+        #       for row in reader: ...
+        #       print(reader.getstats())
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters array or named parameter dictionary. Default=None
+        # :param chunksize: Rows per fetchmany call. Default=1000
+        # :param depth: Blocks fetched ahead of the caller. Default=2
+        # :return: DbPrefetchReader or None on error. Close it to stop
+        #  fetching early and return the connection when pooled.
+        #----------------------------------------------------------
+        cursor1=self.execute_query(sql,parms,False)
+        if cursor1 == None:
+           return None
+        try:
+           return DbPrefetchReader(cursor1,chunksize,depth)
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)
+            print(e)
+            cursor1.close()
+            return None
+
+    def fetch_columns(self,sql,parms=None,chunksize=10000,decimals="float",trim=True):
+        #----------------------------------------------------------
+        # Function: fetch_columns
+        # Desc: Run an SQL query and return the results as NumPy column
+        #       arrays. Rows are fetched in blocks and appended straight
+        #       into typed buffers so no list of Row objects is kept.
+        #       Requires numpy. See dbcolumnar for the type mapping.
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters array or named parameter dictionary. Default=None
+        # :param chunksize: Rows per fetch. Default=10000
+        # :param decimals: float=NUMERIC/DECIMAL with scale as float64. 
+        #  decimal=Exact Decimal object arrays. Default=float
+        # :param trim: Trim trailing blanks from CHAR values. Default=True
+        # :return: Dictionary of column name to numpy array or None on error
+        #----------------------------------------------------------
+        try:
+           cursor1=self.execute_query(sql,parms,False)
+           if cursor1 == None:
+              return None
+           return columns_to_numpy(read_columns(cursor1,chunksize,decimals,trim))
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)
+            print(e)
+            return None
+
+    def query_arrow(self,sql,parms=None,chunksize=10000,decimals="decimal",trim=True):
+        #----------------------------------------------------------
+        # Function: query_arrow
+        # Desc: Run an SQL query and return the results as a PyArrow 
+        #       table built from typed column buffers. Requires pyarrow.
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters array or named parameter dictionary. Default=None
+        # :param chunksize: Rows per fetch. Default=10000
+        # :param decimals: decimal=NUMERIC/DECIMAL with scale as decimal128.
+        #  float=float64. Default=decimal
+        # :param trim: Trim trailing blanks from CHAR values. Default=True
+        # :return: pyarrow Table or None on error
+        #----------------------------------------------------------
+        try:
+           cursor1=self.execute_query(sql,parms,False)
+           if cursor1 == None:
+              return None
+           return columns_to_arrow(read_columns(cursor1,chunksize,decimals,trim))
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)
+            print(e)
+            return None
+
+    def iter_records(self,sql,parms=None,recordclass=None,chunksize=1000,decimals="decimal"):
+        #----------------------------------------------------------
+        # Function: iter_records
+        # Desc: Run an SQL query and stream the rows as compact typed
+        #       records instead of pyodbc Row objects or dicts.
+        #       See dbrecord for record classes.
+        #       for rec in db.iter_records("select * from qiws.qcustcdt"):
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters array or named parameter dictionary. Default=None
+        # :param recordclass: Record class. None=Create one from the query
+        #  columns with string columns trimmed. Default=None
+        # :param chunksize: Rows per fetchmany call. Default=1000
+        # :param decimals: decimal=Keep Decimal values. float=Convert to int or float. Default=decimal
+        # :return: Generator of records. Raises an exception if the query fails.
+        #----------------------------------------------------------
+        # Streamed results bypass the result cache
+        cursor1=self.execute_query(sql,parms,False)
+        if cursor1 == None:
+           raise Exception(f"Query issue: {self._lasterror}")
+        cursor1.arraysize=chunksize
+        return read_records(cursor1,recordclass,chunksize,decimals)
+
+    def query_records(self,sql,parms=None,recordclass=None,chunksize=1000,decimals="decimal"):
+        #----------------------------------------------------------
+        # Function: query_records
+        # Desc: Run an SQL query and return all rows as a list of
+        #       compact typed records. See iter_records.
+        # :param self: Pointer to object instance. 
+        # :param sql: SQL query expecting results
+        # :param parms: Optional SQL parameters array or named parameter dictionary. Default=None
+        # :param recordclass: Record class. None=Create one from the query columns. Default=None
+        # :param chunksize: Rows per fetchmany call. Default=1000
+        # :param decimals: decimal=Keep Decimal values. float=Convert to int or float. Default=decimal
+        # :return: List of records or None on error
+        #----------------------------------------------------------
+        try:
+           cursor1=self.execute_query(sql,parms,False)
+           if cursor1 == None:
+              return None
+           cursor1.arraysize=chunksize
+           records=list(read_records(cursor1,recordclass,chunksize,decimals))
+           self._rowsaffected=len(records)
+           return records
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)
+            print(e)
+            return None
+
+    def query_page(self,sql,keycolumns,pagesize=100,token=None,parms=None):
+        #----------------------------------------------------------
+        # Function: query_page
+        # Desc: Read one page of a query using keyset pagination. Pages 
+        #       are selected with a predicate on the key values of the
+        #       previous page instead of OFFSET, so with an index on the
+        #       key columns deep pages cost the same as the first page.
+        #       rows,token = db.query_page(sql,["CUSNUM"],50)
+        #       rows,token = db.query_page(sql,["CUSNUM"],50,token)
+        #       See dbpage for composite and descending keys.
+        # :param self: Pointer to object instance. 
+        # :param sql: Base SQL query without ORDER BY or FETCH FIRST
+        # :param keycolumns: Unique, not null key column or list of columns
+        #  in the select list. Ex: ["LSTNAM","CUSNUM"]
+        # :param pagesize: Rows per page. Default=100
+        # :param token: Continuation token from the previous page. None=First page. Default=None
+        # :param parms: Optional SQL parameters array or named parameter dictionary
+        #  for the base query. Default=None
+        # :return: Tuple of (rows,nexttoken). nexttoken is None on the last page.
+        #  (None,None) on error.
+        #----------------------------------------------------------
+        try:
+           if pagesize < 1:
+              raise ValueError("pagesize must be at least 1")
+           keys=parsekeys(keycolumns)
+           values=decodetoken(sql,keys,token) if token else None
+
+           # Key markers go after the base query markers
+           basesql,baseparms=self.bindparms(sql,parms)
+           pagesql,keyparms=page_sql(basesql,keys,pagesize,values)
+           allparms=list(baseparms or []) + keyparms
+
+           cursor1=self.execute_query(pagesql,allparms if len(allparms) > 0 else None)
+           if cursor1 == None:
+              return None,None
+           try:
+              names=[desc[0].upper() for desc in cursor1.description]
+              rows=cursor1.fetchmany(pagesize + 1)
+           finally:
+              cursor1.close()
+
+           nexttoken=None
+           if len(rows) > pagesize:
+              rows=rows[:pagesize]
+              positions=[]
+              for name,descending in keys:
+                  if name.upper() not in names:
+                     raise Exception(f"Key column {name} is not in the select list")
+                  positions.append(names.index(name.upper()))
+              nexttoken=encodetoken(sql,keys,[rows[-1][pos] for pos in positions])
+
+           self._rowsaffected=len(rows)
+           return rows,nexttoken
+        except Exception as e:
+            # Set error message
+            self._lasterror=str(e)
+            print(e)
+            return None,None
+
+class DbTransaction():
+    #-------------------------------------------------------
+    # Class: DbTransaction
+    # Desc: Unit of work scope returned by DbIbmiOdbc.transaction().
+    #       The outermost scope commits or rolls back the connection.
+    #       Nested scopes set, release or roll back to a savepoint.
+    #-------------------------------------------------------
+
+    def __init__(self,db):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor
+        # :param self: Object instance
+        # :param db: DbIbmiOdbc instance the scope belongs to
+        #-------------------------------------------------------
+        self._db=db
+        self._conn=None
+        self._savepoint=None
+        self._rollbackonly=False
+        self._actionsql=[]
+        self.committed=False
+        self.rolledback=False
+
+    def _runsql(self,sql):
+        #-------------------------------------------------------
+        # Function: _runsql
+        # Desc: Run a savepoint statement on the scope connection
+        # :param self: Pointer to object instance.
+        # :param sql: SQL statement
+        #-------------------------------------------------------
+        cursor1=self._conn.cursor()
+        cursor1.execute(sql)
+        cursor1.close()
+
+    def setrollbackonly(self):
+        #-------------------------------------------------------
+        # Function: setrollbackonly
+        # Desc: Mark the scope so it rolls back instead of committing
+        #       when it exits. Called automatically when a statement fails.
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        self._rollbackonly=True
+
+    def isrollbackonly(self):
+        #-------------------------------------------------------
+        # Function: isrollbackonly
+        # Desc: Check if the scope will roll back on exit
+        # :param self: Pointer to object instance.
+        # :return: True-Will roll back, False-Will commit
+        #-------------------------------------------------------
+        return self._rollbackonly
+
+    def __enter__(self):
+        stack=self._db._txstack()
+        if len(stack) == 0:
+           # Outermost scope pins one connection for the unit of work
+           self._conn=self._db._borrowconn()
+        else:
+           # Nested scope shares the connection and sets a savepoint
+           self._conn=stack[-1]._conn
+           self._savepoint=f"DBTXSP{len(stack)}"
+           self._runsql(f"SAVEPOINT {self._savepoint} ON ROLLBACK RETAIN CURSORS")
+        stack.append(self)
+        return self
+
+    def __exit__(self,exc_type,exc,tb):
+        stack=self._db._txstack()
+        stack.pop()
+        error=exc
+        try:
+           if exc_type == None and not self._rollbackonly:
+              if self._savepoint != None:
+                 self._runsql(f"RELEASE SAVEPOINT {self._savepoint}")
+              else:
+                 self._conn.commit()
+              self.committed=True
+           else:
+              if self._savepoint != None:
+                 self._runsql(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+                 self._runsql(f"RELEASE SAVEPOINT {self._savepoint}")
+              else:
+                 self._conn.rollback()
+              self.rolledback=True
+              if exc_type == None:
+                 self._db._lasterror="Transaction rolled back because a statement failed."
+              else:
+                 self._db._lasterror=str(exc)
+        except Exception as e:
+           # Commit or savepoint handling failed. Roll back the
+           # enclosing unit of work and report the error.
+           error=e
+           self._db._lasterror=str(e)
+           print(e)
+           if len(stack) > 0:
+              stack[-1].setrollbackonly()
+           else:
+              self._db._rollback(self._conn)
+           self.rolledback=True
+           if exc_type == None:
+              raise
+        finally:
+           # Outermost scope hands the connection back and drops
+           # any results cached while the unit of work was open
+           if self._savepoint == None:
+              self._db._returnconn(self._conn,error)
+              if self._db._dbcache != None:
+                 for sql in self._actionsql:
+                     self._db._dbcache.invalidatesql(sql)
+        return False
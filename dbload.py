@@ -0,0 +1,588 @@
+#-------------------------------------------------------
+# Module: dbload.py
+# Desc: This module contains a parallel CSV bulk loader.
+#       The CSV file is read in streaming fashion and each
+#       field is validated and converted against the table
+#       column definitions (NUMERIC precision and scale, CHAR
+#       length, dates etc). Valid rows are inserted in batches
+#       as parameter arrays by several worker threads, each
+#       with its own pooled connection. When a batch fails it
+#       is split in half and retried until the bad rows are
+#       isolated. Bad rows go to a reject file and the rest of
+#       the batch commits.
+#
+#       Progress is saved to an optional checkpoint file after
+#       every batch. Running the same load again skips the
+#       records already loaded or rejected, so a load stopped
+#       by an error, a cancel or a lost connection can be
+#       restarted where it left off.
+#
+#       Bisection relies on a failed batch being rolled back
+#       as a whole, so the connection needs commitment control
+#       (CommitMode=1 or higher) and the table must be journaled.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Workers run with the caller's timeout, deadlines and stats
+# 10/18/2026 - Lock timeouts, deadlocks, resource limits and time limits
+#              are retried and then stop the load instead of rejecting rows
+#
+# Usage:
+# loader = DbBulkLoader(db,"CUSTOMERS","QIWS",workers=4,batchsize=1000,
+#                       rejectfile="/tmp/cust.rejects.csv",
+#                       checkpointfile="/tmp/cust.checkpoint.json")
+# stats = loader.load("/tmp/cust.csv")
+# print(stats["loaded"],stats["rejected"],stats["rowspersecond"])
+#
+# The CSV file needs a header line with the column names.
+# Table columns not in the file are left to their defaults.
+# Reject file lines are the input fields followed by
+# REJECT_RECORD (data record number) and REJECT_REASON.
+#-------------------------------------------------------
+import contextvars
+import csv
+import datetime
+import decimal
+import json
+import os
+import queue
+import re
+import threading
+import time
+from dbpool import DbConnectionPool
+from dbmetadata import getinputsizes, CHARTYPES
+
+# Column types validated as text
+_texttypes=("CHAR","CHARACTER","VARCHAR","CHARACTER VARYING","GRAPHIC","VARGRAPHIC",
+            "NCHAR","NVARCHAR","CLOB","DBCLOB")
+
+# Integer types and their bit sizes
+_inttypes={"SMALLINT":16,"INTEGER":32,"INT":32,"BIGINT":64}
+
+# Binary floating point types
+_floattypes=("DOUBLE","FLOAT","REAL")
+
+# Message text of a connection level SQLSTATE (class 08)
+_connectionerror=re.compile(r"\('08|\[08\w{3}\]")
+
+# Message text of errors that say nothing about the data: transaction
+# rollback (class 40, deadlock), resource not available (57011), lock
+# timeout (57033, SQL0913), cancel (57014, HY008) and time limits
+_transienterror=re.compile(r"\('(40\w{3}|57011|57014|57033|HYT00|HY008)'|\[(40\w{3}|57011|57014|57033|HYT00|HY008)\]"
+                           r"|SQL0913|SQL0904|Query time limit|Query exceeded its time limit|Query cancelled")
+
+# IBM i timestamp and time formats. Ex: 2026-10-18-13.45.00.000000
+_ibmtimestamp=re.compile(r"^(\d{4}-\d{2}-\d{2})[- ](\d{2})\.(\d{2})\.(\d{2})(\.\d+)?$")
+_ibmtime=re.compile(r"^(\d{2})\.(\d{2})\.(\d{2})$")
+
+def make_validator(column):
+    #----------------------------------------------------------
+    # Function: make_validator
+    # Desc: Build a function that checks and converts one CSV field
+    #       for a table column
+    # :param column: DbColumn from DbIbmiOdbc.getcolumns
+    # :return: Function(text) returning the converted value. Raises
+    #  ValueError with the reason when the value does not fit the column.
+    #----------------------------------------------------------
+    name=column.name
+    typename=column.typename
+
+    def blank():
+        if column.nullable:
+           return None
+        raise ValueError(f"{name} is required")
+
+    if typename in _texttypes:
+       def check(text):
+           # Trailing blanks are padding in CHAR columns
+           value=text.rstrip(" ") if typename in CHARTYPES else text
+           if column.size != None and len(value) > column.size:
+              raise ValueError(f"{name} is longer than {column.size}: {text!r}")
+           return value
+       return check
+
+    if typename in ("NUMERIC","DECIMAL"):
+       scale=column.scale or 0
+       digits=(column.size or 31) - scale
+       quantum=decimal.Decimal(1).scaleb(-scale)
+       limit=decimal.Decimal(10) ** digits
+       def check(text):
+           text=text.strip()
+           if text == "":
+              return blank()
+           try:
+              value=decimal.Decimal(text)
+           except decimal.InvalidOperation:
+              raise ValueError(f"{name} is not a number: {text!r}")
+           if not value.is_finite():
+              raise ValueError(f"{name} is not a number: {text!r}")
+           if abs(value) >= limit:
+              raise ValueError(f"{name} does not fit {typename}({column.size},{scale}): {text}")
+           rounded=value.quantize(quantum)
+           if rounded != value:
+              raise ValueError(f"{name} has more than {scale} decimal places: {text}")
+           return rounded
+       return check
+
+    if typename in _inttypes:
+       bits=_inttypes[typename]
+       def check(text):
+           text=text.strip()
+           if text == "":
+              return blank()
+           try:
+              value=int(text)
+           except ValueError:
+              raise ValueError(f"{name} is not an integer: {text!r}")
+           if not -(1 << (bits - 1)) <= value < (1 << (bits - 1)):
+              raise ValueError(f"{name} is out of range for {typename}: {text}")
+           return value
+       return check
+
+    if typename in _floattypes:
+       def check(text):
+           text=text.strip()
+           if text == "":
+              return blank()
+           try:
+              return float(text)
+           except ValueError:
+              raise ValueError(f"{name} is not a number: {text!r}")
+       return check
+
+    if typename == "DATE":
+       def check(text):
+           text=text.strip()
+           if text == "":
+              return blank()
+           try:
+              return datetime.date.fromisoformat(text)
+           except ValueError:
+              raise ValueError(f"{name} is not a date (YYYY-MM-DD): {text!r}")
+       return check
+
+    if typename == "TIME":
+       def check(text):
+           text=text.strip()
+           if text == "":
+              return blank()
+           match=_ibmtime.match(text)
+           if match != None:
+              text=":".join(match.groups())
+           try:
+              return datetime.time.fromisoformat(text)
+           except ValueError:
+              raise ValueError(f"{name} is not a time (HH:MM:SS): {text!r}")
+       return check
+
+    if typename in ("TIMESTAMP","TIMESTMP"):
+       def check(text):
+           text=text.strip()
+           if text == "":
+              return blank()
+           match=_ibmtimestamp.match(text)
+           if match != None:
+              text=f"{match.group(1)} {match.group(2)}:{match.group(3)}:{match.group(4)}{match.group(5) or ''}"
+           try:
+              return datetime.datetime.fromisoformat(text)
+           except ValueError:
+              raise ValueError(f"{name} is not a timestamp: {text!r}")
+       return check
+
+    # Anything else is passed to the driver as text
+    def check(text):
+        if text == "":
+           return blank()
+        return text
+    return check
+
+class _DbLoadBatch():
+    #-------------------------------------------------------
+    # Class: _DbLoadBatch
+    # Desc: One batch of CSV records. first/last are the record
+    #       numbers covered, including records that failed
+    #       validation, which are kept in rejects.
+    #-------------------------------------------------------
+    __slots__=("first","last","rows","rejects")
+
+    def __init__(self):
+        self.first=None
+        self.last=None
+        self.rows=[]
+        self.rejects=[]
+
+class DbBulkLoader():
+
+    def __init__(self,db,table,library,batchsize=1000,workers=4,rejectfile=None,checkpointfile=None,
+                 delimiter=",",encoding="utf-8",retries=3):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor
+        # :param self: Object instance
+        # :param db: DbIbmiOdbc/DbApp instance. With a pool each worker
+        #        borrows its own pooled connection. Without a pool a
+        #        temporary pool is opened from the connection string.
+        # :param table: Table name. Ex: CUSTOMERS
+        # :param library: Library name. Ex: QIWS
+        # :param batchsize: Rows per parameter array and commit. Default=1000
+        # :param workers: Worker threads and connections. Default=4
+        # :param rejectfile: CSV file for rejected records. Appended to on
+        #        restart. None=Rejects are only counted. Default=None
+        # :param checkpointfile: JSON file for restart progress. None=No
+        #        restart support. Default=None
+        # :param delimiter: CSV field delimiter. Default=,
+        # :param encoding: CSV file encoding. Default=utf-8
+        # :param retries: Times a batch failing with a lock timeout, deadlock
+        #        or resource error is retried, waiting 0.5, 1, 2... seconds,
+        #        before the load stops. Default=3
+        #-------------------------------------------------------
+        if batchsize < 1:
+           raise ValueError("batchsize must be at least 1")
+        if workers < 1:
+           raise ValueError("workers must be at least 1")
+        self._db=db
+        self._table=table
+        self._library=library
+        self._batchsize=batchsize
+        self._workers=workers
+        self._rejectfile=rejectfile
+        self._checkpointfile=checkpointfile
+        self._delimiter=delimiter
+        self._encoding=encoding
+        self._retries=retries
+        self._lock=threading.Lock()
+        self._stop=threading.Event()
+        self._stats={}
+        self._error=None
+
+    def _getcolumns(self):
+        #-------------------------------------------------------
+        # Function: _getcolumns
+        # Desc: Get the table column definitions
+        # :param self: Pointer to object instance.
+        # :return: List of DbColumn. Raises an exception on error.
+        #-------------------------------------------------------
+        columns=self._db.getcolumns(self._table,self._library)
+        if columns == None:
+           raise Exception(f"Column definitions not found for {self._library}.{self._table}: {self._db.getlasterror()}")
+        return columns
+
+    def _mapheader(self,header,columns,selected):
+        #-------------------------------------------------------
+        # Function: _mapheader
+        # Desc: Match CSV header names to table columns
+        # :param self: Pointer to object instance.
+        # :param header: CSV header fields
+        # :param columns: List of DbColumn
+        # :param selected: Header names to load or None for all
+        # :return: List of (field position,DbColumn). Raises ValueError for
+        #  unknown or duplicate names.
+        #-------------------------------------------------------
+        bynames=dict([(column.name.upper(),column) for column in columns])
+        names=[name.strip().upper() for name in header]
+        wanted=names if not selected else [name.strip().upper() for name in selected]
+        unknown=[name for name in wanted if name not in bynames or name not in names]
+        if len(unknown) > 0:
+           raise ValueError(f"Columns not in both the CSV header and {self._library}.{self._table}: {', '.join(unknown)}")
+        if len(set(wanted)) != len(wanted):
+           raise ValueError("Duplicate column names in the CSV header or column list")
+        return [(names.index(name),bynames[name]) for name in wanted]
+
+    def _loadcheckpoint(self,path):
+        #-------------------------------------------------------
+        # Function: _loadcheckpoint
+        # Desc: Read restart progress for an input file
+        # :param self: Pointer to object instance.
+        # :param path: Input CSV path
+        # :return: Tuple of (watermark,done ranges,loaded,rejected)
+        #-------------------------------------------------------
+        if self._checkpointfile == None or not os.path.exists(self._checkpointfile):
+           return 0,[],0,0
+        with open(self._checkpointfile,"r",encoding="utf-8") as infile:
+           checkpoint=json.load(infile)
+        if checkpoint.get("input") != os.path.abspath(path) or checkpoint.get("table") != f"{self._library}.{self._table}".upper():
+           raise ValueError(f"Checkpoint file {self._checkpointfile} belongs to a different load. Remove it to start over.")
+        return checkpoint["record"],[list(r) for r in checkpoint["done"]],checkpoint["loaded"],checkpoint["rejected"]
+
+    def _savecheckpoint(self,path):
+        #-------------------------------------------------------
+        # Function: _savecheckpoint
+        # Desc: Write restart progress. Caller must hold the lock.
+        #       The file is replaced in one step so a crash never
+        #       leaves a partial checkpoint.
+        # :param self: Pointer to object instance.
+        # :param path: Input CSV path
+        #-------------------------------------------------------
+        if self._checkpointfile == None:
+           return
+        checkpoint={"input":os.path.abspath(path),"table":f"{self._library}.{self._table}".upper(),
+                    "record":self._watermark,"done":self._done,
+                    "loaded":self._stats["loaded"] + self._priorloaded,
+                    "rejected":self._stats["rejected"] + self._priorrejected,
+                    "complete":self._complete}
+        tempfile=self._checkpointfile + ".tmp"
+        with open(tempfile,"w",encoding="utf-8") as outfile:
+           json.dump(checkpoint,outfile)
+        os.replace(tempfile,self._checkpointfile)
+
+    def _isdone(self,record):
+        #-------------------------------------------------------
+        # Function: _isdone
+        # Desc: Check if a record was finished by an earlier run
+        #-------------------------------------------------------
+        if record <= self._watermark:
+           return True
+        for first,last in self._done:
+            if first <= record <= last:
+               return True
+        return False
+
+    def _markdone(self,first,last):
+        #-------------------------------------------------------
+        # Function: _markdone
+        # Desc: Record a finished range of records and move the watermark
+        #       past every record that is finished. Caller must hold the lock.
+        #-------------------------------------------------------
+        ranges=sorted(self._done + [[first,last]])
+        merged=[]
+        for first,last in ranges:
+            if len(merged) > 0 and first <= merged[-1][1] + 1:
+               merged[-1][1]=max(merged[-1][1],last)
+            else:
+               merged.append([first,last])
+        while len(merged) > 0 and merged[0][0] <= self._watermark + 1:
+            self._watermark=max(self._watermark,merged.pop(0)[1])
+        self._done=merged
+
+    def _insert(self,db,rows,result):
+        #-------------------------------------------------------
+        # Function: _insert
+        # Desc: Insert rows as one parameter array. When it fails the
+        #       rows are split in half and each half is retried until
+        #       the failing rows are found. Errors that are not about
+        #       the data, such as lock timeouts and deadlocks, retry the
+        #       same rows and never reject them.
+        # :param self: Pointer to object instance.
+        # :param db: Worker DbIbmiOdbc instance
+        # :param rows: List of (record,fields,values)
+        # :param result: Dictionary of loaded record numbers and rejects
+        #  (record,fields,reason) found so far. Filled in as halves commit
+        #  so progress is known when the connection fails part way.
+        # :return: Nothing. Raises an exception when the connection fails
+        #  or a transient error outlasts the retries.
+        #----------------------------------------------------------
+        attempt=0
+        while True:
+            # Errors are in getlasterror. Printing them here would
+            # print every level of the bisection.
+            if db.executemany(self._sql,[row[2] for row in rows],len(rows),inputsizes=self._inputsizes,quiet=True):
+               result["loaded"].extend([row[0] for row in rows])
+               return
+            error=db.getlasterror()
+            if _connectionerror.search(error):
+               raise Exception(f"Connection failed. Load stopped: {error}")
+            if not _transienterror.search(error):
+               break
+            if attempt >= self._retries:
+               raise Exception(f"Transient error after {attempt} retries. Load stopped: {error}")
+            with self._lock:
+                self._stats["retries"] += 1
+            if self._stop.wait(0.5 * 2 ** attempt):
+               raise Exception(f"Load stopped while retrying: {error}")
+            attempt += 1
+        if len(rows) == 1:
+           result["rejects"].append((rows[0][0],rows[0][1],error))
+           return
+        with self._lock:
+            self._stats["bisects"] += 1
+        middle=len(rows) // 2
+        self._insert(db,rows[:middle],result)
+        self._insert(db,rows[middle:],result)
+
+    def _writerejects(self,rejects):
+        #-------------------------------------------------------
+        # Function: _writerejects
+        # Desc: Append rejected records to the reject file. Caller must
+        #       hold the lock.
+        # :param self: Pointer to object instance.
+        # :param rejects: List of (record,fields,reason)
+        #-------------------------------------------------------
+        if self._rejectwriter == None or len(rejects) == 0:
+           return
+        self._rejectwriter.writerows([list(fields) + [record,reason] for record,fields,reason in sorted(rejects,key=lambda r: r[0])])
+        self._rejectout.flush()
+
+    def _runworker(self,path,q):
+        #-------------------------------------------------------
+        # Function: _runworker
+        # Desc: Worker thread body. Inserts batches from the queue until
+        #       a None end marker arrives.
+        # :param self: Pointer to object instance.
+        # :param path: Input CSV path for checkpoints
+        # :param q: Batch queue
+        #-------------------------------------------------------
+        db=self._db.newinstance(self._pool)
+        while not self._stop.is_set():
+            try:
+               batch=q.get(timeout=0.1)
+            except queue.Empty:
+               continue
+            if batch == None:
+               return
+            result={"loaded":[],"rejects":[]}
+            try:
+               if len(batch.rows) > 0:
+                  self._insert(db,batch.rows,result)
+               rejects=batch.rejects + result["rejects"]
+               with self._lock:
+                   self._stats["loaded"] += len(result["loaded"])
+                   self._stats["rejected"] += len(rejects)
+                   self._stats["batches"] += 1
+                   self._writerejects(rejects)
+                   self._markdone(batch.first,batch.last)
+                   self._savecheckpoint(path)
+            except Exception as e:
+               with self._lock:
+                   # Keep the rows of the batch that did commit so a
+                   # restart does not insert them twice
+                   self._stats["loaded"] += len(result["loaded"])
+                   self._stats["rejected"] += len(result["rejects"])
+                   self._writerejects(result["rejects"])
+                   for record in result["loaded"] + [reject[0] for reject in result["rejects"]]:
+                       self._markdone(record,record)
+                   self._savecheckpoint(path)
+                   if self._error == None:
+                      self._error=e
+               self._stop.set()
+               return
+
+    def _put(self,q,item):
+        #-------------------------------------------------------
+        # Function: _put
+        # Desc: Put a batch on the bounded queue, giving up if the load
+        #       has stopped so the reader never blocks forever.
+        # :param self: Pointer to object instance.
+        # :return: True-Queued, False-Load stopped
+        #-------------------------------------------------------
+        while not self._stop.is_set():
+            try:
+               q.put(item,timeout=0.1)
+               return True
+            except queue.Full:
+               pass
+        return False
+
+    def load(self,path,columns=None):
+        #-------------------------------------------------------
+        # Function: load
+        # Desc: Load a CSV file into the table
+        # :param self: Pointer to object instance.
+        # :param path: Input CSV file path
+        # :param columns: CSV header names to load. None=All. Default=None
+        # :return: Stats dictionary of read, skipped, loaded, rejected,
+        #  batches, bisects, retries, seconds and rowspersecond for this run.
+        #  Raises an exception if the load stops. Finished batches stay
+        #  committed and are skipped when the load is run again.
+        #-------------------------------------------------------
+        start=time.perf_counter()
+        self._stop.clear()
+        self._error=None
+        self._complete=False
+        self._stats={"read":0,"skipped":0,"loaded":0,"rejected":0,"batches":0,"bisects":0,"retries":0,
+                     "seconds":0.0,"rowspersecond":0.0}
+        self._watermark,self._done,self._priorloaded,self._priorrejected=self._loadcheckpoint(path)
+
+        tablecolumns=self._getcolumns()
+        infile=open(path,"r",encoding=self._encoding,newline="")
+        self._rejectout=None
+        self._rejectwriter=None
+        temppool=None
+        threads=[]
+        try:
+           reader=csv.reader(infile,delimiter=self._delimiter)
+           header=next(reader,None)
+           if header == None:
+              raise ValueError(f"{path} is empty. A header line with column names is required.")
+           mapping=self._mapheader(header,tablecolumns,columns)
+           names=[column.name for position,column in mapping]
+           validators=[(position,make_validator(column)) for position,column in mapping]
+           self._sql=f"insert into {self._library}.{self._table} ({','.join(names)}) values({','.join(['?'] * len(names))})"
+           self._inputsizes=getinputsizes(tablecolumns,names)
+
+           if self._rejectfile != None:
+              newfile=not os.path.exists(self._rejectfile) or os.path.getsize(self._rejectfile) == 0
+              self._rejectout=open(self._rejectfile,"a",encoding=self._encoding,newline="")
+              self._rejectwriter=csv.writer(self._rejectout,delimiter=self._delimiter)
+              if newfile:
+                 self._rejectwriter.writerow(header + ["REJECT_RECORD","REJECT_REASON"])
+
+           # Each worker needs its own connection
+           self._pool=self._db.getpool()
+           if self._pool == None:
+              temppool=DbConnectionPool(self._db.getconnstring(),minsize=0,maxsize=self._workers)
+              self._pool=temppool
+
+           q=queue.Queue(self._workers * 2)
+           for i in range(self._workers):
+               thread=threading.Thread(target=contextvars.copy_context().run,args=(self._runworker,path,q),
+                                       name=f"dbload{i}",daemon=True)
+               thread.start()
+               threads.append(thread)
+
+           batch=_DbLoadBatch()
+           record=0
+           for fields in reader:
+               if self._stop.is_set():
+                  break
+               record += 1
+               self._stats["read"] += 1
+               if self._isdone(record):
+                  self._stats["skipped"] += 1
+                  continue
+               if batch.first == None:
+                  batch.first=record
+               batch.last=record
+               try:
+                  if len(fields) != len(header):
+                     raise ValueError(f"Expected {len(header)} fields, found {len(fields)}")
+                  values=[check(fields[position]) for position,check in validators]
+                  batch.rows.append((record,fields,values))
+               except ValueError as e:
+                  batch.rejects.append((record,fields,str(e)))
+               if len(batch.rows) + len(batch.rejects) >= self._batchsize:
+                  if not self._put(q,batch):
+                     break
+                  batch=_DbLoadBatch()
+           if batch.first != None:
+              self._put(q,batch)
+        finally:
+           # End markers, then wait for the batches in flight
+           for thread in threads:
+               self._put(q,None)
+           for thread in threads:
+               thread.join()
+           infile.close()
+           if self._rejectout != None:
+              self._rejectout.close()
+           if temppool != None:
+              temppool.close()
+
+        if self._error != None:
+           raise self._error
+        with self._lock:
+            self._complete=True
+            self._savecheckpoint(path)
+        self._stats["seconds"]=time.perf_counter() - start
+        if self._stats["seconds"] > 0:
+           self._stats["rowspersecond"]=self._stats["loaded"] / self._stats["seconds"]
+        return self._stats
+
+    def getstats(self):
+        #-------------------------------------------------------
+        # Function: getstats
+        # Desc: Get counters of the current or last load
+        # :param self: Pointer to object instance.
+        # :return: Dictionary
+        #-------------------------------------------------------
+        with self._lock:
+            return dict(self._stats)
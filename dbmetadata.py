@@ -0,0 +1,289 @@
+#-------------------------------------------------------
+# Module: dbmetadata.py
+# Desc: This module contains a table and column metadata
+#       cache for the DbIbmiOdbc class. Column definitions
+#       are read from the catalog once per table, via the
+#       ODBC SQLColumns call (cursor.columns()) or the
+#       QSYS2.SYSCOLUMNS view, and kept until a TTL expires
+#       or a DDL statement run through DbIbmiOdbc changes
+#       the table. The definitions are used to build record
+#       classes, to trim CHAR columns in exports and to set
+#       parameter input sizes for executemany so the driver
+#       does not need to describe parameters on every call.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+#
+# Usage:
+# db.enable_metadata(ttl=3600)
+# for col in db.getcolumns("QCUSTCDT","QIWS"):
+#    print(col.name,col.typename,col.size,col.scale)
+# print(db.getmetadata().stats())
+#-------------------------------------------------------
+import collections
+import re
+import threading
+import time
+import pyodbc as db2
+from dbcache import gettables
+
+# One column definition
+DbColumn=collections.namedtuple("DbColumn",["name","typename","sqltype","size","scale",
+                                            "nullable","ordinal","default","text"])
+
+# Statements that change table definitions
+_ddlregex=re.compile(r"^\s*(alter|drop|create|rename)\b",re.IGNORECASE)
+
+# QSYS2.SYSCOLUMNS DATA_TYPE names to ODBC SQL types
+_sqltypes={"CHAR":db2.SQL_CHAR,"VARCHAR":db2.SQL_VARCHAR,"GRAPHIC":db2.SQL_WCHAR,
+           "VARGRAPHIC":db2.SQL_WVARCHAR,"NUMERIC":db2.SQL_NUMERIC,"DECIMAL":db2.SQL_DECIMAL,
+           "INTEGER":db2.SQL_INTEGER,"SMALLINT":db2.SQL_SMALLINT,"BIGINT":db2.SQL_BIGINT,
+           "DOUBLE":db2.SQL_DOUBLE,"REAL":db2.SQL_REAL,"FLOAT":db2.SQL_FLOAT,
+           "DATE":db2.SQL_TYPE_DATE,"TIME":db2.SQL_TYPE_TIME,"TIMESTMP":db2.SQL_TYPE_TIMESTAMP,
+           "TIMESTAMP":db2.SQL_TYPE_TIMESTAMP,"BINARY":db2.SQL_BINARY,"VARBIN":db2.SQL_VARBINARY,
+           "BLOB":db2.SQL_LONGVARBINARY,"CLOB":db2.SQL_LONGVARCHAR}
+
+# Types padded with blanks to their length
+CHARTYPES=("CHAR","CHARACTER","GRAPHIC","NCHAR")
+
+def load_columns(conn,table,library,source="odbc"):
+    #----------------------------------------------------------
+    # Function: load_columns
+    # Desc: Read column definitions for one table from the catalog
+    # :param conn: Open pyodbc connection
+    # :param table: Table name
+    # :param library: Library (schema) name
+    # :param source: odbc=cursor.columns() SQLColumns call.
+    #  syscolumns=Query QSYS2.SYSCOLUMNS, which includes column text. Default=odbc
+    # :return: List of DbColumn in column order. Raises an exception if the
+    #  table is not found.
+    #----------------------------------------------------------
+    columns=[]
+    cursor1=conn.cursor()
+    try:
+       if source == "syscolumns":
+          cursor1.execute("select column_name,data_type,length,numeric_scale,is_nullable,"
+                          "ordinal_position,column_default,column_text from qsys2.syscolumns "
+                          "where table_schema=? and table_name=? order by ordinal_position",
+                          [library.upper(),table.upper()])
+          for row in cursor1.fetchall():
+              typename=row[1].strip().upper()
+              columns.append(DbColumn(row[0].strip(),typename,_sqltypes.get(typename,db2.SQL_VARCHAR),
+                                      row[2],row[3],row[4] == "Y",row[5],row[6],
+                                      row[7].strip() if row[7] != None else None))
+       else:
+          for row in cursor1.columns(table=table.upper(),schema=library.upper()).fetchall():
+              columns.append(DbColumn(row.column_name,row.type_name.upper(),row.data_type,
+                                      row.column_size,row.decimal_digits,row.nullable == 1,
+                                      row.ordinal_position,row.column_def,row.remarks))
+    finally:
+       cursor1.close()
+    if len(columns) == 0:
+       raise Exception(f"Table {library}.{table} not found in catalog")
+    columns.sort(key=lambda column: column.ordinal)
+    return columns
+
+def getinputsizes(columns,names=None):
+    #----------------------------------------------------------
+    # Function: getinputsizes
+    # Desc: Build the cursor.setinputsizes list for parameters bound
+    #       to table columns
+    # :param columns: List of DbColumn for the table
+    # :param names: Column names in parameter order. None=All columns. Default=None
+    # :return: List of (sqltype,size,scale) tuples. Raises KeyError for an
+    #  unknown column.
+    #----------------------------------------------------------
+    if names == None:
+       return [(column.sqltype,column.size,column.scale or 0) for column in columns]
+    bynames=dict([(column.name.upper(),column) for column in columns])
+    sizes=[]
+    for name in names:
+        column=bynames[name.strip().strip('"').upper()]
+        sizes.append((column.sqltype,column.size,column.scale or 0))
+    return sizes
+
+def getcharcolumns(columns):
+    #----------------------------------------------------------
+    # Function: getcharcolumns
+    # Desc: Get the names of fixed length blank padded columns
+    # :param columns: List of DbColumn
+    # :return: List of column names
+    #----------------------------------------------------------
+    return [column.name for column in columns if column.typename in CHARTYPES]
+
+class DbMetadataCache():
+
+    def __init__(self,ttl=3600,maxtables=1000,source="odbc"):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. A cache can be shared by many DbIbmiOdbc
+        #       instances in the same process.
+        # :param self: Object instance
+        # :param ttl: Seconds a table definition stays valid. Default=3600
+        # :param maxtables: Maximum tables kept. Oldest loaded are dropped first. Default=1000
+        # :param source: Catalog source. See load_columns. Default=odbc
+        #-------------------------------------------------------
+        self._ttl=ttl
+        self._maxtables=maxtables
+        self._source=source
+        self._lock=threading.Lock()
+        self._entries=collections.OrderedDict()
+        self._extras={}
+
+        # Counters exposed via stats()
+        self._hits=0
+        self._misses=0
+        self._loadseconds=0.0
+        self._invalidations=0
+
+    def getsource(self):
+        #-------------------------------------------------------
+        # Function: getsource
+        # Desc: Get the catalog source used for loads
+        # :param self: Pointer to object instance.
+        # :return: odbc or syscolumns
+        #-------------------------------------------------------
+        return self._source
+
+    def _makekey(self,table,library):
+        return (library.strip().upper(),table.strip().upper())
+
+    def get(self,table,library):
+        #-------------------------------------------------------
+        # Function: get
+        # Desc: Look up cached column definitions
+        # :param self: Pointer to object instance.
+        # :param table: Table name
+        # :param library: Library name
+        # :return: List of DbColumn or None on a miss
+        #-------------------------------------------------------
+        key=self._makekey(table,library)
+        with self._lock:
+            entry=self._entries.get(key)
+            if entry == None or time.monotonic() >= entry[1]:
+               if entry != None:
+                  self._remove_locked(key)
+               self._misses += 1
+               return None
+            self._hits += 1
+            return entry[0]
+
+    def put(self,table,library,columns,loadseconds=0.0):
+        #-------------------------------------------------------
+        # Function: put
+        # Desc: Store column definitions for a table
+        # :param self: Pointer to object instance.
+        # :param table: Table name
+        # :param library: Library name
+        # :param columns: List of DbColumn
+        # :param loadseconds: Catalog time spent loading. Default=0.0
+        # :return: True-Stored
+        #-------------------------------------------------------
+        key=self._makekey(table,library)
+        with self._lock:
+            if key in self._entries:
+               self._remove_locked(key)
+            self._entries[key]=(columns,time.monotonic() + self._ttl)
+            self._loadseconds += loadseconds
+            while len(self._entries) > self._maxtables:
+                self._remove_locked(next(iter(self._entries)))
+        return True
+
+    def getextra(self,table,library,name,build):
+        #-------------------------------------------------------
+        # Function: getextra
+        # Desc: Get an object derived from a table definition, such as a
+        #       record class, building it once per cached definition.
+        # :param self: Pointer to object instance.
+        # :param table: Table name
+        # :param library: Library name
+        # :param name: Name of the derived object. Ex: recordclass
+        # :param build: Function(columns) that builds it
+        # :return: Derived object or None if the table is not cached
+        #-------------------------------------------------------
+        columns=self.get(table,library)
+        if columns == None:
+           return None
+        key=self._makekey(table,library) + (name,)
+        with self._lock:
+            extra=self._extras.get(key)
+            if extra != None and extra[0] is columns:
+               return extra[1]
+        value=build(columns)
+        with self._lock:
+            self._extras[key]=(columns,value)
+        return value
+
+    def _remove_locked(self,key):
+        #-------------------------------------------------------
+        # Function: _remove_locked
+        # Desc: Drop one table and its derived objects. Caller must hold the lock.
+        # :param self: Pointer to object instance.
+        # :param key: Cache key
+        #-------------------------------------------------------
+        self._entries.pop(key,None)
+        for extrakey in [k for k in self._extras if k[:2] == key]:
+            del self._extras[extrakey]
+
+    def invalidate(self,table=None,library=None):
+        #-------------------------------------------------------
+        # Function: invalidate
+        # Desc: Drop cached definitions.
+        # :param self: Pointer to object instance.
+        # :param table: Table name. None=All tables. Default=None
+        # :param library: Library name. None=Any library. Default=None
+        # :return: Number of tables dropped
+        #-------------------------------------------------------
+        with self._lock:
+            keys=[key for key in self._entries
+                  if (table == None or key[1] == table.strip().upper())
+                  and (library == None or key[0] == library.strip().upper())]
+            for key in keys:
+                self._remove_locked(key)
+            self._invalidations += len(keys)
+            return len(keys)
+
+    def invalidatesql(self,sql):
+        #-------------------------------------------------------
+        # Function: invalidatesql
+        # Desc: Drop definitions of tables changed by a DDL statement
+        # :param self: Pointer to object instance.
+        # :param sql: SQL statement that ran
+        # :return: Number of tables dropped
+        #-------------------------------------------------------
+        if _ddlregex.match(sql) == None:
+           return 0
+        tables=gettables(sql)
+        # ALTER TABLE/DROP TABLE names are not after FROM/INTO
+        match=re.match(r"^\s*(?:alter|drop|create|rename)\s+(?:or\s+replace\s+)?table\s+([\w#@$\"./]+)",sql,re.IGNORECASE)
+        if match != None:
+           tables.add(re.split(r"[./]",match.group(1))[-1].strip('"'))
+        count=0
+        for table in tables:
+            count += self.invalidate(table)
+        return count
+
+    def clear(self):
+        #-------------------------------------------------------
+        # Function: clear
+        # Desc: Drop all cached definitions
+        # :param self: Pointer to object instance.
+        # :return: Number of tables dropped
+        #-------------------------------------------------------
+        return self.invalidate()
+
+    def stats(self):
+        #-------------------------------------------------------
+        # Function: stats
+        # Desc: Get cache counters
+        # :param self: Pointer to object instance.
+        # :return: Dictionary of hits, misses, tables, loadseconds etc
+        #-------------------------------------------------------
+        with self._lock:
+            return {"hits":self._hits,
+                    "misses":self._misses,
+                    "tables":len(self._entries),
+                    "loadseconds":self._loadseconds,
+                    "invalidations":self._invalidations,
+                    "ttl":self._ttl,
+                    "source":self._source}
@@ -0,0 +1,357 @@
+#-------------------------------------------------------
+# Module: dbmetrics.py
+# Desc: This module contains pluggable instrumentation for
+#       the DbIbmiOdbc class. Each connect, execute,
+#       executeiwthparms, executemany, execute_query and
+#       fetch call is timed and recorded with its row count,
+#       server round trips and errors into latency histograms
+#       per operation and calling method. Custom before/after
+#       hooks can be added to feed other monitoring systems.
+#       Results can be read as a dictionary snapshot or in
+#       Prometheus text exposition format.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Iterating a metered cursor fetches and records blocks of rows
+#
+# Usage:
+# db.enable_metrics()
+# ...
+# print(db.getmetrics().prometheus())
+# snapshot = db.getmetrics().snapshot()
+#
+# Hooks:
+# def before(op,sql,parms): ...
+# def after(event): ...   event keys: op, caller, sql, parms,
+#                         seconds, rows, roundtrips, error, cached
+# db.getmetrics().add_hook(before,after)
+#-------------------------------------------------------
+import os
+import sys
+import threading
+import time
+
+# Default latency bucket upper bounds in seconds
+DEFAULT_BUCKETS=(0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0,30.0)
+
+# Frames from these modules are skipped when finding the caller
+_internalfiles=("dbibmiodbc.py","dbmetrics.py","dbpool.py","dbcache.py",
+               "dbasync.py","dbpartition.py","dbexport.py","dbcolumnar.py",
+               "dbrecord.py","dbprefetch.py","dbload.py")
+
+def _getcaller():
+    #----------------------------------------------------------
+    # Function: _getcaller
+    # Desc: Get the name of the first function outside the database
+    #       wrapper modules on the call stack. For DbApp methods this
+    #       is the method name, Ex: insert_qcustcdt.
+    # :return: Function name
+    #----------------------------------------------------------
+    frame=sys._getframe(2)
+    while frame != None:
+        if os.path.basename(frame.f_code.co_filename) not in _internalfiles:
+           return frame.f_code.co_name
+        frame=frame.f_back
+    return "<unknown>"
+
+class DbHistogram():
+    #-------------------------------------------------------
+    # Class: DbHistogram
+    # Desc: Fixed bucket latency histogram with call, error, row
+    #       and round trip totals for one operation and caller.
+    #       Not locked itself. DbMetrics holds its lock while updating.
+    #-------------------------------------------------------
+
+    def __init__(self,buckets):
+        self.buckets=buckets
+        self.counts=[0] * (len(buckets) + 1) # Last slot is +Inf
+        self.count=0
+        self.errors=0
+        self.rows=0
+        self.roundtrips=0
+        self.totalseconds=0.0
+        self.maxseconds=0.0
+
+    def observe(self,seconds,rows,roundtrips,error):
+        #-------------------------------------------------------
+        # Function: observe
+        # Desc: Record one call
+        # :param self: Pointer to object instance.
+        # :param seconds: Wall time
+        # :param rows: Rows affected or fetched, None if unknown
+        # :param roundtrips: Server round trips
+        # :param error: True if the call failed
+        #-------------------------------------------------------
+        index=len(self.buckets)
+        for i,bound in enumerate(self.buckets):
+            if seconds <= bound:
+               index=i
+               break
+        self.counts[index] += 1
+        self.count += 1
+        self.totalseconds += seconds
+        if seconds > self.maxseconds:
+           self.maxseconds=seconds
+        if error:
+           self.errors += 1
+        if rows != None and rows > 0:
+           self.rows += rows
+        self.roundtrips += roundtrips
+
+    def quantile(self,q):
+        #-------------------------------------------------------
+        # Function: quantile
+        # Desc: Estimate a latency quantile by linear interpolation
+        #       inside the bucket that contains it.
+        # :param self: Pointer to object instance.
+        # :param q: Quantile between 0 and 1. Ex: 0.99
+        # :return: Seconds or None if there are no observations
+        #-------------------------------------------------------
+        if self.count == 0:
+           return None
+        target=q * self.count
+        cumulative=0
+        for i,count in enumerate(self.counts):
+            if count > 0 and cumulative + count >= target:
+               lower=self.buckets[i-1] if i > 0 else 0.0
+               upper=self.buckets[i] if i < len(self.buckets) else self.maxseconds
+               return lower + (upper - lower) * ((target - cumulative) / count)
+            cumulative += count
+        return self.maxseconds
+
+class DbMetrics():
+
+    def __init__(self,buckets=DEFAULT_BUCKETS,callerlabels=True):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. One DbMetrics can be shared by many
+        #       DbIbmiOdbc instances and connection pools.
+        # :param self: Object instance
+        # :param buckets: Sorted latency bucket bounds in seconds. Default=DEFAULT_BUCKETS
+        # :param callerlabels: True=Record the calling method name with each
+        #        operation so DbApp methods are reported separately. Default=True
+        #-------------------------------------------------------
+        self._buckets=tuple(buckets)
+        self._callerlabels=callerlabels
+        self._lock=threading.Lock()
+        self._histograms={}
+        self._before=[]
+        self._after=[]
+
+    def add_hook(self,before=None,after=None):
+        #-------------------------------------------------------
+        # Function: add_hook
+        # Desc: Add instrumentation hooks. Hook errors are printed and
+        #       never interrupt the database call.
+        # :param self: Pointer to object instance.
+        # :param before: Function(op,sql,parms) called before each operation
+        # :param after: Function(event) called after each operation with a
+        #        dictionary of op, caller, sql, parms, seconds, rows,
+        #        roundtrips, error and cached
+        # :return: True-Hooks added
+        #-------------------------------------------------------
+        with self._lock:
+            if before != None:
+               self._before=self._before + [before]
+            if after != None:
+               self._after=self._after + [after]
+        return True
+
+    def remove_hook(self,hook):
+        #-------------------------------------------------------
+        # Function: remove_hook
+        # Desc: Remove a before or after hook
+        # :param self: Pointer to object instance.
+        # :param hook: Hook function previously added
+        # :return: True-Hook removed
+        #-------------------------------------------------------
+        with self._lock:
+            self._before=[h for h in self._before if h != hook]
+            self._after=[h for h in self._after if h != hook]
+        return True
+
+    def begin(self,op,sql=None,parms=None):
+        #-------------------------------------------------------
+        # Function: begin
+        # Desc: Start timing an operation and run before hooks
+        # :param self: Pointer to object instance.
+        # :param op: Operation name. Ex: execute
+        # :param sql: SQL statement if any
+        # :param parms: SQL parameters if any
+        # :return: Token to pass to end()
+        #-------------------------------------------------------
+        for hook in self._before:
+            try:
+               hook(op,sql,parms)
+            except Exception as e:
+               print(e)
+        caller=_getcaller() if self._callerlabels else ""
+        return [op,caller,sql,parms,time.perf_counter()]
+
+    def end(self,token,rows=None,roundtrips=1,error=None,cached=False):
+        #-------------------------------------------------------
+        # Function: end
+        # Desc: Finish timing an operation, record it and run after hooks
+        # :param self: Pointer to object instance.
+        # :param token: Token from begin()
+        # :param rows: Rows affected or fetched. Default=None
+        # :param roundtrips: Server round trips made. Default=1
+        # :param error: Exception if the operation failed. Default=None
+        # :param cached: True if served from the result cache. Default=False
+        # :return: Elapsed seconds
+        #-------------------------------------------------------
+        seconds=time.perf_counter() - token[4]
+        op=token[0]
+        caller=token[1]
+        key=(op,caller)
+        with self._lock:
+            histogram=self._histograms.get(key)
+            if histogram == None:
+               histogram=DbHistogram(self._buckets)
+               self._histograms[key]=histogram
+            histogram.observe(seconds,rows,roundtrips,error != None)
+        if len(self._after) > 0:
+           event={"op":op,"caller":caller,"sql":token[2],"parms":token[3],
+                  "seconds":seconds,"rows":rows,"roundtrips":roundtrips,
+                  "error":error,"cached":cached}
+           for hook in self._after:
+               try:
+                  hook(event)
+               except Exception as e:
+                  print(e)
+        return seconds
+
+    def snapshot(self):
+        #-------------------------------------------------------
+        # Function: snapshot
+        # Desc: Get all recorded metrics as a dictionary keyed by
+        #       "op" or "op:caller"
+        # :param self: Pointer to object instance.
+        # :return: Dictionary of count, errors, rows, roundtrips,
+        #  totalseconds, meanseconds, maxseconds, p50, p95, p99 and buckets
+        #-------------------------------------------------------
+        result={}
+        with self._lock:
+            for (op,caller),h in self._histograms.items():
+                name=f"{op}:{caller}" if caller != "" else op
+                cumulative=0
+                buckets={}
+                for bound,count in zip(list(self._buckets) + ["+Inf"],h.counts):
+                    cumulative += count
+                    buckets[str(bound)]=cumulative
+                result[name]={"op":op,
+                              "caller":caller,
+                              "count":h.count,
+                              "errors":h.errors,
+                              "rows":h.rows,
+                              "roundtrips":h.roundtrips,
+                              "totalseconds":h.totalseconds,
+                              "meanseconds":h.totalseconds / h.count if h.count > 0 else 0.0,
+                              "maxseconds":h.maxseconds,
+                              "p50":h.quantile(0.50),
+                              "p95":h.quantile(0.95),
+                              "p99":h.quantile(0.99),
+                              "buckets":buckets}
+        return result
+
+    def prometheus(self,prefix="dbibmiodbc"):
+        #-------------------------------------------------------
+        # Function: prometheus
+        # Desc: Get all recorded metrics in Prometheus text format
+        # :param self: Pointer to object instance.
+        # :param prefix: Metric name prefix. Default=dbibmiodbc
+        # :return: Text for a /metrics endpoint
+        #-------------------------------------------------------
+        lines=[f"# HELP {prefix}_op_seconds Database operation wall time",
+               f"# TYPE {prefix}_op_seconds histogram"]
+        totals=[]
+        with self._lock:
+            for (op,caller),h in sorted(self._histograms.items()):
+                labels=f'op="{op}",caller="{caller}"'
+                cumulative=0
+                for bound,count in zip(list(self._buckets) + ["+Inf"],h.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_op_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{prefix}_op_seconds_sum{{{labels}}} {h.totalseconds}")
+                lines.append(f"{prefix}_op_seconds_count{{{labels}}} {h.count}")
+                totals.append((labels,h))
+        for name,attr,helptext in (("errors","errors","Failed database operations"),
+                                   ("rows","rows","Rows affected or fetched"),
+                                   ("roundtrips","roundtrips","Server round trips")):
+            lines.append(f"# HELP {prefix}_{name}_total {helptext}")
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for labels,h in totals:
+                lines.append(f"{prefix}_{name}_total{{{labels}}} {getattr(h,attr)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        #-------------------------------------------------------
+        # Function: reset
+        # Desc: Clear all recorded metrics. Hooks are kept.
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        with self._lock:
+            self._histograms={}
+
+class DbMeteredCursor():
+    #-------------------------------------------------------
+    # Class: DbMeteredCursor
+    # Desc: Cursor wrapper returned by execute_query when metrics
+    #       are enabled. Each fetch call is recorded as a fetch
+    #       operation. Iteration reads blocks of at least iterblock
+    #       rows with fetchmany and records one operation per block.
+    #       Everything else is passed through.
+    #-------------------------------------------------------
+
+    # Smallest block read by iteration. pyodbc arraysize defaults to 1.
+    iterblock=1000
+
+    def __init__(self,cursor,metrics,sql):
+        self._cursor=cursor
+        self._metrics=metrics
+        self._sql=sql
+
+    def __getattr__(self,name):
+        return getattr(self._cursor,name)
+
+    def _fetch(self,func,*args):
+        token=self._metrics.begin("fetch",self._sql)
+        try:
+           result=func(*args)
+        except Exception as e:
+           self._metrics.end(token,None,1,e)
+           raise
+        if isinstance(result,list):
+           self._metrics.end(token,len(result),1)
+        else:
+           self._metrics.end(token,0 if result == None else 1,1)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self,size=None):
+        if size == None:
+           return self._fetch(self._cursor.fetchmany)
+        return self._fetch(self._cursor.fetchmany,size)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        size=max(getattr(self._cursor,"arraysize",1),self.iterblock)
+        while True:
+            rows=self.fetchmany(size)
+            yield from rows
+            if len(rows) < size:
+               return
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc,tb):
+        self._cursor.close()
+        return False
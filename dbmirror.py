@@ -0,0 +1,754 @@
+#-------------------------------------------------------
+# Module: dbmirror.py
+# Desc: This module contains a local SQLite mirror of
+#       selected IBM i tables for the DbIbmiOdbc class.
+#       Lookups on tables that change a few times a day can
+#       be answered from the local file instead of the host.
+#
+#       A refresh does not reload the table. Each mirrored
+#       row keeps a hash of its values, and a refresh only
+#       writes rows whose hash changed and deletes rows that
+#       are gone. Tables with a change timestamp column only
+#       read the rows changed since the last refresh, with a
+#       full hash compare every fullinterval seconds to pick
+#       up deleted rows. Each refresh is one SQLite
+#       transaction and the file runs in WAL mode, so readers
+#       see either the old or the new copy, never a mix.
+#
+#       Reads are only routed to the mirror when it was
+#       refreshed within the staleness bound and no write to
+#       the table has been made through the attached
+#       DbIbmiOdbc instance since, so an app reads its own
+#       writes. Queries SQLite can not run go to the host, and
+#       so do queries SQLite would answer differently: arithmetic,
+#       concatenation, most functions, and ordering or range
+#       tests on character or nullable columns (DB2 for i uses
+#       the EBCDIC sort sequence and sorts nulls high). LIKE is
+#       case sensitive on both.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Background refreshes use the caller's timeout and stats
+# 10/18/2026 - Case sensitive LIKE and host fallback for SQL that differs on SQLite
+#
+# Usage:
+# mirror = DbMirror(db,"/tmp/qiws_mirror.db")
+# mirror.add_table("QCUSTCDT","QIWS",["CUSNUM"])
+# mirror.refresh()                       # Initial copy
+# mirror.start(60)                       # Refresh every 60 seconds
+# db.use_mirror(mirror,maxstaleness=300) # Route reads of fresh tables
+# cursor1 = db.execute_query(sql,parms,usemirror=True)
+#
+# Type mapping:
+# CHAR -> TEXT COLLATE RTRIM, kept padded so values and
+#         comparisons match DB2 for i
+# Integers, NUMERIC/DECIMAL with scale 0 -> INTEGER
+# NUMERIC/DECIMAL with scale -> REAL, read back as Decimal
+#         rounded to the column scale. Exact up to 15 digits.
+# DATE, TIME, TIMESTAMP -> ISO 8601 TEXT
+#-------------------------------------------------------
+import datetime
+import decimal
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from dbcache import gettables, isactionsql
+from dbmetadata import CHARTYPES
+
+# Integer and binary floating point column types
+_inttypes=("SMALLINT","INTEGER","INT","BIGINT")
+_floattypes=("DOUBLE","FLOAT","REAL","DECFLOAT")
+_binarytypes=("BINARY","VARBIN","VARBINARY","BLOB","CHAR () FOR BIT DATA")
+
+# Quoted strings and identifiers in SQL text
+_literalregex=re.compile(r"'(?:[^']|'')*'")
+_identregex=re.compile(r'"(?:[^"]|"")*"')
+
+# Words before a parenthesis that mean the same in SQLite and DB2 for i
+_portablecalls=frozenset(["select","from","join","on","using","where","and","or","not","in",
+                          "exists","as","values","when","then","else","union","intersect",
+                          "except","all","any","some","with","count","coalesce","ifnull","nullif"])
+_callregex=re.compile(r"([a-z_][\w$#@]*)\s*\(",re.IGNORECASE)
+
+# SQLite only keywords and operators whose results can differ
+_hostwordregex=re.compile(r"\b(?:glob|regexp|match|collate)\b",re.IGNORECASE)
+_starregex=re.compile(r"(\bselect\s+(?:distinct\s+)?|[.(,]\s*)\*",re.IGNORECASE)
+_negativeregex=re.compile(r"([(,=<>]|\b(?:and|or|not|when|then|else|between|select))\s*-\s*(?=\d)",re.IGNORECASE)
+_operatorregex=re.compile(r"[-+*/%|&^~]")
+_rangeregex=re.compile(r"<(?!>)|(?<!<)>|\bbetween\b",re.IGNORECASE)
+_orderregex=re.compile(r"\border\s+by\s+(.*?)(?=\blimit\b|\boffset\b|\bfetch\b|\bfor\b|\)|$)",re.IGNORECASE | re.DOTALL)
+_orderitemregex=re.compile(r"^(?:[\w$#@]+\.)?([\w$#@]+)(?:\s+(?:asc|desc))?$",re.IGNORECASE)
+
+# Mirror state kept in the SQLite file
+_statesql=("create table if not exists _mirrorstate (tablekey text primary key, "
+           "asof real, watermark text, lastfull real, columns text)")
+
+def _fromreal(scale):
+    #----------------------------------------------------------
+    # Function: _fromreal
+    # Desc: Get a converter from a stored REAL to a Decimal rounded
+    #       to the column scale
+    # :param scale: Column scale
+    # :return: Function
+    #----------------------------------------------------------
+    exponent=decimal.Decimal(1).scaleb(-scale)
+    return lambda value: decimal.Decimal(repr(value)).quantize(exponent)
+
+def _tolocaltime(value):
+    if isinstance(value,datetime.datetime):
+       return value.isoformat(" ")
+    return value.isoformat()
+
+def _fromlocaltimestamp(value):
+    return datetime.datetime.fromisoformat(value)
+
+def _columntype(column):
+    #----------------------------------------------------------
+    # Function: _columntype
+    # Desc: Get the SQLite type and value converters for a column
+    # :param column: DbColumn from DbIbmiOdbc.getcolumns
+    # :return: Tuple of (SQLite type, tolocal function or None,
+    #  fromlocal function or None, Python type for descriptions)
+    #----------------------------------------------------------
+    typename=column.typename.upper()
+    scale=column.scale or 0
+    if typename in CHARTYPES:
+       return ("TEXT COLLATE RTRIM",None,None,str)
+    if typename in _inttypes:
+       return ("INTEGER",int,None,int)
+    if typename in ("NUMERIC","DECIMAL"):
+       if scale == 0:
+          return ("INTEGER",int,decimal.Decimal,decimal.Decimal)
+       return ("REAL",float,_fromreal(scale),decimal.Decimal)
+    if typename in _floattypes:
+       return ("REAL",float,None,float)
+    if typename == "DATE":
+       return ("TEXT",_tolocaltime,datetime.date.fromisoformat,datetime.date)
+    if typename == "TIME":
+       return ("TEXT",_tolocaltime,datetime.time.fromisoformat,datetime.time)
+    if typename in ("TIMESTAMP","TIMESTMP"):
+       return ("TEXT",_tolocaltime,_fromlocaltimestamp,datetime.datetime)
+    if typename in _binarytypes:
+       return ("BLOB",bytes,None,bytes)
+    return ("TEXT",None,None,str)
+
+def _localparm(value):
+    #----------------------------------------------------------
+    # Function: _localparm
+    # Desc: Convert a query parameter to the stored form
+    # :param value: Parameter value
+    # :return: SQLite parameter value
+    #----------------------------------------------------------
+    if isinstance(value,decimal.Decimal):
+       return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value,(datetime.date,datetime.time)):
+       return _tolocaltime(value)
+    return value
+
+def _quote(name):
+    return '"' + name.replace('"','""') + '"'
+
+def _unquote(match):
+    name=match.group(0)[1:-1]
+    return name if re.fullmatch(r"[\w$#@]+",name) else "_"
+
+def _hostonly(sql,parms,tables):
+    #----------------------------------------------------------
+    # Function: _hostonly
+    # Desc: Check if a query uses SQL that SQLite runs but answers
+    #       differently than DB2 for i. Arithmetic runs on REAL
+    #       instead of DECIMAL, / is integer division, and functions
+    #       other than count and the null functions can differ.
+    #       DB2 for i compares character data in the EBCDIC sort
+    #       sequence and sorts nulls high, so range tests on
+    #       character values and ordering on character or nullable
+    #       columns give other results.
+    # :param sql: SQL query with local table names
+    # :param parms: SQL parameters list or None
+    # :param tables: DbMirrorTable list the query reads
+    # :return: True-Run the query on the host, False-Mirror gives the same result
+    #----------------------------------------------------------
+    hasliteral=_literalregex.search(sql) != None
+    text=_literalregex.sub("''",sql)
+    text=_identregex.sub(_unquote,text)
+    if _hostwordregex.search(text) != None:
+       return True
+    for match in _callregex.finditer(text):
+        if match.group(1).lower() not in _portablecalls:
+           return True
+    text=_starregex.sub(r"\1",text)
+    text=_negativeregex.sub(r"\1 ",text)
+    if _operatorregex.search(text) != None:
+       return True
+
+    # Range tests involving character values
+    if _rangeregex.search(text) != None:
+       if hasliteral or any([isinstance(value,str) for value in parms or []]):
+          return True
+       words=set([word.upper() for word in re.findall(r"[\w$#@]+",text)])
+       for mirrortable in tables:
+           for name,(fromlocal,typecode,column) in mirrortable.fromlocal.items():
+               if typecode == str and name in words:
+                  return True
+
+    # Ordering only by non null columns that sort the same way
+    for match in _orderregex.finditer(text):
+        for item in match.group(1).split(","):
+            found=_orderitemregex.match(item.strip())
+            if found == None:
+               return True
+            name=found.group(1).upper()
+            columns=[t.fromlocal[name] for t in tables if name in t.fromlocal]
+            if len(columns) == 0:
+               return True
+            fromlocal,typecode,column=columns[0]
+            if typecode == str or column.nullable:
+               return True
+    return False
+
+class DbMirrorTable():
+    #-------------------------------------------------------
+    # Class: DbMirrorTable
+    # Desc: Definition and refresh state of one mirrored table
+    #-------------------------------------------------------
+
+    def __init__(self,table,library,columns,keycolumns,timestampcolumn):
+        self.table=table.upper()
+        self.library=library.upper()
+        self.key=f"{self.library}.{self.table}"
+        # Rows and hashes are kept in the _rows table. Queries read the
+        # view so select * returns the host columns only.
+        self.localname=f"{self.library}_{self.table}".lower()
+        self.rowsname=self.localname + "_rows"
+        self.columns=columns
+        self.names=[column.name.upper() for column in columns]
+        self.keycolumns=[name.upper() for name in keycolumns]
+        for name in self.keycolumns:
+            if name not in self.names:
+               raise ValueError(f"Key column {name} is not in {self.key}")
+        self.keyindex=[self.names.index(name) for name in self.keycolumns]
+        self.timestampcolumn=timestampcolumn.upper() if timestampcolumn else None
+        if self.timestampcolumn != None and self.timestampcolumn not in self.names:
+           raise ValueError(f"Timestamp column {self.timestampcolumn} is not in {self.key}")
+        self.types=[_columntype(column) for column in columns]
+        self.tolocal=[(i,t[1]) for i,t in enumerate(self.types) if t[1] != None]
+        self.fromlocal=dict([(name,(t[2],t[3],column)) for name,t,column in zip(self.names,self.types,columns)])
+        self.signature=",".join([f"{name} {t[0]}" for name,t in zip(self.names,self.types)])
+        # Qualified references in host SQL. Ex: qiws.qcustcdt, QIWS/QCUSTCDT
+        self.refregex=re.compile(r'(?<![\w$#@."])"?' + re.escape(self.library) + r'"?\s*[./]\s*"?'
+                                 + re.escape(self.table) + r'"?(?![\w$#@])',re.IGNORECASE)
+        self.asof=None
+        self.watermark=None
+        self.lastfull=None
+        self.dirtyat=0.0
+        self.laststats=None
+
+    def localrow(self,row):
+        #-------------------------------------------------------
+        # Function: localrow
+        # Desc: Convert a host row to its stored form
+        # :param self: Pointer to object instance.
+        # :param row: Host row
+        # :return: List of values
+        #-------------------------------------------------------
+        values=list(row)
+        for i,convert in self.tolocal:
+            if values[i] != None:
+               values[i]=convert(values[i])
+        return values
+
+    def rowhash(self,values):
+        #-------------------------------------------------------
+        # Function: rowhash
+        # Desc: Hash the stored form of a row
+        # :param self: Pointer to object instance.
+        # :param values: Values from localrow
+        # :return: Hex digest
+        #-------------------------------------------------------
+        text="\x1f".join(["\x00" if value == None else repr(value) for value in values])
+        return hashlib.blake2b(text.encode("utf-8"),digest_size=16).hexdigest()
+
+class DbMirrorCursor():
+    #-------------------------------------------------------
+    # Class: DbMirrorCursor
+    # Desc: Cursor over mirror query results. Values are
+    #       converted back to the types the host returns and
+    #       description is built from the table definitions.
+    #-------------------------------------------------------
+
+    def __init__(self,cursor,tables):
+        self._cursor=cursor
+        self.arraysize=1
+        self.rowcount=-1
+        self.description=[]
+        converters=[]
+        for i,desc in enumerate(cursor.description):
+            name=desc[0].upper()
+            found=None
+            for table in tables:
+                if name in table.fromlocal:
+                   found=table.fromlocal[name]
+                   break
+            if found == None:
+               self.description.append((name,str,None,None,None,None,True))
+               continue
+            fromlocal,typecode,column=found
+            self.description.append((name,typecode,None,column.size,column.size,column.scale,
+                                     bool(column.nullable)))
+            if fromlocal != None:
+               converters.append((i,fromlocal))
+        self._converters=converters
+
+    def _convert(self,rows):
+        if len(self._converters) == 0:
+           return rows
+        converted=[]
+        for row in rows:
+            values=list(row)
+            for i,convert in self._converters:
+                if values[i] != None:
+                   values[i]=convert(values[i])
+            converted.append(tuple(values))
+        return converted
+
+    def fetchone(self):
+        row=self._cursor.fetchone()
+        if row == None:
+           return None
+        return self._convert([row])[0]
+
+    def fetchmany(self,size=None):
+        if size == None:
+           size=self.arraysize
+        return self._convert(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._convert(self._cursor.fetchall())
+
+    def __iter__(self):
+        while True:
+            rows=self.fetchmany(1000)
+            for row in rows:
+                yield row
+            if len(rows) < 1000:
+               return
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc,tb):
+        self.close()
+        return False
+
+class DbMirror():
+
+    def __init__(self,db,path,chunksize=5000,fullinterval=3600):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. Opens or creates the SQLite mirror file.
+        # :param self: Object instance
+        # :param db: DbIbmiOdbc/DbApp instance used to read the host tables
+        # :param path: SQLite file path
+        # :param chunksize: Host rows per fetch during a refresh. Default=5000
+        # :param fullinterval: Seconds between full hash compares of tables
+        #        refreshed by timestamp. Default=3600
+        #-------------------------------------------------------
+        self._db=db
+        self._path=path
+        self._chunksize=chunksize
+        self._fullinterval=fullinterval
+        self._tables={}
+        self._refreshlock=threading.Lock()
+        self._statslock=threading.Lock()
+        self._local=threading.local()
+        self._readconns=[]
+        self._lasterror=""
+        self._thread=None
+        self._stop=threading.Event()
+        self._counters={"hits":0,"stale":0,"fallbacks":0,"refreshes":0,"refresherrors":0}
+        self._writer=self._connect()
+        self._writer.execute("pragma journal_mode=wal")
+        self._writer.execute(_statesql)
+
+    def _connect(self):
+        conn=sqlite3.connect(self._path,timeout=30,check_same_thread=False,isolation_level=None)
+        conn.execute("pragma synchronous=normal")
+        # LIKE is case sensitive on DB2 for i
+        conn.execute("pragma case_sensitive_like=on")
+        return conn
+
+    def _readconn(self):
+        #-------------------------------------------------------
+        # Function: _readconn
+        # Desc: Get the SQLite read connection for the current thread
+        # :param self: Pointer to object instance.
+        # :return: sqlite3 connection
+        #-------------------------------------------------------
+        conn=getattr(self._local,"conn",None)
+        if conn == None:
+           conn=self._connect()
+           self._local.conn=conn
+           with self._statslock:
+               self._readconns.append(conn)
+        return conn
+
+    def getlasterror(self):
+        return self._lasterror
+
+    def _count(self,name):
+        with self._statslock:
+            self._counters[name] += 1
+
+    def add_table(self,table,library,keycolumns,timestampcolumn=None):
+        #-------------------------------------------------------
+        # Function: add_table
+        # Desc: Mirror a table. The column definitions are read from
+        #       the catalog and the local table is created. If the host
+        #       definition changed since the file was made the local
+        #       copy is dropped and the next refresh copies it again.
+        # :param self: Pointer to object instance.
+        # :param table: Table name. Ex: QCUSTCDT
+        # :param library: Library name. Ex: QIWS
+        # :param keycolumns: Unique key column names. Ex: ["CUSNUM"]
+        # :param timestampcolumn: Row change timestamp column for incremental
+        #  refresh, or None to compare row hashes. Default=None
+        # :return: True-Table added, False-Error
+        #-------------------------------------------------------
+        try:
+           columns=self._db.getcolumns(table,library)
+           if columns == None:
+              raise Exception(f"Could not read columns of {library}.{table}: {self._db.getlasterror()}")
+           mirrortable=DbMirrorTable(table,library,columns,keycolumns,timestampcolumn)
+
+           with self._refreshlock:
+              state=self._writer.execute("select asof,watermark,lastfull,columns from _mirrorstate where tablekey=?",
+                                         (mirrortable.key,)).fetchone()
+              if state != None and state[3] == mirrortable.signature:
+                 mirrortable.asof,mirrortable.watermark,mirrortable.lastfull=state[0],state[1],state[2]
+              else:
+                 columnsql=", ".join([f"{_quote(name)} {t[0]}" for name,t in zip(mirrortable.names,mirrortable.types)])
+                 keysql=", ".join([_quote(name) for name in mirrortable.keycolumns])
+                 selectsql=", ".join([_quote(name) for name in mirrortable.names])
+                 self._writer.execute("begin immediate")
+                 try:
+                    self._writer.execute(f"drop view if exists {mirrortable.localname}")
+                    self._writer.execute(f"drop table if exists {mirrortable.rowsname}")
+                    self._writer.execute(f"create table {mirrortable.rowsname} ({columnsql}, "
+                                         f"_rowhash text, primary key ({keysql}))")
+                    if mirrortable.timestampcolumn != None:
+                       self._writer.execute(f"create index {mirrortable.rowsname}_ts on "
+                                            f"{mirrortable.rowsname} ({_quote(mirrortable.timestampcolumn)})")
+                    self._writer.execute(f"create view {mirrortable.localname} as "
+                                         f"select {selectsql} from {mirrortable.rowsname}")
+                    self._writer.execute("insert or replace into _mirrorstate values (?,?,?,?,?)",
+                                         (mirrortable.key,None,None,None,mirrortable.signature))
+                    self._writer.execute("commit")
+                 except Exception:
+                    self._writer.execute("rollback")
+                    raise
+              self._tables[mirrortable.key]=mirrortable
+           return True
+        except Exception as e:
+            self._lasterror=str(e)
+            print(e)
+            return False
+
+    def refresh(self,table=None,library=None,full=False,db=None):
+        #-------------------------------------------------------
+        # Function: refresh
+        # Desc: Bring mirrored tables up to date with the host
+        # :param self: Pointer to object instance.
+        # :param table: Table name or None for all tables. Default=None
+        # :param library: Library of the table. Default=None
+        # :param full: True=Compare every row even for timestamp tables. Default=False
+        # :param db: DbIbmiOdbc instance to read with. Default=Constructor instance
+        # :return: Dictionary of table name to refresh stats (mode, read,
+        #  changed, deleted, unchanged, seconds) or None on error
+        #-------------------------------------------------------
+        try:
+           if db == None:
+              db=self._db
+           if table != None:
+              key=f"{(library or '').upper()}.{table.upper()}"
+              if key not in self._tables:
+                 raise Exception(f"{key} is not mirrored")
+              tables=[self._tables[key]]
+           else:
+              tables=list(self._tables.values())
+           results={}
+           with self._refreshlock:
+              for mirrortable in tables:
+                  results[mirrortable.key]=self._refreshtable(mirrortable,full,db)
+           return results
+        except Exception as e:
+            self._count("refresherrors")
+            self._lasterror=str(e)
+            print(e)
+            return None
+
+    def _refreshtable(self,mirrortable,full,db):
+        #-------------------------------------------------------
+        # Function: _refreshtable
+        # Desc: Refresh one table in a single SQLite transaction
+        # :param self: Pointer to object instance.
+        # :param mirrortable: DbMirrorTable
+        # :param full: True=Full hash compare
+        # :param db: DbIbmiOdbc instance to read with
+        # :return: Refresh stats dictionary
+        #-------------------------------------------------------
+        started=time.time()
+        bytimestamp=(mirrortable.timestampcolumn != None and not full and mirrortable.watermark != None
+                     and mirrortable.lastfull != None and started - mirrortable.lastfull < self._fullinterval)
+        names=mirrortable.names
+        sql=f"select {', '.join([_quote(name) for name in names])} from {mirrortable.library}.{mirrortable.table}"
+        parms=None
+        if bytimestamp:
+           # Rows changed in the same instant as the watermark are read
+           # again so none are missed. Writing them again is harmless.
+           sql += f" where {_quote(mirrortable.timestampcolumn)} >= ?"
+           parms=[mirrortable.fromlocal[mirrortable.timestampcolumn][0](mirrortable.watermark)]
+
+        localname=mirrortable.rowsname
+        keycolumns=mirrortable.keycolumns
+        keyindex=mirrortable.keyindex
+        tsindex=names.index(mirrortable.timestampcolumn) if mirrortable.timestampcolumn != None else None
+        upsertsql=(f"insert or replace into {localname} ({', '.join([_quote(name) for name in names])}, _rowhash) "
+                   f"values ({', '.join(['?'] * (len(names) + 1))})")
+        stats={"mode":"timestamp" if bytimestamp else "hash","read":0,"changed":0,"deleted":0,"unchanged":0}
+        watermark=mirrortable.watermark
+
+        cursor1=db.execute_query(sql,parms,usecache=False)
+        if cursor1 == None:
+           raise Exception(f"Refresh of {mirrortable.key} failed: {db.getlasterror()}")
+        writer=self._writer
+        try:
+           writer.execute("begin immediate")
+           keysql=", ".join([_quote(name) for name in keycolumns])
+           hashes={}
+           if bytimestamp:
+              for row in writer.execute(f"select {keysql}, _rowhash from {localname} where "
+                                        f"{_quote(mirrortable.timestampcolumn)} >= ?",(watermark,)):
+                  hashes[row[:-1]]=row[-1]
+           else:
+              for row in writer.execute(f"select {keysql}, _rowhash from {localname}"):
+                  hashes[row[:-1]]=row[-1]
+
+           while True:
+               rows=cursor1.fetchmany(self._chunksize)
+               if len(rows) == 0:
+                  break
+               upserts=[]
+               for row in rows:
+                   values=mirrortable.localrow(row)
+                   rowhash=mirrortable.rowhash(values)
+                   key=tuple([values[i] for i in keyindex])
+                   if hashes.pop(key,None) == rowhash:
+                      stats["unchanged"] += 1
+                   else:
+                      values.append(rowhash)
+                      upserts.append(values)
+                   if tsindex != None and values[tsindex] != None and (watermark == None or values[tsindex] > watermark):
+                      watermark=values[tsindex]
+               if len(upserts) > 0:
+                  writer.executemany(upsertsql,upserts)
+                  stats["changed"] += len(upserts)
+               stats["read"] += len(rows)
+               if len(rows) < self._chunksize:
+                  break
+
+           # Rows no longer on the host. A timestamp refresh only reads
+           # changed rows so deletes wait for the next full compare.
+           if not bytimestamp and len(hashes) > 0:
+              wheresql=" and ".join([f"{_quote(name)} = ?" for name in keycolumns])
+              writer.executemany(f"delete from {localname} where {wheresql}",list(hashes.keys()))
+              stats["deleted"]=len(hashes)
+
+           lastfull=mirrortable.lastfull if bytimestamp else started
+           writer.execute("update _mirrorstate set asof=?, watermark=?, lastfull=? where tablekey=?",
+                          (started,watermark,lastfull,mirrortable.key))
+           writer.execute("commit")
+        except Exception:
+           if writer.in_transaction:
+              writer.execute("rollback")
+           raise
+        finally:
+           cursor1.close()
+
+        mirrortable.asof=started
+        mirrortable.watermark=watermark
+        mirrortable.lastfull=lastfull
+        stats["seconds"]=time.time() - started
+        mirrortable.laststats=stats
+        self._count("refreshes")
+        return stats
+
+    def start(self,interval=60):
+        #-------------------------------------------------------
+        # Function: start
+        # Desc: Refresh all tables every interval seconds on a
+        #       background thread with its own connection. A failed
+        #       refresh is retried at the next interval, meanwhile
+        #       reads fall back to the host once the staleness bound
+        #       is passed.
+        # :param self: Pointer to object instance.
+        # :param interval: Seconds between refreshes. Default=60
+        # :return: True-Started
+        #-------------------------------------------------------
+        if self._thread != None:
+           return True
+        self._stop.clear()
+        self._thread=threading.Thread(target=self._run,args=(interval,),name="dbmirror",daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self,interval):
+        # The caller's connection can not be shared with this thread
+        db=self._db.newinstance()
+        try:
+           while not self._stop.wait(interval):
+               self.refresh(db=db)
+        finally:
+           db.close_connection()
+
+    def stop(self):
+        #-------------------------------------------------------
+        # Function: stop
+        # Desc: Stop background refreshes
+        # :param self: Pointer to object instance.
+        # :return: True-Stopped
+        #-------------------------------------------------------
+        if self._thread != None:
+           self._stop.set()
+           self._thread.join()
+           self._thread=None
+        return True
+
+    def staleness(self,table,library):
+        #-------------------------------------------------------
+        # Function: staleness
+        # Desc: Get the age of the mirror copy of a table
+        # :param self: Pointer to object instance.
+        # :param table: Table name
+        # :param library: Library name
+        # :return: Seconds since the last refresh started, or None if
+        #  the table is not mirrored or has not been refreshed
+        #-------------------------------------------------------
+        mirrortable=self._tables.get(f"{library.upper()}.{table.upper()}")
+        if mirrortable == None or mirrortable.asof == None:
+           return None
+        return max(0.0,time.time() - mirrortable.asof)
+
+    def markdirty(self,sql):
+        #-------------------------------------------------------
+        # Function: markdirty
+        # Desc: Stop serving tables changed by an action statement
+        #       until their next refresh. CALL can change anything so
+        #       it marks every table.
+        # :param self: Pointer to object instance.
+        # :param sql: SQL statement that ran
+        #-------------------------------------------------------
+        if not isactionsql(sql):
+           return
+        now=time.time()
+        if re.match(r"^\s*call\b",sql,re.IGNORECASE):
+           names=None
+        else:
+           names=gettables(sql)
+        for mirrortable in self._tables.values():
+            if names == None or mirrortable.table.lower() in names:
+               mirrortable.dirtyat=now
+
+    def query(self,sql,parms=None,maxstaleness=300):
+        #-------------------------------------------------------
+        # Function: query
+        # Desc: Run a host SQL query on the mirror when every table it
+        #       reads is mirrored and fresh enough. Library qualified
+        #       names are mapped to the local tables.
+        # :param self: Pointer to object instance.
+        # :param sql: SQL query with ? markers
+        # :param parms: SQL parameters list. Default=None
+        # :param maxstaleness: Oldest acceptable copy in seconds. Default=300
+        # :return: DbMirrorCursor, or None when the host should be used
+        #-------------------------------------------------------
+        names=gettables(sql)
+        if len(names) == 0:
+           return None
+        now=time.time()
+        tables=[]
+        localsql=sql
+        for name in names:
+            found=[t for t in self._tables.values() if t.table.lower() == name]
+            if len(found) == 0:
+               return None
+            for mirrortable in found:
+                if mirrortable.refregex.search(localsql) == None:
+                   continue
+                if (mirrortable.asof == None or now - mirrortable.asof > maxstaleness
+                    or mirrortable.dirtyat >= mirrortable.asof):
+                   self._count("stale")
+                   return None
+                localsql=mirrortable.refregex.sub(mirrortable.localname,localsql)
+                tables.append(mirrortable)
+        if len(tables) == 0:
+           return None
+        if _hostonly(localsql,parms,tables):
+           self._count("fallbacks")
+           return None
+        try:
+           cursor=self._readconn().execute(localsql,[_localparm(value) for value in parms or []])
+           if cursor.description == None:
+              return None
+           result=DbMirrorCursor(cursor,tables)
+        except sqlite3.Error:
+           # Not valid SQLite SQL or refers to a table that is not mirrored
+           self._count("fallbacks")
+           return None
+        self._count("hits")
+        return result
+
+    def stats(self):
+        #-------------------------------------------------------
+        # Function: stats
+        # Desc: Get routing counters and the state of each table
+        # :param self: Pointer to object instance.
+        # :return: Dictionary of hits, stale, fallbacks, refreshes,
+        #  refresherrors and tables (staleness, dirty, last refresh stats)
+        #-------------------------------------------------------
+        with self._statslock:
+            result=dict(self._counters)
+        result["tables"]={}
+        for mirrortable in self._tables.values():
+            result["tables"][mirrortable.key]={
+                "staleness":self.staleness(mirrortable.table,mirrortable.library),
+                "dirty":mirrortable.asof != None and mirrortable.dirtyat >= mirrortable.asof,
+                "keycolumns":mirrortable.keycolumns,
+                "timestampcolumn":mirrortable.timestampcolumn,
+                "laststats":mirrortable.laststats}
+        return result
+
+    def close(self):
+        #-------------------------------------------------------
+        # Function: close
+        # Desc: Stop background refreshes and close the SQLite file
+        # :param self: Pointer to object instance.
+        # :return: True-Closed
+        #-------------------------------------------------------
+        self.stop()
+        with self._statslock:
+            conns=self._readconns
+            self._readconns=[]
+        for conn in conns:
+            try:
+               conn.close()
+            except Exception:
+               pass
+        self._writer.close()
+        return True
@@ -0,0 +1,167 @@
+#-------------------------------------------------------
+# Module: dbpage.py
+# Desc: This module contains keyset pagination helpers for
+#       the DbIbmiOdbc class. A page is read with a WHERE
+#       predicate on the key values of the last row of the
+#       previous page instead of OFFSET, so with an index on
+#       the key columns every page costs the same as page one.
+#       The position is handed to the caller as an opaque
+#       URL safe continuation token.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+#
+# Usage:
+# rows,token = db.query_page("select * from qiws.qcustcdt",["CUSNUM"],50)
+# rows,token = db.query_page("select * from qiws.qcustcdt",["CUSNUM"],50,token)
+# token is None after the last page.
+#
+# Composite keys are compared with expanded predicates, Ex:
+# keys A,B after (1,2): A >= 1 AND (A > 1 OR (A = 1 AND B > 2))
+# Key columns must be in the select list, must not be null
+# and together must be unique. Add " DESC" to a key name to
+# page it in descending order.
+#-------------------------------------------------------
+import base64
+import datetime
+import decimal
+import hashlib
+import json
+from dbcache import normalizesql
+
+def parsekeys(keycolumns):
+    #----------------------------------------------------------
+    # Function: parsekeys
+    # Desc: Split key names and sort directions
+    # :param keycolumns: Key column name or list of names. Ex: ["LSTNAM","CUSNUM DESC"]
+    # :return: List of (name,descending) tuples
+    #----------------------------------------------------------
+    if isinstance(keycolumns,str):
+       keycolumns=[keycolumns]
+    keys=[]
+    for key in keycolumns:
+        words=key.split()
+        if len(words) == 0 or len(words) > 2 or (len(words) == 2 and words[1].upper() not in ("ASC","DESC")):
+           raise ValueError(f"Invalid key column: {key}")
+        keys.append((words[0],len(words) == 2 and words[1].upper() == "DESC"))
+    if len(keys) == 0:
+       raise ValueError("At least one key column is required")
+    return keys
+
+def keyset_predicate(keys,values):
+    #----------------------------------------------------------
+    # Function: keyset_predicate
+    # Desc: Build the predicate selecting rows after a key position
+    # :param keys: List of (name,descending) from parsekeys
+    # :param values: Key values of the last row read
+    # :return: Tuple of (predicate,parms)
+    #----------------------------------------------------------
+    terms=[]
+    parms=[]
+    for i,(name,descending) in enumerate(keys):
+        parts=[]
+        for j in range(i):
+            parts.append(f"{keys[j][0]} = ?")
+            parms.append(values[j])
+        parts.append(f"{name} {'<' if descending else '>'} ?")
+        parms.append(values[i])
+        terms.append("(" + " AND ".join(parts) + ")")
+
+    # Leading column range lets the optimizer position the index
+    first,descending=keys[0]
+    predicate=f"{first} {'<=' if descending else '>='} ? AND (" + " OR ".join(terms) + ")"
+    return predicate,[values[0]] + parms
+
+def page_sql(sql,keys,pagesize,values=None):
+    #----------------------------------------------------------
+    # Function: page_sql
+    # Desc: Wrap a query to read one page. One extra row is read to
+    #       tell whether another page follows.
+    # :param sql: Base query without ORDER BY or FETCH FIRST
+    # :param keys: List of (name,descending) from parsekeys
+    # :param pagesize: Rows per page
+    # :param values: Key values of the last row of the previous page.
+    #  None=First page. Default=None
+    # :return: Tuple of (sql,keyparms)
+    #----------------------------------------------------------
+    orderby=", ".join([f"{name} DESC" if descending else name for name,descending in keys])
+    where=""
+    keyparms=[]
+    if values != None:
+       predicate,keyparms=keyset_predicate(keys,values)
+       where=f" WHERE {predicate}"
+    return f"select * from ({sql}) as dbpage{where} ORDER BY {orderby} FETCH FIRST {int(pagesize) + 1} ROWS ONLY",keyparms
+
+def _fingerprint(sql,keys):
+    #----------------------------------------------------------
+    # Function: _fingerprint
+    # Desc: Short hash tying a token to its query and keys
+    #----------------------------------------------------------
+    text=normalizesql(sql) + "|" + ",".join([f"{name.upper()}:{int(descending)}" for name,descending in keys])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+def _tagvalue(value):
+    #----------------------------------------------------------
+    # Function: _tagvalue
+    # Desc: Encode a key value keeping its type
+    #----------------------------------------------------------
+    if isinstance(value,decimal.Decimal):
+       return ["d",str(value)]
+    if isinstance(value,datetime.datetime):
+       return ["ts",value.isoformat()]
+    if isinstance(value,datetime.date):
+       return ["dt",value.isoformat()]
+    if isinstance(value,datetime.time):
+       return ["tm",value.isoformat()]
+    if isinstance(value,(bytes,bytearray)):
+       return ["b",base64.b64encode(value).decode("ascii")]
+    return ["v",value]
+
+def _untagvalue(tagged):
+    #----------------------------------------------------------
+    # Function: _untagvalue
+    # Desc: Decode a key value encoded by _tagvalue
+    #----------------------------------------------------------
+    tag,value=tagged
+    if tag == "d":
+       return decimal.Decimal(value)
+    if tag == "ts":
+       return datetime.datetime.fromisoformat(value)
+    if tag == "dt":
+       return datetime.date.fromisoformat(value)
+    if tag == "tm":
+       return datetime.time.fromisoformat(value)
+    if tag == "b":
+       return base64.b64decode(value)
+    return value
+
+def encodetoken(sql,keys,values):
+    #----------------------------------------------------------
+    # Function: encodetoken
+    # Desc: Build a continuation token for a key position
+    # :param sql: Base query
+    # :param keys: List of (name,descending) from parsekeys
+    # :param values: Key values of the last row returned
+    # :return: URL safe token string
+    #----------------------------------------------------------
+    payload=json.dumps({"f":_fingerprint(sql,keys),"k":[_tagvalue(value) for value in values]},separators=(",",":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decodetoken(sql,keys,token):
+    #----------------------------------------------------------
+    # Function: decodetoken
+    # Desc: Get the key position from a continuation token
+    # :param sql: Base query the token must belong to
+    # :param keys: List of (name,descending) from parsekeys
+    # :param token: Token from encodetoken
+    # :return: List of key values. Raises ValueError for a bad token or
+    #  a token from a different query.
+    #----------------------------------------------------------
+    try:
+       payload=json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8"))
+       values=[_untagvalue(tagged) for tagged in payload["k"]]
+    except Exception:
+       raise ValueError("Invalid page token")
+    if payload.get("f") != _fingerprint(sql,keys) or len(values) != len(keys):
+       raise ValueError("Page token does not match this query")
+    return values
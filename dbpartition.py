@@ -0,0 +1,298 @@
+#-------------------------------------------------------
+# Module: dbpartition.py
+# Desc: This module contains a partitioned query reader
+#       that splits one large query into partitions (key
+#       ranges, MOD hashing or RRN hashing), runs the
+#       partitions at the same time on separate connections
+#       and merges the rows back into a single stream.
+#       Each partition records its own timing so the
+#       partition count can be tuned.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Named parameter dictionaries are bound before partitioning.
+#              Partitions run with the caller's timeout, deadlines and stats.
+#
+# Usage:
+# query = DbPartitionedQuery(db,"select * from qiws.qcustcdt",
+#                            mod_partitions("CUSNUM",4))
+# for row in query:
+#    ...
+# print(query.getstats())
+#
+# The partition predicate is added to the query as a WHERE
+# clause on a derived table. To place it yourself (needed for
+# RRN partitions) put {partition} in the SQL where the
+# predicate belongs. Ex:
+# "select * from qiws.qcustcdt t where state=? and {partition}"
+# Partition ? markers are bound after the query parms so
+# {partition} must come after any other ? markers.
+#-------------------------------------------------------
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dbpool import DbConnectionPool
+
+def range_partitions(column,bounds):
+    #----------------------------------------------------------
+    # Function: range_partitions
+    # Desc: Build key range partitions from a sorted list of split
+    #       points. n split points make n+1 partitions.
+    #       Ex: range_partitions("CUSNUM",[300000,600000]) gives
+    #       CUSNUM < 300000, 300000 <= CUSNUM < 600000, CUSNUM >= 600000
+    # :param column: Key column name
+    # :param bounds: Sorted list of split values
+    # :return: List of (predicate,parms) tuples
+    #----------------------------------------------------------
+    partitions=[]
+    if len(bounds) == 0:
+       return [("1=1",[])]
+    partitions.append((f"{column} < ?",[bounds[0]]))
+    for i in range(1,len(bounds)):
+        partitions.append((f"{column} >= ? and {column} < ?",[bounds[i-1],bounds[i]]))
+    partitions.append((f"{column} >= ?",[bounds[-1]]))
+    return partitions
+
+def mod_partitions(expression,count):
+    #----------------------------------------------------------
+    # Function: mod_partitions
+    # Desc: Build hash partitions using MOD on an integer column or
+    #       expression. Spreads rows evenly when keys are not dense.
+    #       Ex: mod_partitions("CUSNUM",4)
+    # :param expression: Integer column or expression
+    # :param count: Number of partitions
+    # :return: List of (predicate,parms) tuples
+    #----------------------------------------------------------
+    return [(f"MOD({expression},{count}) = ?",[i]) for i in range(count)]
+
+def rrn_partitions(table,count):
+    #----------------------------------------------------------
+    # Function: rrn_partitions
+    # Desc: Build hash partitions on relative record number. Works for
+    #       any table without needing a numeric key. The SQL must use
+    #       {partition} since RRN needs the table name or correlation.
+    #       Ex: rrn_partitions("t",4) with
+    #       "select * from qiws.qcustcdt t where {partition}"
+    # :param table: Table name or correlation name in the query
+    # :param count: Number of partitions
+    # :return: List of (predicate,parms) tuples
+    #----------------------------------------------------------
+    return mod_partitions(f"RRN({table})",count)
+
+def key_range_partitions(db,table,column,count):
+    #----------------------------------------------------------
+    # Function: key_range_partitions
+    # Desc: Build evenly sized numeric key range partitions by reading
+    #       the MIN and MAX of the key column.
+    # :param db: DbIbmiOdbc instance
+    # :param table: Qualified table name. Ex: qiws.qcustcdt
+    # :param column: Numeric key column
+    # :param count: Number of partitions
+    # :return: List of (predicate,parms) tuples. Raises an exception on error.
+    #----------------------------------------------------------
+    cursor1=db.execute_query(f"select min({column}),max({column}) from {table}")
+    if cursor1 == None:
+       raise Exception(f"Query issue: {db.getlasterror()}")
+    row=cursor1.fetchone()
+    cursor1.close()
+    low,high=row[0],row[1]
+    if low == None or count < 2:
+       return [("1=1",[])]
+    step=(high - low) / count
+    bounds=[]
+    for i in range(1,count):
+        bound=int(low + step * i)
+        if len(bounds) == 0 or bound > bounds[-1]:
+           bounds.append(bound)
+    return range_partitions(column,bounds)
+
+class DbPartitionedQuery():
+
+    def __init__(self,db,sql,partitions,parms=None,chunksize=1000,maxworkers=None,ordered=False,queuedepth=4):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. The query starts when iteration starts.
+        # :param self: Object instance
+        # :param db: DbIbmiOdbc/DbApp instance. With a pool each partition
+        #        borrows its own pooled connection. Without a pool a
+        #        temporary pool is opened from the connection string.
+        # :param sql: Base SQL query
+        # :param partitions: List of (predicate,parms) tuples or predicate strings
+        # :param parms: Optional SQL parameters for the base query. List for ?
+        #        markers or dictionary for named :parm parameters. Default=None
+        # :param chunksize: Rows per fetch. Default=1000
+        # :param maxworkers: Partitions run at once. Default=number of partitions
+        # :param ordered: True=Yield partition 1 rows, then partition 2 etc.
+        #        False=Yield blocks as soon as any partition has them. Default=False
+        # :param queuedepth: Fetched blocks buffered per partition. Default=4
+        #-------------------------------------------------------
+        # Named parameters become ? markers here so the partition
+        # parms can be appended after them
+        if isinstance(parms,dict):
+           sql,parms=db.bindparms(sql,parms)
+        self._db=db
+        self._sql=sql
+        self._parms=list(parms) if parms != None else []
+        self._partitions=[(p,[]) if isinstance(p,str) else (p[0],list(p[1])) for p in partitions]
+        self._chunksize=chunksize
+        self._maxworkers=maxworkers if maxworkers != None else len(self._partitions)
+        self._ordered=ordered
+        self._queuedepth=queuedepth
+        self._stop=threading.Event()
+        self._stats=[]
+        self._elapsed=0.0
+
+    def _buildsql(self,predicate):
+        #-------------------------------------------------------
+        # Function: _buildsql
+        # Desc: Combine the base query with one partition predicate
+        # :param self: Pointer to object instance.
+        # :param predicate: Partition predicate
+        # :return: SQL for the partition
+        #-------------------------------------------------------
+        if "{partition}" in self._sql:
+           return self._sql.replace("{partition}",f"({predicate})")
+        return f"select * from ({self._sql}) as dbpartition where {predicate}"
+
+    def _put(self,q,item):
+        #-------------------------------------------------------
+        # Function: _put
+        # Desc: Put an item on a bounded queue, giving up if the reader
+        #       has stopped so worker threads never block forever.
+        # :param self: Pointer to object instance.
+        # :return: True-Queued, False-Reader stopped
+        #-------------------------------------------------------
+        while not self._stop.is_set():
+            try:
+               q.put(item,timeout=0.1)
+               return True
+            except queue.Full:
+               pass
+        return False
+
+    def _runpartition(self,db,index,q):
+        #-------------------------------------------------------
+        # Function: _runpartition
+        # Desc: Worker thread body. Streams one partition into its queue
+        #       followed by a None end marker.
+        # :param self: Pointer to object instance.
+        # :param db: DbIbmiOdbc instance to query with
+        # :param index: Partition number
+        # :param q: Output queue
+        #-------------------------------------------------------
+        predicate,partparms=self._partitions[index]
+        stat=self._stats[index]
+        start=time.perf_counter()
+        try:
+           sql=self._buildsql(predicate)
+           parms=self._parms + partparms
+           chunks=db.iter_query_chunks(sql,parms if len(parms) > 0 else None,self._chunksize)
+           try:
+              for rows in chunks:
+                  if stat["firstrowseconds"] == None:
+                     stat["firstrowseconds"]=time.perf_counter() - start
+                  stat["rows"] += len(rows)
+                  if not self._put(q,(index,rows)):
+                     break
+           finally:
+              chunks.close()
+        except Exception as e:
+           stat["error"]=str(e)
+           self._put(q,(index,e))
+        finally:
+           stat["seconds"]=time.perf_counter() - start
+           self._put(q,(index,None))
+
+    def iter_chunks(self):
+        #-------------------------------------------------------
+        # Function: iter_chunks
+        # Desc: Generator that runs all partitions and yields row lists.
+        #       Stopping early cancels the remaining partitions.
+        # :param self: Pointer to object instance.
+        # :return: Generator of row lists. Raises an exception if a partition fails.
+        #-------------------------------------------------------
+        count=len(self._partitions)
+        self._stop.clear()
+        self._stats=[{"partition":i,"predicate":p[0],"parms":p[1],"rows":0,
+                      "seconds":None,"firstrowseconds":None,"error":None}
+                     for i,p in enumerate(self._partitions)]
+
+        # Each partition needs its own connection
+        db=self._db
+        temppool=None
+        if db.getpool() == None:
+           temppool=DbConnectionPool(db.getconnstring(),minsize=0,maxsize=self._maxworkers)
+           db=db.newinstance(temppool)
+
+        if self._ordered:
+           queues=[queue.Queue(self._queuedepth) for i in range(count)]
+        else:
+           shared=queue.Queue(self._queuedepth * max(self._maxworkers,1))
+           queues=[shared for i in range(count)]
+
+        start=time.perf_counter()
+        executor=ThreadPoolExecutor(max_workers=max(self._maxworkers,1),thread_name_prefix="dbpartition")
+        try:
+           for i in range(count):
+               executor.submit(contextvars.copy_context().run,self._runpartition,db,i,queues[i])
+
+           if self._ordered:
+              # Drain partitions in order. Later partitions keep
+              # fetching until their queues fill up.
+              for i in range(count):
+                  while True:
+                      index,item=queues[i].get()
+                      if item == None:
+                         break
+                      if isinstance(item,Exception):
+                         raise Exception(f"Partition {index} failed: {item}")
+                      yield item
+           else:
+              done=0
+              while done < count:
+                  index,item=shared.get()
+                  if item == None:
+                     done += 1
+                     continue
+                  if isinstance(item,Exception):
+                     raise Exception(f"Partition {index} failed: {item}")
+                  yield item
+        finally:
+           # Stop workers, wait for them to close their cursors
+           self._stop.set()
+           executor.shutdown(wait=True)
+           self._elapsed=time.perf_counter() - start
+           if temppool != None:
+              temppool.close()
+
+    def __iter__(self):
+        #-------------------------------------------------------
+        # Function: __iter__
+        # Desc: Iterate rows from all partitions
+        # :param self: Pointer to object instance.
+        # :return: Generator of rows
+        #-------------------------------------------------------
+        for rows in self.iter_chunks():
+            yield from rows
+
+    def getstats(self):
+        #-------------------------------------------------------
+        # Function: getstats
+        # Desc: Get per partition timing from the last run. Each entry has
+        #       partition, predicate, parms, rows, seconds, firstrowseconds
+        #       and error.
+        # :param self: Pointer to object instance.
+        # :return: List of dictionaries
+        #-------------------------------------------------------
+        return self._stats
+
+    def getelapsed(self):
+        #-------------------------------------------------------
+        # Function: getelapsed
+        # Desc: Get total wall time of the last run in seconds
+        # :param self: Pointer to object instance.
+        # :return: Seconds
+        #-------------------------------------------------------
+        return self._elapsed
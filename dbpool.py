@@ -0,0 +1,559 @@
+#-------------------------------------------------------
+# Module: dbpool.py
+# Desc: This module contains a thread safe ODBC connection
+#       pool for the DbIbmiOdbc class. Each pooled connection
+#       is an IBM i host server job (QZDASOINIT), so the pool
+#       caps how many jobs an app server can allocate and
+#       lets short requests skip the connect/auth handshake.
+#       https://github.com/mkleehammer/pyodbc/
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - Query timeouts and cancels no longer discard the connection
+# 10/18/2026 - Pooled cursors roll back before checkin and stop fetching once released
+#
+# Usage:
+# pool = DbConnectionPool("DSN=*LOCAL;CommitMode=1;EXTCOLINFO=1;",minsize=2,maxsize=10)
+# db = DbApp(pool=pool)
+# Every DbApp method then borrows a connection for the
+# duration of the call and hands it back when done.
+#-------------------------------------------------------
+import pyodbc as db2
+import threading
+import time
+from collections import deque
+
+class DbPoolTimeout(Exception):
+    #-------------------------------------------------------
+    # Class: DbPoolTimeout
+    # Desc: Raised when no pooled connection becomes available
+    #       before the checkout timeout expires.
+    #-------------------------------------------------------
+    pass
+
+class DbPoolClosed(Exception):
+    #-------------------------------------------------------
+    # Class: DbPoolClosed
+    # Desc: Raised when a connection is requested from a pool
+    #       that has already been closed.
+    #-------------------------------------------------------
+    pass
+
+def isconnectionerror(e):
+    #----------------------------------------------------------
+    # Function: isconnectionerror
+    # Desc: Check if an exception means the ODBC connection itself
+    #       is unusable (communication link failure, host server
+    #       job ended etc) rather than a plain SQL error.
+    # :param e: Exception raised by pyodbc
+    # :return: True-Connection is broken, False-SQL level error
+    #----------------------------------------------------------
+    # A query timeout (HYT00) or cancel (HY008) ends the statement
+    # but the connection is still good
+    if len(e.args) > 0 and isinstance(e.args[0],str) and e.args[0] in ("HYT00","HY008"):
+       return False
+    if isinstance(e,db2.OperationalError):
+       return True
+    # SQLSTATE class 08 = connection exception
+    if len(e.args) > 0 and isinstance(e.args[0],str) and e.args[0].startswith("08"):
+       return True
+    return False
+
+class _DbPoolEntry():
+    #-------------------------------------------------------
+    # Class: _DbPoolEntry
+    # Desc: Bookkeeping for a single pooled connection
+    #-------------------------------------------------------
+    __slots__=("conn","created","lastused")
+
+    def __init__(self,conn,now):
+        self.conn=conn
+        self.created=now
+        self.lastused=now
+
+class DbConnectionPool():
+
+    def __init__(self,db_connstring,minsize=1,maxsize=10,idletimeout=300,maxlifetime=3600,
+                 probeinterval=30,probesql="values 1",checkouttimeout=30,connectfunc=None):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. Opens minsize connections up front.
+        # :param self: Object instance
+        # :param db_connstring: ODBC connection string for IBM i
+        # :param minsize: Connections kept open even when idle. Default=1
+        # :param maxsize: Hard cap on open connections (host server jobs). Default=10
+        # :param idletimeout: Seconds an idle connection above minsize is kept. 0=Never evict. Default=300
+        # :param maxlifetime: Seconds before a connection is retired and replaced. 0=Unlimited. Default=3600
+        # :param probeinterval: Connections idle longer than this many seconds are
+        #  probed with probesql before being handed out. 0=Always probe. Default=30
+        # :param probesql: Cheap liveness statement. Default="values 1"
+        # :param checkouttimeout: Seconds to wait for a free connection when the pool
+        #  is at maxsize before raising DbPoolTimeout. Default=30
+        # :param connectfunc: Optional function returning a new connection. Default=pyodbc.connect(db_connstring)
+        #-------------------------------------------------------
+        if maxsize < 1:
+           raise ValueError("maxsize must be at least 1")
+        if minsize < 0 or minsize > maxsize:
+           raise ValueError("minsize must be between 0 and maxsize")
+
+        self._dbconnstring=db_connstring
+        self._minsize=minsize
+        self._maxsize=maxsize
+        self._idletimeout=idletimeout
+        self._maxlifetime=maxlifetime
+        self._probeinterval=probeinterval
+        self._probesql=probesql
+        self._checkouttimeout=checkouttimeout
+        self._connectfunc=connectfunc
+        self._metrics=None
+
+        self._cond=threading.Condition(threading.Lock())
+        self._idle=deque()
+        self._inuse={}
+        self._size=0 # Open plus currently connecting
+        self._closed=False
+
+        # Counters exposed via stats()
+        self._created=0
+        self._discarded=0
+        self._checkouts=0
+        self._waits=0
+        self._timeouts=0
+        self._probefailures=0
+
+        # Pre-open the minimum number of connections
+        for i in range(minsize):
+            self._size += 1
+            try:
+               conn=self._connect()
+            except Exception:
+               self._size -= 1
+               raise
+            self._idle.append(_DbPoolEntry(conn,time.monotonic()))
+
+    def _connect(self):
+        #-------------------------------------------------------
+        # Function: _connect
+        # Desc: Open a new physical connection. Called without the lock held.
+        # :param self: Pointer to object instance.
+        # :return: New connection
+        #-------------------------------------------------------
+        metrics=self._metrics
+        token=metrics.begin("connect") if metrics != None else None
+        try:
+           if self._connectfunc != None:
+              conn=self._connectfunc()
+           else:
+              conn=db2.connect(self._dbconnstring)
+        except Exception as e:
+           if token != None:
+              metrics.end(token,error=e)
+           raise
+        if token != None:
+           metrics.end(token)
+        with self._cond:
+           self._created += 1
+        return conn
+
+    def _closeconn(self,conn):
+        #-------------------------------------------------------
+        # Function: _closeconn
+        # Desc: Close a physical connection ignoring errors since it
+        #       may already be broken. Called without the lock held.
+        # :param self: Pointer to object instance.
+        # :param conn: Connection to close
+        #-------------------------------------------------------
+        try:
+           conn.close()
+        except Exception:
+           pass
+
+    def _isexpired(self,entry,now):
+        #-------------------------------------------------------
+        # Function: _isexpired
+        # Desc: Check if a connection has passed its max lifetime
+        # :param self: Pointer to object instance.
+        # :return: True-Retire connection, False-Keep
+        #-------------------------------------------------------
+        return self._maxlifetime > 0 and now - entry.created >= self._maxlifetime
+
+    def _evict_locked(self,now):
+        #-------------------------------------------------------
+        # Function: _evict_locked
+        # Desc: Remove idle connections that are past max lifetime or that
+        #       have sat idle too long while the pool is above minsize.
+        #       Caller must hold the lock and close the returned connections.
+        # :param self: Pointer to object instance.
+        # :param now: Current monotonic time
+        # :return: List of connections to close
+        #-------------------------------------------------------
+        evicted=[]
+        keep=deque()
+        # Oldest idle entries are at the left of the deque
+        while self._idle:
+            entry=self._idle.popleft()
+            if self._isexpired(entry,now):
+               evicted.append(entry.conn)
+            elif (self._idletimeout > 0 and now - entry.lastused >= self._idletimeout
+                  and self._size - len(evicted) > self._minsize):
+               evicted.append(entry.conn)
+            else:
+               keep.append(entry)
+        self._idle=keep
+        self._size -= len(evicted)
+        self._discarded += len(evicted)
+        if len(evicted) > 0:
+           self._cond.notify_all()
+        return evicted
+
+    def _probe(self,conn):
+        #-------------------------------------------------------
+        # Function: _probe
+        # Desc: Run the cheap liveness statement on a connection
+        # :param self: Pointer to object instance.
+        # :param conn: Connection to test
+        # :return: True-Connection usable, False-Connection broken
+        #-------------------------------------------------------
+        try:
+           cursor1=conn.cursor()
+           cursor1.execute(self._probesql)
+           cursor1.fetchall()
+           cursor1.close()
+           return True
+        except Exception:
+           return False
+
+    def checkout(self,timeout=None):
+        #-------------------------------------------------------
+        # Function: checkout
+        # Desc: Borrow a connection from the pool. Idle connections are
+        #       reused most-recently-used first so surplus ones can age
+        #       out. A new connection is opened if the pool is below
+        #       maxsize, otherwise the caller waits for a checkin.
+        # :param self: Pointer to object instance.
+        # :param timeout: Seconds to wait. Default=pool checkouttimeout
+        # :return: Connection. Raises DbPoolTimeout or DbPoolClosed.
+        #-------------------------------------------------------
+        if timeout == None:
+           timeout=self._checkouttimeout
+        deadline=time.monotonic() + timeout
+
+        while True:
+            entry=None
+            evicted=[]
+            with self._cond:
+                while True:
+                    if self._closed:
+                       raise DbPoolClosed("Connection pool is closed.")
+                    now=time.monotonic()
+                    evicted.extend(self._evict_locked(now))
+                    if self._idle:
+                       entry=self._idle.pop()
+                       break
+                    if self._size < self._maxsize:
+                       # Reserve a slot and connect outside the lock
+                       self._size += 1
+                       break
+                    remaining=deadline - now
+                    if remaining <= 0:
+                       self._timeouts += 1
+                       raise DbPoolTimeout(f"No pooled connection available after {timeout} seconds. Pool maxsize={self._maxsize}")
+                    self._waits += 1
+                    self._cond.wait(remaining)
+
+            for conn in evicted:
+                self._closeconn(conn)
+
+            if entry == None:
+               try:
+                  conn=self._connect()
+               except Exception:
+                  with self._cond:
+                     self._size -= 1
+                     self._cond.notify()
+                  raise
+               entry=_DbPoolEntry(conn,time.monotonic())
+            elif time.monotonic() - entry.lastused >= self._probeinterval:
+               # Connection has been idle a while. Make sure the
+               # host server job is still there before handing it out.
+               if not self._probe(entry.conn):
+                  self._closeconn(entry.conn)
+                  with self._cond:
+                     self._size -= 1
+                     self._discarded += 1
+                     self._probefailures += 1
+                     self._cond.notify()
+                  continue
+
+            with self._cond:
+                self._inuse[id(entry.conn)]=entry
+                self._checkouts += 1
+            return entry.conn
+
+    def checkin(self,conn,discard=False):
+        #-------------------------------------------------------
+        # Function: checkin
+        # Desc: Return a borrowed connection to the pool. The caller is
+        #       responsible for commit/rollback before checkin.
+        # :param self: Pointer to object instance.
+        # :param conn: Connection previously returned by checkout
+        # :param discard: True=Close the connection instead of reusing it.
+        #  Use after a connection level error. Default=False
+        #-------------------------------------------------------
+        closeit=False
+        with self._cond:
+            entry=self._inuse.pop(id(conn),None)
+            if entry == None:
+               # Not ours or already checked in
+               return
+            now=time.monotonic()
+            if discard or self._closed or self._isexpired(entry,now):
+               closeit=True
+               self._size -= 1
+               self._discarded += 1
+            else:
+               entry.lastused=now
+               self._idle.append(entry)
+            self._cond.notify()
+        if closeit:
+           self._closeconn(conn)
+
+    def connection(self):
+        #-------------------------------------------------------
+        # Function: connection
+        # Desc: Context manager that checks a connection out and back in.
+        #       with pool.connection() as conn:
+        # :param self: Pointer to object instance.
+        # :return: Context manager yielding a connection
+        #-------------------------------------------------------
+        return _DbPoolConnection(self)
+
+    def evict(self):
+        #-------------------------------------------------------
+        # Function: evict
+        # Desc: Run idle and lifetime eviction now. Eviction also happens
+        #       on each checkout, so this is only needed for pools that
+        #       sit unused for long periods.
+        # :param self: Pointer to object instance.
+        # :return: Number of connections closed
+        #-------------------------------------------------------
+        with self._cond:
+            evicted=self._evict_locked(time.monotonic())
+        for conn in evicted:
+            self._closeconn(conn)
+        return len(evicted)
+
+    def stats(self):
+        #-------------------------------------------------------
+        # Function: stats
+        # Desc: Get pool counters
+        # :param self: Pointer to object instance.
+        # :return: Dictionary of pool size and counters
+        #-------------------------------------------------------
+        with self._cond:
+            return {"size":self._size,
+                    "idle":len(self._idle),
+                    "inuse":len(self._inuse),
+                    "minsize":self._minsize,
+                    "maxsize":self._maxsize,
+                    "created":self._created,
+                    "discarded":self._discarded,
+                    "checkouts":self._checkouts,
+                    "waits":self._waits,
+                    "timeouts":self._timeouts,
+                    "probefailures":self._probefailures,
+                    "closed":self._closed}
+
+    def use_metrics(self,metrics):
+        #-------------------------------------------------------
+        # Function: use_metrics
+        # Desc: Record new connections as connect operations
+        # :param self: Pointer to object instance.
+        # :param metrics: DbMetrics instance or None
+        #-------------------------------------------------------
+        self._metrics=metrics
+
+    def getcheckouttimeout(self):
+        #-------------------------------------------------------
+        # Function: getcheckouttimeout
+        # Desc: Get the default seconds checkout waits for a connection
+        # :param self: Pointer to object instance.
+        # :return: Seconds
+        #-------------------------------------------------------
+        return self._checkouttimeout
+
+    def getconnstring(self):
+        #-------------------------------------------------------
+        # Function: getconnstring
+        # Desc: Get the connection string used for new connections
+        # :param self: Pointer to object instance.
+        # :return: Connection string
+        #-------------------------------------------------------
+        return self._dbconnstring
+
+    def isclosed(self):
+        #-------------------------------------------------------
+        # Function: isclosed
+        # Desc: Check if the pool has been closed
+        # :param self: Pointer to object instance.
+        # :return: True-Closed, False-Open
+        #-------------------------------------------------------
+        return self._closed
+
+    def close(self):
+        #-------------------------------------------------------
+        # Function: close
+        # Desc: Close all idle connections. Connections still checked out
+        #       are closed when they are checked in.
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        with self._cond:
+            self._closed=True
+            idle=[entry.conn for entry in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._closeconn(conn)
+
+class _DbPoolConnection():
+    #-------------------------------------------------------
+    # Class: _DbPoolConnection
+    # Desc: Context manager returned by DbConnectionPool.connection()
+    #-------------------------------------------------------
+
+    def __init__(self,pool):
+        self._pool=pool
+        self._conn=None
+
+    def __enter__(self):
+        self._conn=self._pool.checkout()
+        return self._conn
+
+    def __exit__(self,exc_type,exc,tb):
+        self._pool.checkin(self._conn,discard=exc != None and isconnectionerror(exc))
+        self._conn=None
+        return False
+
+class DbPooledCursor():
+    #-------------------------------------------------------
+    # Class: DbPooledCursor
+    # Desc: Cursor wrapper returned by DbIbmiOdbc.execute_query in
+    #       pooled mode. The borrowed connection stays checked out
+    #       while rows are being read and is returned to the pool
+    #       when the cursor is closed, fully fetched or garbage
+    #       collected. Everything else is passed through to the
+    #       underlying pyodbc cursor.
+    #-------------------------------------------------------
+
+    def __init__(self,cursor,pool,conn):
+        self._cursor=cursor
+        self._pool=pool
+        self._conn=conn
+        self._released=False
+
+    def __getattr__(self,name):
+        return getattr(self._cursor,name)
+
+    def _release(self,discard=False):
+        #-------------------------------------------------------
+        # Function: _release
+        # Desc: Close the cursor, roll back the open unit of work and
+        #       return the connection. With CommitMode 1 or higher even
+        #       a select holds locks until the connection ends its unit
+        #       of work, so it is rolled back before the next borrower
+        #       gets it. Safe to call more than once.
+        # :param self: Pointer to object instance.
+        # :param discard: True-Connection is broken, close it instead
+        #-------------------------------------------------------
+        self._released=True
+        conn=self._conn
+        if conn == None:
+           return
+        self._conn=None
+        try:
+           self._cursor.close()
+        except Exception:
+           pass
+        if not discard:
+           try:
+              conn.rollback()
+           except Exception as e:
+              discard=isconnectionerror(e)
+        self._pool.checkin(conn,discard=discard)
+
+    def _failed(self,e):
+        #-------------------------------------------------------
+        # Function: _failed
+        # Desc: Release after a fetch error, dropping the connection
+        #       when the error means it is no longer usable.
+        # :param self: Pointer to object instance.
+        # :param e: Exception raised by the fetch
+        #-------------------------------------------------------
+        if isconnectionerror(e):
+           self._release(discard=True)
+
+    def fetchone(self):
+        if self._released:
+           return None
+        try:
+           row=self._cursor.fetchone()
+        except Exception as e:
+           self._failed(e)
+           raise
+        if row == None:
+           self._release()
+        return row
+
+    def fetchmany(self,size=None):
+        if self._released:
+           return []
+        if size == None:
+           size=self._cursor.arraysize
+        try:
+           rows=self._cursor.fetchmany(size)
+        except Exception as e:
+           self._failed(e)
+           raise
+        if len(rows) < size:
+           self._release()
+        return rows
+
+    def fetchall(self):
+        if self._released:
+           return []
+        try:
+           rows=self._cursor.fetchall()
+        except Exception as e:
+           self._failed(e)
+           raise
+        self._release()
+        return rows
+
+    def __iter__(self):
+        if self._released:
+           return
+        try:
+           for row in self._cursor:
+               yield row
+        except Exception as e:
+           self._failed(e)
+           raise
+        finally:
+           self._release()
+
+    def close(self):
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc,tb):
+        self._release()
+        return False
+
+    def __del__(self):
+        try:
+           self._release()
+        except Exception:
+           pass
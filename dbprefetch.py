@@ -0,0 +1,218 @@
+#-------------------------------------------------------
+# Module: dbprefetch.py
+# Desc: This module contains a prefetching cursor reader.
+#       A background thread fetches the next blocks of rows
+#       into a bounded queue while the caller works on the
+#       current block, so network wait and row processing
+#       overlap. pyodbc releases the GIL while it waits on
+#       the driver so the fetch thread runs alongside Python
+#       code. The queue depth limits how far the fetch thread
+#       can run ahead (backpressure) and close() stops it
+#       cleanly, cancelling an in flight fetch if needed.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+#
+# Usage:
+# reader = DbPrefetchReader(db.execute_query(sql),chunksize=1000,depth=2)
+# for row in reader:
+#    ...
+# print(reader.getstats())
+#
+# Or: for row in db.iter_query(sql,chunksize=1000,prefetch=2):
+#-------------------------------------------------------
+import queue
+import threading
+import time
+
+# Queue marker for the end of the rows
+_END=object()
+
+class DbPrefetchReader():
+
+    def __init__(self,cursor,chunksize=1000,depth=2):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. Starts fetching right away.
+        # :param self: Object instance
+        # :param cursor: Open query cursor. Only the reader may use it
+        #        until the reader is closed.
+        # :param chunksize: Rows per fetchmany call. Default=1000
+        # :param depth: Blocks fetched ahead of the caller. Default=2
+        #-------------------------------------------------------
+        if chunksize < 1:
+           raise ValueError("chunksize must be at least 1")
+        if depth < 1:
+           raise ValueError("depth must be at least 1")
+        self.description=cursor.description
+        self.rowcount=-1
+        self.arraysize=chunksize
+        self._cursor=cursor
+        self._chunksize=chunksize
+        self._queue=queue.Queue(depth)
+        self._stop=threading.Event()
+        self._pending=[]
+        self._done=False
+        self._closed=False
+        self._infetch=False
+
+        # Counters exposed via getstats()
+        self._blocks=0
+        self._rows=0
+        self._fetchseconds=0.0
+        self._waitseconds=0.0
+
+        self._thread=threading.Thread(target=self._run,name="dbprefetch",daemon=True)
+        self._thread.start()
+
+    def _put(self,item):
+        #-------------------------------------------------------
+        # Function: _put
+        # Desc: Queue an item, waiting while the queue is full unless
+        #       the reader is closed
+        # :param self: Pointer to object instance.
+        # :return: True-Queued, False-Reader closed
+        #-------------------------------------------------------
+        while not self._stop.is_set():
+            try:
+               self._queue.put(item,timeout=0.1)
+               return True
+            except queue.Full:
+               pass
+        return False
+
+    def _run(self):
+        #-------------------------------------------------------
+        # Function: _run
+        # Desc: Fetch thread body
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        try:
+           while not self._stop.is_set():
+               start=time.perf_counter()
+               self._infetch=True
+               try:
+                  rows=self._cursor.fetchmany(self._chunksize)
+               finally:
+                  self._infetch=False
+               self._fetchseconds += time.perf_counter() - start
+               if len(rows) == 0:
+                  break
+               self._blocks += 1
+               self._rows += len(rows)
+               if not self._put(rows):
+                  return
+               if len(rows) < self._chunksize:
+                  break
+           self._put(_END)
+        except Exception as e:
+           self._put(e)
+
+    def iter_chunks(self):
+        #-------------------------------------------------------
+        # Function: iter_chunks
+        # Desc: Generator of row blocks. The reader is closed when the
+        #       rows run out or the caller stops early.
+        # :param self: Pointer to object instance.
+        # :return: Generator of row lists. Raises the fetch error if any.
+        #-------------------------------------------------------
+        try:
+           while True:
+               rows=self._next()
+               if rows == None:
+                  return
+               yield rows
+        finally:
+           self.close()
+
+    def _next(self):
+        #-------------------------------------------------------
+        # Function: _next
+        # Desc: Get the next fetched block
+        # :param self: Pointer to object instance.
+        # :return: Row list or None at the end
+        #-------------------------------------------------------
+        if self._done:
+           return None
+        start=time.perf_counter()
+        item=self._queue.get()
+        self._waitseconds += time.perf_counter() - start
+        if item is _END:
+           self._done=True
+           return None
+        if isinstance(item,Exception):
+           self._done=True
+           raise item
+        return item
+
+    def __iter__(self):
+        for rows in self.iter_chunks():
+            yield from rows
+
+    def fetchone(self):
+        rows=self.fetchmany(1)
+        return rows[0] if len(rows) > 0 else None
+
+    def fetchmany(self,size=None):
+        if size == None:
+           size=self.arraysize
+        while len(self._pending) < size:
+            rows=self._next()
+            if rows == None:
+               break
+            self._pending.extend(rows)
+        rows=self._pending[:size]
+        self._pending=self._pending[size:]
+        return rows
+
+    def fetchall(self):
+        rows=self._pending
+        self._pending=[]
+        while True:
+            block=self._next()
+            if block == None:
+               return rows
+            rows.extend(block)
+
+    def close(self):
+        #-------------------------------------------------------
+        # Function: close
+        # Desc: Stop the fetch thread and close the cursor. A fetch that
+        #       is still running is cancelled with cursor.cancel().
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        if self._closed:
+           return
+        self._closed=True
+        self._stop.set()
+        self._thread.join(0.5)
+        if self._thread.is_alive() and self._infetch:
+           try:
+              self._cursor.cancel()
+           except Exception:
+              pass
+        self._thread.join()
+        self._pending=[]
+        try:
+           self._cursor.close()
+        except Exception:
+           pass
+
+    def getstats(self):
+        #-------------------------------------------------------
+        # Function: getstats
+        # Desc: Get fetch counters. waitseconds is the time the caller
+        #       waited for rows. When it is near zero fetching is fully
+        #       hidden behind processing.
+        # :param self: Pointer to object instance.
+        # :return: Dictionary of blocks, rows, fetchseconds and waitseconds
+        #-------------------------------------------------------
+        return {"blocks":self._blocks,"rows":self._rows,
+                "fetchseconds":self._fetchseconds,"waitseconds":self._waitseconds}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc,tb):
+        self.close()
+        return False
@@ -0,0 +1,387 @@
+#-------------------------------------------------------
+# Module: dbquerystats.py
+# Desc: This module contains per statement shape statistics
+#       for the DbIbmiOdbc class. Each SQL statement is
+#       normalized to a fingerprint with its literal values
+#       replaced by ? markers, so the many inlined statements
+#       DbApp builds for one method add up under one entry.
+#       Calls, time, rows and errors are totaled for each
+#       fingerprint in a bounded in memory table and
+#       statements slower than a threshold are written to a
+#       slow query log with their parameters.
+#
+#       Statistics are fed by a DbMetrics after hook, so
+#       query fetch time counts toward the query that
+#       returned the rows.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+#
+# Usage:
+# db.enable_querystats(slowseconds=0.5,slowlog="/tmp/slowsql.log")
+# ...
+# print(db.getquerystats().report(20))
+# db.getquerystats().save("/tmp/querystats.json")
+#
+# Report from a saved file or a running dbdaemon.py:
+# python3 odbcquerystats.py --input /tmp/querystats.json --top 20
+#-------------------------------------------------------
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+# One token per match. Quoted strings and identifiers are
+# matched whole so their contents are never treated as SQL.
+_tokenregex=re.compile(r"""
+  (?P<string>[xXgGnN]?'(?:[^']|'')*')
+ |(?P<ident>"(?:[^"]|"")*")
+ |(?P<comment>--[^\n]*|/\*.*?\*/)
+ |(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+ |(?P<word>[\w$#@]+)
+ |(?P<space>\s+)
+ |(?P<other>.)
+""",re.VERBOSE | re.DOTALL)
+
+# IN lists and VALUES rows of any length share a fingerprint
+_listregex=re.compile(r"\(\?(?:, \?)+\)")
+_rowsregex=re.compile(r"(\(\?, \.\.\.\))(?:, \(\?, \.\.\.\))+")
+
+# No space is written after or before these tokens
+_nospaceafter=(".","(",":")
+_nospacebefore=(".",",",")")
+
+# Statement operations counted as calls. Fetch time is added
+# to the statement without counting a call.
+_statementops=("execute","executeiwthparms","executemany","execute_query")
+
+# Sort keys for top() and report()
+SORTKEYS=("totalseconds","meanseconds","maxseconds","calls","rows","errors")
+
+def fingerprint(sql):
+    #----------------------------------------------------------
+    # Function: fingerprint
+    # Desc: Normalize an SQL statement to its shape. String, hex and
+    #       numeric literals become ?, comments are dropped, unquoted
+    #       names are lowercased, spacing is made uniform and lists
+    #       of markers are shortened to (?, ...).
+    #       Ex: select * from qiws.qcustcdt where cusnum=938472 and state='MN'
+    #           -> select * from qiws.qcustcdt where cusnum = ? and state = ?
+    # :param sql: SQL statement
+    # :return: Fingerprint string
+    #----------------------------------------------------------
+    tokens=[]
+    for match in _tokenregex.finditer(sql):
+        kind=match.lastgroup
+        if kind == "space" or kind == "comment":
+           continue
+        if kind == "string" or kind == "number":
+           token="?"
+        elif kind == "word":
+           token=match.group().lower()
+        else:
+           token=match.group()
+        # One space between tokens except around qualifiers,
+        # commas and parentheses
+        if len(tokens) > 0 and tokens[-1] not in _nospaceafter and token not in _nospacebefore:
+           tokens.append(" ")
+        tokens.append(token)
+    text="".join(tokens)
+    text=_listregex.sub("(?, ...)",text)
+    return _rowsregex.sub(r"\1, ...",text)
+
+class DbQueryStatsEntry():
+    #-------------------------------------------------------
+    # Class: DbQueryStatsEntry
+    # Desc: Totals for one fingerprint. Not locked itself.
+    #       DbQueryStats holds its lock while updating.
+    #-------------------------------------------------------
+
+    def __init__(self,fingerprint,op,sample,now):
+        self.fingerprint=fingerprint
+        self.op=op
+        self.sample=sample
+        self.calls=0
+        self.errors=0
+        self.cachehits=0
+        self.rows=0
+        self.executeseconds=0.0
+        self.fetchseconds=0.0
+        self.maxseconds=0.0
+        self.firstseen=now
+        self.lastseen=now
+
+    def totalseconds(self):
+        return self.executeseconds + self.fetchseconds
+
+    def todict(self):
+        #-------------------------------------------------------
+        # Function: todict
+        # Desc: Get the totals as a dictionary
+        # :param self: Pointer to object instance.
+        # :return: Dictionary
+        #-------------------------------------------------------
+        total=self.totalseconds()
+        return {"fingerprint":self.fingerprint,
+                "op":self.op,
+                "sample":self.sample,
+                "calls":self.calls,
+                "errors":self.errors,
+                "cachehits":self.cachehits,
+                "rows":self.rows,
+                "executeseconds":self.executeseconds,
+                "fetchseconds":self.fetchseconds,
+                "totalseconds":total,
+                "meanseconds":total / self.calls if self.calls > 0 else 0.0,
+                "maxseconds":self.maxseconds,
+                "firstseen":self.firstseen,
+                "lastseen":self.lastseen}
+
+class DbQueryStats():
+
+    def __init__(self,maxfingerprints=1000,slowseconds=None,slowlog=None,logparms=True,samplelength=1000):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. One DbQueryStats can be shared by many
+        #       DbIbmiOdbc instances.
+        # :param self: Object instance
+        # :param maxfingerprints: Most fingerprints kept. When full the
+        #        one with the least total time is dropped. Default=1000
+        # :param slowseconds: Log statements that take longer. None=No slow log. Default=None
+        # :param slowlog: Slow log file path or writable text file object.
+        #        One JSON object per line. Default=sys.stderr
+        # :param logparms: Include parameter values in the slow log. Default=True
+        # :param samplelength: Characters of the first statement seen kept as
+        #        a sample for each fingerprint. Default=1000
+        #-------------------------------------------------------
+        self._maxfingerprints=maxfingerprints
+        self._slowseconds=slowseconds
+        self._slowlog=slowlog
+        self._logparms=logparms
+        self._samplelength=samplelength
+        self._lock=threading.Lock()
+        self._loglock=threading.Lock()
+        self._entries={}
+        # Fingerprints of recent statement texts. Parameterized
+        # statements repeat so they skip the normalize step.
+        self._fingerprints={}
+        self._evicted=0
+        self._slowcount=0
+        self._attached=[]
+        self.started=time.time()
+
+    def attach(self,metrics):
+        #-------------------------------------------------------
+        # Function: attach
+        # Desc: Start collecting from a DbMetrics. Attaching the same
+        #       DbMetrics again does nothing.
+        # :param self: Pointer to object instance.
+        # :param metrics: DbMetrics instance
+        # :return: True-Attached
+        #-------------------------------------------------------
+        with self._lock:
+            if any(m is metrics for m in self._attached):
+               return True
+            self._attached.append(metrics)
+        metrics.add_hook(after=self.record)
+        return True
+
+    def _fingerprint(self,sql):
+        #-------------------------------------------------------
+        # Function: _fingerprint
+        # Desc: Get the fingerprint of a statement with a small memo
+        # :param self: Pointer to object instance.
+        # :param sql: SQL statement
+        # :return: Fingerprint string
+        #-------------------------------------------------------
+        fp=self._fingerprints.get(sql)
+        if fp == None:
+           fp=fingerprint(sql)
+           if len(self._fingerprints) >= self._maxfingerprints * 2:
+              self._fingerprints={}
+           self._fingerprints[sql]=fp
+        return fp
+
+    def record(self,event):
+        #-------------------------------------------------------
+        # Function: record
+        # Desc: Add one operation. Used as a DbMetrics after hook.
+        # :param self: Pointer to object instance.
+        # :param event: DbMetrics event dictionary
+        #-------------------------------------------------------
+        sql=event["sql"]
+        op=event["op"]
+        if sql == None or (op != "fetch" and op not in _statementops):
+           return
+        fp=self._fingerprint(sql)
+        seconds=event["seconds"]
+        rows=event["rows"]
+        now=time.time()
+        with self._lock:
+            entry=self._entries.get(fp)
+            if entry == None:
+               if op == "fetch":
+                  # Statement was dropped from the table while its rows were read
+                  return
+               if len(self._entries) >= self._maxfingerprints:
+                  smallest=min(self._entries.values(),key=DbQueryStatsEntry.totalseconds)
+                  del self._entries[smallest.fingerprint]
+                  self._evicted += 1
+               entry=DbQueryStatsEntry(fp,op,sql[:self._samplelength],now)
+               self._entries[fp]=entry
+            if op == "fetch":
+               entry.fetchseconds += seconds
+            else:
+               entry.calls += 1
+               entry.executeseconds += seconds
+               if event["cached"]:
+                  entry.cachehits += 1
+               if seconds > entry.maxseconds:
+                  entry.maxseconds=seconds
+            if rows != None and rows > 0:
+               entry.rows += rows
+            if event["error"] != None:
+               entry.errors += 1
+            entry.lastseen=now
+
+        if self._slowseconds != None and seconds >= self._slowseconds and op != "fetch":
+           self._logslow(event,fp,now)
+
+    def _logslow(self,event,fp,now):
+        #-------------------------------------------------------
+        # Function: _logslow
+        # Desc: Write one slow statement to the slow log
+        # :param self: Pointer to object instance.
+        # :param event: DbMetrics event dictionary
+        # :param fp: Statement fingerprint
+        # :param now: Time of the event
+        #-------------------------------------------------------
+        record={"time":time.strftime("%Y-%m-%dT%H:%M:%S",time.localtime(now)),
+                "op":event["op"],
+                "caller":event["caller"],
+                "seconds":round(event["seconds"],6),
+                "rows":event["rows"],
+                "error":str(event["error"]) if event["error"] != None else None,
+                "fingerprint":fp,
+                "sql":event["sql"]}
+        if self._logparms:
+           record["parms"]=event["parms"]
+        line=json.dumps(record,default=str) + "\n"
+        with self._loglock:
+            self._slowcount += 1
+            if self._slowlog == None:
+               sys.stderr.write(line)
+            elif isinstance(self._slowlog,str):
+               with open(self._slowlog,"a",encoding="utf-8") as logfile:
+                  logfile.write(line)
+            else:
+               self._slowlog.write(line)
+               self._slowlog.flush()
+
+    def snapshot(self):
+        #-------------------------------------------------------
+        # Function: snapshot
+        # Desc: Get all fingerprint totals
+        # :param self: Pointer to object instance.
+        # :return: Dictionary of started, fingerprints, evicted,
+        #  slowstatements and entries (list of entry dictionaries)
+        #-------------------------------------------------------
+        with self._lock:
+            entries=[entry.todict() for entry in self._entries.values()]
+            evicted=self._evicted
+        return {"started":self.started,
+                "fingerprints":len(entries),
+                "evicted":evicted,
+                "slowstatements":self._slowcount,
+                "entries":entries}
+
+    def top(self,count=20,sortby="totalseconds"):
+        #-------------------------------------------------------
+        # Function: top
+        # Desc: Get the fingerprints that cost the most
+        # :param self: Pointer to object instance.
+        # :param count: Entries returned. Default=20
+        # :param sortby: One of SORTKEYS. Default=totalseconds
+        # :return: List of entry dictionaries, highest first
+        #-------------------------------------------------------
+        return topentries(self.snapshot()["entries"],count,sortby)
+
+    def report(self,count=20,sortby="totalseconds"):
+        #-------------------------------------------------------
+        # Function: report
+        # Desc: Get a text table of the fingerprints that cost the most
+        # :param self: Pointer to object instance.
+        # :param count: Entries shown. Default=20
+        # :param sortby: One of SORTKEYS. Default=totalseconds
+        # :return: Report text
+        #-------------------------------------------------------
+        return formatreport(self.snapshot(),count,sortby)
+
+    def save(self,path):
+        #-------------------------------------------------------
+        # Function: save
+        # Desc: Write a snapshot to a JSON file for odbcquerystats.py.
+        #       The file is replaced in one step.
+        # :param self: Pointer to object instance.
+        # :param path: File path
+        # :return: True-Saved
+        #-------------------------------------------------------
+        temppath=f"{path}.tmp"
+        with open(temppath,"w",encoding="utf-8") as outfile:
+            json.dump(self.snapshot(),outfile)
+        os.replace(temppath,path)
+        return True
+
+    def reset(self):
+        #-------------------------------------------------------
+        # Function: reset
+        # Desc: Clear all totals
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        with self._lock:
+            self._entries={}
+            self._evicted=0
+            self._slowcount=0
+            self.started=time.time()
+
+def topentries(entries,count=20,sortby="totalseconds"):
+    #----------------------------------------------------------
+    # Function: topentries
+    # Desc: Sort snapshot entries and keep the first count
+    # :param entries: List of entry dictionaries
+    # :param count: Entries returned
+    # :param sortby: One of SORTKEYS
+    # :return: List of entry dictionaries, highest first
+    #----------------------------------------------------------
+    if sortby not in SORTKEYS:
+       raise ValueError(f"sortby must be one of {', '.join(SORTKEYS)}")
+    return sorted(entries,key=lambda entry: entry[sortby],reverse=True)[:count]
+
+def formatreport(snapshot,count=20,sortby="totalseconds",width=100):
+    #----------------------------------------------------------
+    # Function: formatreport
+    # Desc: Format a snapshot as a top N text table
+    # :param snapshot: Dictionary from DbQueryStats.snapshot or a saved file
+    # :param count: Entries shown. Default=20
+    # :param sortby: One of SORTKEYS. Default=totalseconds
+    # :param width: Fingerprint characters shown. Default=100
+    # :return: Report text. Mean ms includes fetch time, MaxExec ms is
+    #  the slowest single statement run without its fetches.
+    #----------------------------------------------------------
+    entries=snapshot["entries"]
+    grandtotal=sum([entry["totalseconds"] for entry in entries])
+    lines=[f"Fingerprints:{snapshot['fingerprints']} Dropped:{snapshot['evicted']} "
+           f"Slow statements:{snapshot['slowstatements']} Total seconds:{grandtotal:.3f} Sorted by:{sortby}",
+           f"{'#':>3} {'Calls':>8} {'Total s':>10} {'%':>5} {'Mean ms':>9} {'MaxExec ms':>10} {'Fetch s':>9} "
+           f"{'Rows':>10} {'Errors':>6}  Fingerprint"]
+    for rank,entry in enumerate(topentries(entries,count,sortby),1):
+        share=entry["totalseconds"] * 100 / grandtotal if grandtotal > 0 else 0.0
+        text=entry["fingerprint"]
+        if len(text) > width:
+           text=text[:width - 3] + "..."
+        lines.append(f"{rank:>3} {entry['calls']:>8} {entry['totalseconds']:>10.3f} {share:>5.1f} "
+                     f"{entry['meanseconds'] * 1000:>9.2f} {entry['maxseconds'] * 1000:>10.2f} "
+                     f"{entry['fetchseconds']:>9.3f} {entry['rows']:>10} {entry['errors']:>6}  {text}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,248 @@
+#-------------------------------------------------------
+# Module: dbrecord.py
+# Desc: This module contains compact typed record classes
+#       for query rows. A record class is a tuple subclass
+#       with named fields, so the column names are stored
+#       once per class instead of once per row as with a
+#       dict. CHAR columns have trailing blanks trimmed
+#       when a record is built and records convert to a
+#       dict or JSON only when asked.
+#
+#       A record with 11 columns is one tuple of about 150
+#       bytes plus its values, a fraction of the size of the
+#       same row held as a dict.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+#
+# Usage:
+# CustRecord = record_class_from_ddl(open("customers.sql").read())
+# for rec in db.iter_records("select * from qiws.customers",recordclass=CustRecord):
+#    print(rec.cusnum,rec.lstnam,rec.tojson())
+#-------------------------------------------------------
+import collections
+import decimal
+import re
+import sys
+from dbexport import _jsonkeys, _jsonrow
+
+# Column types that are blank padded to their length
+_chartypes=("CHAR","CHARACTER","GRAPHIC","NCHAR")
+
+def make_record_class(name,columns,charcolumns=None,module=None):
+    #----------------------------------------------------------
+    # Function: make_record_class
+    # Desc: Create a record class. Field names are the lower case
+    #       column names. Ex: rec.cusnum for column CUSNUM.
+    # :param name: Class name. Ex: QcustcdtRecord
+    # :param columns: List of column names in query order
+    # :param charcolumns: Column names to trim trailing blanks from.
+    #  Default=None (no trimming)
+    # :param module: Module the class is defined in, needed to pickle
+    #  records. Default=calling module
+    # :return: Record class
+    #----------------------------------------------------------
+    fields=[re.sub(r"\W","_",column.lower()) for column in columns]
+    base=collections.namedtuple(name,fields)
+    trimset=set([column.upper() for column in (charcolumns or [])])
+    trimindex=tuple([i for i,column in enumerate(columns) if column.upper() in trimset])
+    jsonkeys=_jsonkeys(columns)
+    newtuple=tuple.__new__
+
+    class DbRecord(base):
+        __slots__=()
+        _columns=tuple(columns)
+        _trimindex=trimindex
+
+        @classmethod
+        def fromrow(cls,row):
+            #-------------------------------------------------------
+            # Function: fromrow
+            # Desc: Build a record from a row in column order,
+            #       trimming CHAR columns
+            # :param cls: Record class
+            # :param row: Row sequence
+            # :return: Record
+            #-------------------------------------------------------
+            if len(trimindex) == 0:
+               return newtuple(cls,row)
+            values=list(row)
+            for i in trimindex:
+                value=values[i]
+                if value != None:
+                   values[i]=value.rstrip(" ")
+            return newtuple(cls,values)
+
+        def todict(self):
+            #-------------------------------------------------------
+            # Function: todict
+            # Desc: Convert to a dictionary keyed by column name.
+            #       Use _asdict() for lower case field name keys.
+            # :param self: Pointer to object instance.
+            # :return: Dictionary
+            #-------------------------------------------------------
+            return dict(zip(self._columns,self))
+
+        def tojson(self):
+            #-------------------------------------------------------
+            # Function: tojson
+            # Desc: Convert to a JSON object keyed by column name.
+            #       Output matches json.dumps(self.todict(),default=str)
+            # :param self: Pointer to object instance.
+            # :return: JSON string
+            #-------------------------------------------------------
+            return _jsonrow(jsonkeys,self)
+
+    DbRecord.__name__=name
+    DbRecord.__qualname__=name
+    if module == None:
+       module=sys._getframe(1).f_globals.get("__name__","__main__")
+    DbRecord.__module__=module
+    return DbRecord
+
+def record_class_from_description(description,name="Record",trim=True):
+    #----------------------------------------------------------
+    # Function: record_class_from_description
+    # Desc: Create a record class from a cursor description. pyodbc
+    #       reports CHAR and VARCHAR both as str so all string
+    #       columns are trimmed when trim is True.
+    # :param description: cursor.description
+    # :param name: Class name. Default=Record
+    # :param trim: Trim trailing blanks from string columns. Default=True
+    # :return: Record class
+    #----------------------------------------------------------
+    columns=[desc[0] for desc in description]
+    charcolumns=[desc[0] for desc in description if desc[1] == str] if trim else []
+    return make_record_class(name,columns,charcolumns,sys._getframe(1).f_globals.get("__name__","__main__"))
+
+def _splitcolumns(body):
+    #----------------------------------------------------------
+    # Function: _splitcolumns
+    # Desc: Split a CREATE TABLE column list on top level commas
+    # :param body: Text between the outer parentheses
+    # :return: List of column definition strings
+    #----------------------------------------------------------
+    parts=[]
+    depth=0
+    current=""
+    for char in body:
+        if char == "(":
+           depth += 1
+        elif char == ")":
+           depth -= 1
+        if char == "," and depth == 0:
+           parts.append(current.strip())
+           current=""
+        else:
+           current += char
+    if current.strip() != "":
+       parts.append(current.strip())
+    return parts
+
+def record_class_from_ddl(ddl,name=None,trim=True):
+    #----------------------------------------------------------
+    # Function: record_class_from_ddl
+    # Desc: Create a record class from the first CREATE TABLE statement
+    #       in DDL text such as customers.sql. CHAR and GRAPHIC columns
+    #       are trimmed, VARCHAR columns are not.
+    # :param ddl: DDL text
+    # :param name: Class name. Default=table name in title case + Record
+    # :param trim: Trim trailing blanks from CHAR columns. Default=True
+    # :return: Record class. Raises ValueError if no CREATE TABLE found.
+    #----------------------------------------------------------
+    # Drop -- comments
+    text="\n".join([line.split("--")[0] for line in ddl.splitlines()])
+    match=re.search(r"create\s+(?:or\s+replace\s+)?table\s+([\w#@$\"./]+)\s*\(",text,re.IGNORECASE)
+    if match == None:
+       raise ValueError("No CREATE TABLE statement found in DDL")
+
+    # Find the matching close parenthesis of the column list
+    depth=1
+    pos=match.end()
+    while pos < len(text) and depth > 0:
+        if text[pos] == "(":
+           depth += 1
+        elif text[pos] == ")":
+           depth -= 1
+        pos += 1
+    body=text[match.end():pos-1]
+
+    columns=[]
+    charcolumns=[]
+    for part in _splitcolumns(body):
+        words=part.split()
+        if len(words) < 2 or words[0].upper() in ("PRIMARY","CONSTRAINT","UNIQUE","FOREIGN","CHECK"):
+           continue
+        column=words[0].strip('"')
+        columns.append(column)
+        if trim and re.match(r"(\w+)",words[1]).group(1).upper() in _chartypes:
+           charcolumns.append(column)
+
+    if name == None:
+       table=re.split(r"[./]",match.group(1))[-1].strip('"')
+       name=table.title() + "Record"
+    return make_record_class(name,columns,charcolumns,sys._getframe(1).f_globals.get("__name__","__main__"))
+
+def _makeconverter(recordclass,description,decimals):
+    #----------------------------------------------------------
+    # Function: _makeconverter
+    # Desc: Build the row to record function for a query. Columns are
+    #       matched by name so the query can return them in any order.
+    # :param recordclass: Record class
+    # :param description: cursor.description
+    # :param decimals: decimal=Keep Decimal values. float=Convert to int or float
+    # :return: Function(row) returning a record
+    #----------------------------------------------------------
+    names=[desc[0].upper() for desc in description]
+    index=[]
+    for column in recordclass._columns:
+        if column.upper() not in names:
+           raise Exception(f"Query has no column {column} for {recordclass.__name__}")
+        index.append(names.index(column.upper()))
+    # NUMERIC/DECIMAL with scale 0 become int, others float
+    numberindex=[]
+    if decimals == "float":
+       numberindex=[(i,int if description[pos][5] == 0 else float) for i,pos in enumerate(index)
+                    if description[pos][1] == decimal.Decimal]
+
+    fromrow=recordclass.fromrow
+    if index == list(range(len(names))) and len(numberindex) == 0:
+       return fromrow
+
+    def convert(row):
+        values=[row[pos] for pos in index]
+        for i,totype in numberindex:
+            if values[i] != None:
+               values[i]=totype(values[i])
+        return fromrow(values)
+    return convert
+
+def read_records(cursor,recordclass=None,chunksize=1000,decimals="decimal"):
+    #----------------------------------------------------------
+    # Function: read_records
+    # Desc: Generator that reads rows from a query cursor in blocks and
+    #       yields them as records. The cursor is closed when the rows
+    #       run out or the caller stops early.
+    # :param cursor: Open query cursor
+    # :param recordclass: Record class. None=Create one from the cursor
+    #  description. Default=None
+    # :param chunksize: Rows per fetchmany call. Default=1000
+    # :param decimals: decimal=Keep NUMERIC/DECIMAL values as Decimal.
+    #  float=Convert to int when the scale is 0, otherwise float. Native
+    #  numbers use about a quarter of the memory of Decimal. Default=decimal
+    # :return: Generator of records
+    #----------------------------------------------------------
+    try:
+       if recordclass == None:
+          recordclass=record_class_from_description(cursor.description)
+       convert=_makeconverter(recordclass,cursor.description,decimals)
+       while True:
+           rows=cursor.fetchmany(chunksize)
+           if len(rows) == 0:
+              break
+           for row in rows:
+               yield convert(row)
+           if len(rows) < chunksize:
+              break
+    finally:
+       cursor.close()
@@ -0,0 +1,437 @@
+#-------------------------------------------------------
+# Module: dbtimeout.py
+# Desc: This module contains query timeout, deadline and
+#       cancel support for the DbIbmiOdbc class.
+#
+#       A DbDeadline is a time budget for a unit of work such
+#       as one web request. While it is entered, every call
+#       made through DbIbmiOdbc in that thread or asyncio task
+#       is limited to the time left, so a slow first query
+#       leaves less time for the next one instead of each call
+#       getting a full timeout of its own. A deadline is also
+#       a cancel handle: cancel() can be called from another
+#       thread and stops the statement running under it.
+#
+#       Each limited statement gets two guards. The connection
+#       timeout attribute sets the ODBC query timeout for the
+#       statement, and a shared watchdog thread calls
+#       cursor.cancel() when the time is up. The IBM i query
+#       timeout is checked against the optimizer estimate, so
+#       the watchdog is what bounds the wall clock time of a
+#       statement and of fetching its rows.
+#
+# Update Info:
+# 10/18/2026 - Initial version
+# 10/18/2026 - release() waits for a cancel in progress
+#
+# Usage:
+# with db.deadline(2.0):                  # Whole request budget
+#    cursor1=db.query_qcustcdt("state=?",parms=["MN"])
+#    rows=cursor1.fetchall()
+#
+# db.set_querytimeout(30)                 # Default limit per call
+# db.execute_query(sql,parms,timeout=5)   # Limit for one call
+#
+# handle=DbDeadline()                     # Cancel only, no time limit
+# threading.Timer(10,handle.cancel).start()
+# with handle:
+#    db.execute_query(...)
+#-------------------------------------------------------
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+
+# Deadlines entered in the current thread or asyncio task
+_deadlines=contextvars.ContextVar("dbdeadlines",default=())
+
+class DbQueryTimeout(Exception):
+    #-------------------------------------------------------
+    # Class: DbQueryTimeout
+    # Desc: Raised when a statement runs past its timeout or
+    #       the deadline it runs under
+    #-------------------------------------------------------
+    pass
+
+class DbQueryCancelled(Exception):
+    #-------------------------------------------------------
+    # Class: DbQueryCancelled
+    # Desc: Raised when a statement is stopped by DbDeadline.cancel()
+    #-------------------------------------------------------
+    pass
+
+def _sqlstate(e):
+    #----------------------------------------------------------
+    # Function: _sqlstate
+    # Desc: Get the SQLSTATE of a pyodbc exception
+    # :param e: Exception
+    # :return: SQLSTATE or ""
+    #----------------------------------------------------------
+    if len(e.args) > 0 and isinstance(e.args[0],str):
+       return e.args[0]
+    return ""
+
+class DbDeadline():
+
+    def __init__(self,seconds=None):
+        #-------------------------------------------------------
+        # Function: __init__
+        # Desc: Constructor. The clock starts now.
+        # :param self: Object instance
+        # :param seconds: Time budget in seconds. None=No time limit,
+        #        cancel only. Default=None
+        #-------------------------------------------------------
+        self._seconds=seconds
+        self._expires=time.monotonic() + seconds if seconds != None else None
+        self._cancelled=False
+        self._lock=threading.Lock()
+        self._watches=set()
+
+    def remaining(self):
+        #-------------------------------------------------------
+        # Function: remaining
+        # Desc: Get the time left
+        # :param self: Pointer to object instance.
+        # :return: Seconds left, 0 when expired, None for no time limit
+        #-------------------------------------------------------
+        if self._expires == None:
+           return None
+        return max(0.0,self._expires - time.monotonic())
+
+    def expired(self):
+        return self._expires != None and time.monotonic() >= self._expires
+
+    def cancel(self):
+        #-------------------------------------------------------
+        # Function: cancel
+        # Desc: Cancel the statements running under this deadline and
+        #       make later calls under it fail right away. Can be called
+        #       from any thread.
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        with self._lock:
+            self._cancelled=True
+            watches=list(self._watches)
+        for watch in watches:
+            watch.cancel(cancelled=True)
+
+    def iscancelled(self):
+        return self._cancelled
+
+    def _add(self,watch):
+        with self._lock:
+            self._watches.add(watch)
+            return not self._cancelled
+
+    def _remove(self,watch):
+        with self._lock:
+            self._watches.discard(watch)
+
+    def __enter__(self):
+        _deadlines.set(_deadlines.get() + (self,))
+        return self
+
+    def __exit__(self,exc_type,exc,tb):
+        # Remove the innermost entry of this deadline
+        stack=list(_deadlines.get())
+        for i in range(len(stack) - 1,-1,-1):
+            if stack[i] is self:
+               del stack[i]
+               break
+        _deadlines.set(tuple(stack))
+        return False
+
+def current_deadlines():
+    #----------------------------------------------------------
+    # Function: current_deadlines
+    # Desc: Get the deadlines entered in this thread or asyncio task
+    # :return: Tuple of DbDeadline, innermost last
+    #----------------------------------------------------------
+    return _deadlines.get()
+
+def remaining_seconds():
+    #----------------------------------------------------------
+    # Function: remaining_seconds
+    # Desc: Get the time left under the entered deadlines. Use to give
+    #       other work, such as an HTTP call, the same budget.
+    # :return: Seconds left or None when no deadline is entered
+    #----------------------------------------------------------
+    remaining=None
+    for deadline in _deadlines.get():
+        left=deadline.remaining()
+        if left != None and (remaining == None or left < remaining):
+           remaining=left
+    return remaining
+
+class _DbWatchdog():
+    #-------------------------------------------------------
+    # Class: _DbWatchdog
+    # Desc: One shared thread that cancels statements whose time
+    #       is up. Cheaper than a timer thread per call.
+    #-------------------------------------------------------
+
+    def __init__(self):
+        self._lock=threading.Condition()
+        self._heap=[]
+        self._sequence=itertools.count()
+        self._thread=None
+
+    def add(self,watch):
+        with self._lock:
+            heapq.heappush(self._heap,(watch.expires,next(self._sequence),watch))
+            if self._thread == None:
+               self._thread=threading.Thread(target=self._run,name="dbwatchdog",daemon=True)
+               self._thread.start()
+            self._lock.notify()
+
+    def _run(self):
+        while True:
+            fire=[]
+            with self._lock:
+                now=time.monotonic()
+                while len(self._heap) > 0 and (self._heap[0][0] <= now or self._heap[0][2].released):
+                    expires,sequence,watch=heapq.heappop(self._heap)
+                    if not watch.released:
+                       fire.append(watch)
+                if len(fire) == 0:
+                   self._lock.wait(self._heap[0][0] - now if len(self._heap) > 0 else None)
+            # Cancel outside the lock. cancel() can block on the driver.
+            for watch in fire:
+                watch.cancel(cancelled=False)
+
+_watchdog=_DbWatchdog()
+
+class DbStatementWatch():
+    #-------------------------------------------------------
+    # Class: DbStatementWatch
+    # Desc: Time limit and cancel state of one DbIbmiOdbc call.
+    #       Created by start_watch.
+    #-------------------------------------------------------
+
+    def __init__(self,timeout,deadlines):
+        now=time.monotonic()
+        self.limit=timeout
+        self.expires=now + timeout if timeout != None else None
+        for deadline in deadlines:
+            left=deadline.remaining()
+            if left != None and (self.expires == None or now + left < self.expires):
+               self.expires=now + left
+               self.limit=deadline._seconds
+        self.deadlines=deadlines
+        self.active=self.expires != None or len(deadlines) > 0
+        self.cursors=[]
+        self.timedout=False
+        self.cancelled=False
+        self.released=False
+        self._lock=threading.Lock()
+
+    def check(self):
+        #-------------------------------------------------------
+        # Function: check
+        # Desc: Fail before starting work when the time is already up
+        #       or a deadline was cancelled
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        for deadline in self.deadlines:
+            if deadline.iscancelled():
+               raise DbQueryCancelled("Query cancelled before it started")
+        if self.expires != None and time.monotonic() >= self.expires:
+           raise DbQueryTimeout(f"Query time limit of {self.limit} seconds used up before the query started")
+
+    def remaining(self):
+        #-------------------------------------------------------
+        # Function: remaining
+        # Desc: Get the time left for this call
+        # :param self: Pointer to object instance.
+        # :return: Seconds or None for no time limit
+        #-------------------------------------------------------
+        if self.expires == None:
+           return None
+        return max(0.0,self.expires - time.monotonic())
+
+    def cursor(self,conn):
+        #-------------------------------------------------------
+        # Function: cursor
+        # Desc: Create a cursor with the ODBC query timeout set to the
+        #       time left and start watching it. pyodbc applies the
+        #       connection timeout when a cursor is created, so the
+        #       connection setting is put back right after.
+        # :param self: Pointer to object instance.
+        # :param conn: pyodbc connection
+        # :return: pyodbc cursor
+        #-------------------------------------------------------
+        if not self.active:
+           return conn.cursor()
+        self.check()
+        remaining=self.remaining()
+        if remaining != None:
+           oldtimeout=conn.timeout
+           conn.timeout=max(1,math.ceil(remaining))
+           try:
+              cursor1=conn.cursor()
+           finally:
+              conn.timeout=oldtimeout
+        else:
+           cursor1=conn.cursor()
+        self.attach(cursor1)
+        return cursor1
+
+    def attach(self,cursor1):
+        #-------------------------------------------------------
+        # Function: attach
+        # Desc: Watch a cursor until release() is called
+        # :param self: Pointer to object instance.
+        # :param cursor1: pyodbc cursor
+        #-------------------------------------------------------
+        first=len(self.cursors) == 0
+        self.cursors.append(cursor1)
+        if not first:
+           return
+        for deadline in self.deadlines:
+            if not deadline._add(self):
+               self.cancel(cancelled=True)
+        if self.expires != None:
+           _watchdog.add(self)
+
+    def cancel(self,cancelled):
+        #-------------------------------------------------------
+        # Function: cancel
+        # Desc: Cancel the running statement. Called by the watchdog or
+        #       by DbDeadline.cancel from another thread.
+        # :param self: Pointer to object instance.
+        # :param cancelled: True=Cancel request. False=Time is up.
+        #-------------------------------------------------------
+        with self._lock:
+            if self.released:
+               return
+            if cancelled:
+               self.cancelled=True
+            else:
+               self.timedout=True
+            # Cancel under the lock so release() waits for it and a
+            # connection handed back to the pool is never cancelled
+            for cursor1 in self.cursors:
+                try:
+                   cursor1.cancel()
+                except Exception:
+                   pass
+
+    def release(self):
+        #-------------------------------------------------------
+        # Function: release
+        # Desc: Stop watching. Safe to call more than once.
+        # :param self: Pointer to object instance.
+        #-------------------------------------------------------
+        with self._lock:
+            if self.released:
+               return
+            self.released=True
+        for deadline in self.deadlines:
+            deadline._remove(self)
+
+    def translate(self,e):
+        #-------------------------------------------------------
+        # Function: translate
+        # Desc: Turn the driver error of a cancelled or timed out
+        #       statement into DbQueryCancelled or DbQueryTimeout
+        # :param self: Pointer to object instance.
+        # :param e: Exception raised by pyodbc
+        # :return: Exception to report
+        #-------------------------------------------------------
+        if isinstance(e,(DbQueryTimeout,DbQueryCancelled)):
+           return e
+        if self.cancelled:
+           return DbQueryCancelled(f"Query cancelled: {e}")
+        if self.timedout or _sqlstate(e) == "HYT00":
+           return DbQueryTimeout(f"Query exceeded its time limit of {self.limit} seconds: {e}")
+        return e
+
+def start_watch(timeout=None):
+    #----------------------------------------------------------
+    # Function: start_watch
+    # Desc: Start the time limit for one DbIbmiOdbc call from the
+    #       call timeout and the entered deadlines, whichever ends first
+    # :param timeout: Seconds for this call or None
+    # :return: DbStatementWatch. Raises DbQueryTimeout/DbQueryCancelled
+    #  when the call should not start.
+    #----------------------------------------------------------
+    watch=DbStatementWatch(timeout,_deadlines.get())
+    if watch.active:
+       watch.check()
+    return watch
+
+class DbTimedCursor():
+    #-------------------------------------------------------
+    # Class: DbTimedCursor
+    # Desc: Cursor wrapper returned by DbIbmiOdbc.execute_query
+    #       when a time limit or deadline applies. Fetches stay
+    #       under the limit and the watch ends when the cursor is
+    #       closed or fully read. Everything else is passed
+    #       through to the underlying pyodbc cursor.
+    #-------------------------------------------------------
+
+    def __init__(self,cursor,watch):
+        self._cursor=cursor
+        self._watch=watch
+
+    def __getattr__(self,name):
+        return getattr(self._cursor,name)
+
+    def fetchone(self):
+        try:
+           row=self._cursor.fetchone()
+        except Exception as e:
+           self._watch.release()
+           raise self._watch.translate(e) from e
+        if row == None:
+           self._watch.release()
+        return row
+
+    def fetchmany(self,size=None):
+        if size == None:
+           size=self._cursor.arraysize
+        try:
+           rows=self._cursor.fetchmany(size)
+        except Exception as e:
+           self._watch.release()
+           raise self._watch.translate(e) from e
+        if len(rows) < size:
+           self._watch.release()
+        return rows
+
+    def fetchall(self):
+        try:
+           return self._cursor.fetchall()
+        except Exception as e:
+           raise self._watch.translate(e) from e
+        finally:
+           self._watch.release()
+
+    def __iter__(self):
+        while True:
+            row=self.fetchone()
+            if row == None:
+               return
+            yield row
+
+    def cancel(self):
+        self._watch.cancel(cancelled=True)
+
+    def close(self):
+        self._watch.release()
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc,tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        try:
+           self._watch.release()
+        except Exception:
+           pass
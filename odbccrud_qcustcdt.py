@@ -5,17 +5,18 @@
 #       record in table QIWS.QCUSTCDT using ODBC and 
 #       the IBM i Access ODBC Driver.
 #
+# Parameters:
+# --daemon <socket>      Run through a running dbdaemon.py instead
+#                        of opening an ODBC connection
+#
 # Update Info:
 # x/xx/xx - xxxxx
+# 10/18/2026 - Added --daemon client mode. pyodbc is only imported when needed.
 #------------------------------------------------
 # Imports
 #------------------------------------------------
-import pyodbc
 import sys
-import time
-import traceback
-import json
-from dbapp import DbApp
+import argparse
 
 #------------------------------------------------
 # Script initialization
@@ -37,22 +38,33 @@ from dbapp import DbApp
 # Enable committment control - *CS autocommit enabled.
 odbcconnstring="DSN=*LOCAL;CommitMode=1;EXTCOLINFO=1;" 
 
+#------------------------------------------------
+# Command line parameters
+#------------------------------------------------
+parser = argparse.ArgumentParser(description="Delete, insert and update a QCUSTCDT test record")
+parser.add_argument("--daemon",default=None,help="dbdaemon.py socket path to use instead of ODBC")
+args = parser.parse_args()
+
 # Instantiate DbApp application database layer and open connection
 print("Open connection")
-db = DbApp(odbcconnstring)
+if args.daemon != None:
+   # Thin client. No pyodbc import or ODBC connect.
+   from dbdaemonclient import DbDaemonClient
+   db = DbDaemonClient(args.daemon)
+else:
+   from dbapp import DbApp
+   db = DbApp(odbcconnstring)
 
 # If not open, bail out
 if (db.isopen()==False):
    raise Exception("Connection not opened. Process cancelled.")
 
-# Query customers
-cursor1=db.query_qcustcdt("")
-
-# If cursor returned, get all rows
-if cursor1 != None:
-   rows = cursor1.fetchall()
-else:
-   raise Exception(f"Query issue: {db.getlasterror()}")    
+# Query customers. Rows are streamed in blocks instead of 
+# reading the whole table into memory with fetchall.
+reccount=0
+for row in db.iter_qcustcdt(""):
+   reccount += 1
+print(f"Customers read:{reccount}")
 
 # Delete all records with test key record - Commit will not happen because nocommit parm=True. 
 rtnexec=db.delete_qcustcdt(121212,"QIWS",True)
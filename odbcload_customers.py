@@ -0,0 +1,100 @@
+#!/QOpenSys/pkgs/bin/python3
+#-------------------------------------------------------
+# Module: odbcload_customers.py
+# Desc: This sample bulk loads a customer CSV file into
+#       table QIWS.CUSTOMERS (see customers.sql) using
+#       ODBC and the IBM i Access ODBC Driver.
+#       The file is read as a stream, rows are checked
+#       against the table definition and inserted in
+#       batches by several worker connections. Rows the
+#       table rejects are written to a reject file and the
+#       rest of their batch still commits.
+#
+#       Progress is kept in a checkpoint file. If the load
+#       stops, run the same command again to continue.
+#       Use --fresh to start over.
+#
+# Parameters:
+# --input <file>         CSV file with a header line of column names
+# --library <lib>        Table library. Default=QIWS
+# --table <name>         Table name. Default=CUSTOMERS
+# --workers <n>          Worker connections. Default=4
+# --batchsize <n>        Rows per insert batch and commit. Default=1000
+# --reject <file>        Reject file. Default=<input>.rejects.csv
+# --checkpoint <file>    Checkpoint file. Default=<input>.checkpoint.json
+# --columns <list>       Comma separated CSV columns to load. Default=All
+# --fresh                Remove an old checkpoint and reject file first
+# --connstring <str>     ODBC connection string. Default=*LOCAL DSN below
+#
+# Ex: python3 odbcload_customers.py --input /tmp/customers.csv --workers 8
+#
+# Update Info:
+# 10/18/2026 - Initial version
+#------------------------------------------------
+# Imports
+#------------------------------------------------
+import sys
+import os
+import argparse
+from dbapp import DbApp
+
+#------------------------------------------------
+# ODBC connection strings.
+#------------------------------------------------
+# Commitment control is needed so a failed batch is rolled back
+# as a whole before the bad rows are isolated. The table must be journaled.
+# Enable committment control - *CS autocommit enabled.
+odbcconnstring="DSN=*LOCAL;CommitMode=1;EXTCOLINFO=1;"
+
+#------------------------------------------------
+# Command line parameters
+#------------------------------------------------
+parser = argparse.ArgumentParser(description="Bulk load a customer CSV file")
+parser.add_argument("--input",required=True,help="CSV file with a header line")
+parser.add_argument("--library",default="QIWS",help="Table library")
+parser.add_argument("--table",default="CUSTOMERS",help="Table name")
+parser.add_argument("--workers",type=int,default=4,help="Worker connections")
+parser.add_argument("--batchsize",type=int,default=1000,help="Rows per insert batch and commit")
+parser.add_argument("--reject",default=None,help="Reject file. Default=<input>.rejects.csv")
+parser.add_argument("--checkpoint",default=None,help="Checkpoint file. Default=<input>.checkpoint.json")
+parser.add_argument("--columns",default="",help="Comma separated CSV columns to load. Default=All")
+parser.add_argument("--fresh",action="store_true",help="Remove an old checkpoint and reject file first")
+parser.add_argument("--connstring",default=odbcconnstring,help="ODBC connection string")
+args = parser.parse_args()
+
+rejectfile=args.reject if args.reject != None else args.input + ".rejects.csv"
+checkpointfile=args.checkpoint if args.checkpoint != None else args.input + ".checkpoint.json"
+columns=[name.strip() for name in args.columns.split(",") if name.strip() != ""] or None
+
+if args.fresh:
+   for filename in (rejectfile,checkpointfile):
+       if os.path.exists(filename):
+          os.remove(filename)
+elif os.path.exists(checkpointfile):
+   print(f"Continuing load from checkpoint {checkpointfile}")
+
+# Instantiate DbApp application database layer and open connection
+print("Open connection")
+db = DbApp(args.connstring)
+
+# If not open, bail out
+if (db.isopen()==False):
+   raise Exception("Connection not opened. Process cancelled.")
+
+# Load the file
+stats=db.load_customers_csv(args.input,args.library,args.table,args.workers,args.batchsize,
+                            rejectfile,checkpointfile,columns)
+
+print("Close connection")
+db.close_connection()
+
+if stats == None:
+   print(f"Load stopped: {db.getlasterror()}")
+   print("Run the same command again to continue from the checkpoint.")
+   sys.exit(1)
+
+print(f"Records read:{stats['read']} Skipped (earlier run):{stats['skipped']}")
+print(f"Loaded:{stats['loaded']} Rejected:{stats['rejected']} Batches:{stats['batches']} Bisects:{stats['bisects']} Retries:{stats['retries']}")
+print(f"Elapsed seconds:{stats['seconds']:.3f} Rows/sec:{stats['rowspersecond']:.0f}")
+if stats['rejected'] > 0:
+   print(f"Rejected rows written to {rejectfile}")
@@ -0,0 +1,66 @@
+#!/QOpenSys/pkgs/bin/python3
+#-------------------------------------------------------
+# Module: odbcquerystats.py
+# Desc: This sample prints the statement shapes that cost
+#       the most time, from the statement fingerprint stats
+#       collected by dbquerystats. Stats are read from a file
+#       written by DbQueryStats.save() or from a running
+#       dbdaemon.py started with --querystats.
+#       Only the Python standard library is loaded.
+#
+# Parameters:
+# --input <file>         Stats file from DbQueryStats.save()
+# --daemon <path>        dbdaemon.py socket path to read stats from instead
+# --top <n>              Fingerprints shown. Default=20
+# --sort <key>           total, mean, max, calls, rows or errors. Default=total
+# --width <n>            Fingerprint characters shown. Default=100
+# --json                 Print the top entries as JSON instead of a table
+# --reset                Clear the daemon stats after reading them
+#
+# Ex: python3 odbcquerystats.py --daemon /tmp/dbibmiodbc.sock --top 10 --sort mean
+#
+# Update Info:
+# 10/18/2026 - Initial version
+#------------------------------------------------
+# Imports
+#------------------------------------------------
+import sys
+import json
+import argparse
+from dbquerystats import formatreport, topentries
+
+# Sort option names to snapshot keys
+sortkeys={"total":"totalseconds","mean":"meanseconds","max":"maxseconds",
+          "calls":"calls","rows":"rows","errors":"errors"}
+
+#------------------------------------------------
+# Command line parameters
+#------------------------------------------------
+parser = argparse.ArgumentParser(description="Report the most costly SQL statement shapes")
+source = parser.add_mutually_exclusive_group(required=True)
+source.add_argument("--input",default=None,help="Stats file from DbQueryStats.save()")
+source.add_argument("--daemon",default=None,help="dbdaemon.py socket path")
+parser.add_argument("--top",type=int,default=20,help="Fingerprints shown")
+parser.add_argument("--sort",choices=list(sortkeys),default="total",help="Sort order")
+parser.add_argument("--width",type=int,default=100,help="Fingerprint characters shown")
+parser.add_argument("--json",action="store_true",help="Print the top entries as JSON")
+parser.add_argument("--reset",action="store_true",help="Clear the daemon stats after reading them")
+args = parser.parse_args()
+
+try:
+   if args.daemon != None:
+      from dbdaemonclient import DbDaemonClient
+      client = DbDaemonClient(args.daemon)
+      snapshot = client.querystats(args.reset)
+      client.close_connection()
+   else:
+      with open(args.input,"r",encoding="utf-8") as infile:
+         snapshot = json.load(infile)
+except Exception as e:
+   print(f"Could not read query stats: {e}",file=sys.stderr)
+   sys.exit(1)
+
+if args.json:
+   print(json.dumps(topentries(snapshot["entries"],args.top,sortkeys[args.sort]),indent=2))
+else:
+   sys.stdout.write(formatreport(snapshot,args.top,sortkeys[args.sort],args.width))
@@ -2,20 +2,53 @@
 #-------------------------------------------------------
 # Module: odbcread_qcustcdt.py
 # Desc: This sample reads table QIWS.QCUSTCDT and 
-#       returns the data as JSON using ODBC and 
-#       the IBM i Access ODBC Driver.
+#       returns the data as JSON, CSV or Parquet using 
+#       ODBC and the IBM i Access ODBC Driver.
+#       Rows are written as they are fetched so the
+#       export runs in constant memory.
+#
+# Parameters:
+# --format json|ndjson|csv|parquet
+#                        JSON array, newline delimited JSON, CSV or 
+#                        Parquet. Default=json
+# --output <file>        Output file. Default=stdout. Required for parquet.
+# --gzip                 Gzip compress json/ndjson/csv output
+# --columns <list>       Comma separated columns to export. Default=All
+# --rowgroupsize <n>     Parquet rows per row group. Default=100000
+# --where <stmt>         Optional SQL where statement
+# --library <lib>        Table library. Default=QIWS
+# --chunksize <n>        Rows per fetch and write. Default=1000
+# --trim                 Trim trailing blanks from CHAR fields
+# --prefetch <n>         Blocks fetched ahead on a background thread while
+#                        rows are written. 0=Off. Default=0
+# --workers <n>          Processes encoding json/ndjson blocks in parallel.
+#                        0=Encode in this process. Default=0
+# --connstring <str>     ODBC connection string. Default=*LOCAL DSN below
+# --daemon <socket>      Run the query through a running dbdaemon.py instead
+#                        of opening an ODBC connection
+#
+# Ex: python3 odbcread_qcustcdt.py --format ndjson --output /tmp/qcustcdt.ndjson
+#     python3 odbcread_qcustcdt.py --format csv --gzip --output /tmp/qcustcdt.csv.gz
+#     python3 odbcread_qcustcdt.py --format parquet --chunksize 10000 --output /tmp/qcustcdt.parquet
+#     python3 odbcread_qcustcdt.py --format ndjson --chunksize 5000 --prefetch 2 --workers 8 --output /tmp/qcustcdt.ndjson
 #
 # Update Info:
 # x/xx/xx - xxxxx
+# 10/18/2026 - Stream JSON/NDJSON output to stdout or file
+# 10/18/2026 - Added --trim using table metadata for CHAR fields
+# 10/18/2026 - Added --daemon client mode. pyodbc is only imported when needed.
+# 10/18/2026 - Added --prefetch to overlap fetching with JSON writing
+# 10/18/2026 - Added csv/parquet formats, --gzip, --columns and rows/sec
+# 10/18/2026 - Added --workers for multi process JSON encoding
 #------------------------------------------------
 # Imports
 #------------------------------------------------
-import pyodbc
 import sys
+import argparse
+import gzip
 import time
-import traceback
-import json
-from dbapp import DbApp
+from dbexport import export_json, export_csv, export_parquet
+from dbprefetch import DbPrefetchReader
 
 #------------------------------------------------
 # Script initialization
@@ -37,37 +70,93 @@ from dbapp import DbApp
 # Enable committment control - *CS autocommit enabled.
 odbcconnstring="DSN=*LOCAL;CommitMode=1;EXTCOLINFO=1;" 
 
+#------------------------------------------------
+# Command line parameters
+#------------------------------------------------
+parser = argparse.ArgumentParser(description="Export QCUSTCDT records as JSON, CSV or Parquet")
+parser.add_argument("--format",choices=["json","ndjson","csv","parquet"],default="json",help="json=JSON array, ndjson=newline delimited JSON, csv, parquet")
+parser.add_argument("--output",default="-",help="Output file. Default=stdout")
+parser.add_argument("--gzip",action="store_true",help="Gzip compress json/ndjson/csv output")
+parser.add_argument("--columns",default="",help="Comma separated columns to export. Default=All")
+parser.add_argument("--rowgroupsize",type=int,default=100000,help="Parquet rows per row group")
+parser.add_argument("--where",default="",help="Optional SQL where statement")
+parser.add_argument("--library",default="QIWS",help="Table library")
+parser.add_argument("--chunksize",type=int,default=1000,help="Rows per fetch and write")
+parser.add_argument("--trim",action="store_true",help="Trim trailing blanks from CHAR fields")
+parser.add_argument("--prefetch",type=int,default=0,help="Blocks fetched ahead while writing. 0=Off")
+parser.add_argument("--workers",type=int,default=0,help="Processes encoding JSON blocks. 0=Off")
+parser.add_argument("--connstring",default=odbcconnstring,help="ODBC connection string")
+parser.add_argument("--daemon",default=None,help="dbdaemon.py socket path to use instead of ODBC")
+args = parser.parse_args()
+if args.format == "parquet" and args.output == "-":
+   parser.error("--output is required for parquet")
+if args.format == "parquet" and args.gzip:
+   parser.error("--gzip does not apply to parquet. Parquet files are compressed with snappy.")
+if args.workers > 0 and args.format not in ("json","ndjson"):
+   parser.error("--workers only applies to json and ndjson")
+columns=[name.strip() for name in args.columns.split(",") if name.strip() != ""] or None
+
+# Status messages go to stderr so stdout only contains the exported data
 # Instantiate DbApp application database layer and open connection
-print("Open connection")
-db = DbApp(odbcconnstring)
+print("Open connection",file=sys.stderr)
+if args.daemon != None:
+   # Thin client. No pyodbc import or ODBC connect.
+   from dbdaemonclient import DbDaemonClient
+   db = DbDaemonClient(args.daemon)
+else:
+   from dbapp import DbApp
+   db = DbApp(args.connstring)
 
 # If not open, bail out
 if (db.isopen()==False):
    raise Exception("Connection not opened. Process cancelled.")
 
+# Look up CHAR fields to trim from the table definition
+trimcolumns=None
+if args.trim:
+   trimcolumns=db.getcharcolumns("QCUSTCDT",args.library)
+
 # Query customers
-cursor1=db.query_qcustcdt("")
+cursor1=db.query_qcustcdt(args.where,args.library)
 
-# If cursor returned, get all rows
-if cursor1 != None:
-   rows = cursor1.fetchall()
-else:
+# If no cursor returned, bail out
+if cursor1 == None:
    raise Exception(f"Query issue: {db.getlasterror()}")    
 
-# Output records as JSON
+# Fetch the next blocks while the current one is written
+if args.prefetch > 0:
+   cursor1=DbPrefetchReader(cursor1,args.chunksize,args.prefetch)
 
-# Get field metadata names from cursor
-column_names = [desc[0] for desc in cursor1.description]
+def export(cursor1,outfile):
+    # Write one format to an open text file
+    if args.format == "csv":
+       return export_csv(cursor1,outfile,args.chunksize,trimcolumns=trimcolumns,columns=columns)
+    return export_json(cursor1,outfile,args.format=="ndjson",args.chunksize,trimcolumns=trimcolumns,columns=columns,
+                       workers=args.workers)
+
+# Output records while fetching
+starttime=time.perf_counter()
+if args.format == "parquet":
+   # Without --trim CHAR fields keep their blanks like the other formats
+   reccount=export_parquet(cursor1,args.output,args.chunksize,args.rowgroupsize,
+                           trimcolumns=trimcolumns if trimcolumns != None else [],columns=columns)
+elif args.output == "-" and args.gzip:
+   with gzip.open(sys.stdout.buffer,"wt",encoding="utf-8",newline="") as outfile:
+      reccount=export(cursor1,outfile)
+elif args.output == "-":
+   reccount=export(cursor1,sys.stdout)
+elif args.gzip:
+   with gzip.open(args.output,"wt",encoding="utf-8",newline="") as outfile:
+      reccount=export(cursor1,outfile)
+else:
+   with open(args.output,"w",encoding="utf-8",newline="") as outfile:
+      reccount=export(cursor1,outfile)
+elapsed=time.perf_counter() - starttime
 
-# Iterate and output data rows to array 
-reccount=0
-json_data=[]
-for row in rows:
-   # Return all fields as strings
-   json_data.append(dict(zip(column_names,row)))       
-   reccount += 1
-   
-print("{\"records\":" + f"{json.dumps(json_data,default=str)}" + "}")
+print(f"Records exported:{reccount}",file=sys.stderr)
+print(f"Elapsed seconds:{elapsed:.3f} Rows/sec:{reccount / elapsed if elapsed > 0 else 0:.0f}",file=sys.stderr)
+if args.prefetch > 0:
+   print(f"Prefetch stats:{cursor1.getstats()}",file=sys.stderr)
 
-print("Close connection")
+print("Close connection",file=sys.stderr)
 db.close_connection()